@@ -1,242 +1,352 @@
-# ADK imports
-from google.genai import types
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.adk.agents import LoopAgent, SequentialAgent, ParallelAgent
+import os
+import sys
+import argparse
 
-# internal imports
-from subagents import agents
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
 
-import os
-from dotenv import load_dotenv
-
-import litellm 
-litellm.set_verbose = False 
-
-# --------------------------------------------------------------------------
-# Initialize agents
-# --------------------------------------------------------------------------
-fetch_cluster_id_agent = agents["fetch_cluster_id"]
-fetch_cluster_articles_id_agent = agents["fetch_cluster_articles_id"]
-extract_article_content_agent = agents["extract_article_content"]
-summary_creator_agent = agents["summary_creator"]
-timeline_creator_agent = agents["timeline_creator"]
-player_detection_agent = agents["player_detection"]
-player_perspective_agent = agents["player_perspective"]
-coach_detection_agent = agents["coach_detection"]
-coach_perspective_agent = agents["coach_perspective"]
-team_detection_agent = agents["team_detection"]
-team_perspective_agent = agents["team_perspective"]
-franchise_perspective_agent = agents["franchise_perspective"]
-first_dynamic_perspective_detection_agent = agents["first_dynamic_perspective_detection"]
-first_dynamic_perspective_agent = agents["first_dynamic_perspective"]
-second_dynamic_perspective_detection_agent = agents["second_dynamic_perspective_detection"]
-second_dynamic_perspective_agent = agents["second_dynamic_perspective"]
-content_analyst_for_player = agents["content_analyst"]("player_perspective")
-content_analyst_for_coach = agents["content_analyst"]("coach_perspective")
-content_analyst_for_team = agents["content_analyst"]("team_perspective")
-content_analyst_for_franchise = agents["content_analyst"]("franchise_perspective")
-content_analyst_for_firstdynamic = agents["content_analyst"]("dynamic_perspective")
-content_analyst_for_seconddynamic = agents["content_analyst"]("dynamic_perspective2")
-content_analyst_for_summary = agents["content_analyst"]("summary")
-data_cleaner_for_summary = agents["data_cleaner"]("summary")
-summary_uploader_agent = agents["summary_uploader"]
-timeline_uploader_agent = agents["timeline_uploader"]
-player_view_uploader_agent = agents["player_view_uploader"]
-coach_view_uploader_agent = agents["coach_view_uploader"]
-team_view_uploader_agent = agents["team_view_uploader"]
-franchise_view_uploader_agent = agents["franchise_view_uploader"]
-first_dynamic_view_uploader_agent = agents["first_dynamic_view_uploader"]
-second_dynamic_view_uploader_agent = agents["second_dynamic_view_uploader"]
-close_cluster_id_agent = agents["close_cluster_id_agent"]
+# internal imports (light; ADK, LiteLLM and the agents are imported on first use)
+from shared.startup import StartupProfiler
+from image_jobs import wait_for_image_jobs
+from shared.tracing import RunTracer
+from shared.model_router import router
+from shared.resilience import run_deadline
+
+# Instantiate constants
+APP_NAME = "cluster_agency_app"
+USER_ID = "BigSlikTobi"
+RUN_DEADLINE = float(os.getenv("CLUSTER_RUN_DEADLINE", "0")) or None  # Seconds for all LLM and DB calls of a run
 
 #--------------------------------------------------------------------------
 # Load environment variables
 # -------------------------------------------------------------------------
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-os.environ["GOOGLE_API_KEY"] = api_key  
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "")
+def load_environment():
+    """Loads .env and exposes the API keys under the names the model clients expect."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key:
+        os.environ["GOOGLE_API_KEY"] = api_key
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "")
 
 #--------------------------------------------------------------------------
-# Sequential Agents
+# Agent graph
 #--------------------------------------------------------------------------
 
-"""Sequential Agent to prepare the data."""
-
-# -- Sequential Agent: Data Preparation --
-fetch_context_agent = SequentialAgent(
-    name="FetchContextAgent",
-    sub_agents=[
-        fetch_cluster_id_agent, 
-        fetch_cluster_articles_id_agent, 
-        extract_article_content_agent,
-    ],
-    description="Fetches cluster content from source.",
-)
-
-"""Sequential Agents to define the 360 degree view of the player, coach, team, and franchise."""
-
-# -- Sequential Agent: Summary --
-summary_agent = SequentialAgent(
-    name="SummaryAgent",
-    sub_agents=[
-        summary_creator_agent,
-        content_analyst_for_summary,
-        data_cleaner_for_summary,
-        summary_uploader_agent
-    ],
-    description="Creates a summary and timeline from the cluster data.",
-)
-
-# -- Sequential Agent: Timeline --
-timeline_agent = SequentialAgent(
-    name="TimelineAgent",
-    sub_agents=[
-        timeline_creator_agent,
-        timeline_uploader_agent        
-    ],
-    description="Creates a timeline from the cluster data.",
-)
-
-# -- Sequential Agent: Player --
-player_agent = SequentialAgent(
-    name="PlayerAgent",
-    sub_agents=[
-        player_detection_agent, 
-        player_perspective_agent,
-        content_analyst_for_player,
-        player_view_uploader_agent
+def build_root_agent():
+    """
+    Builds the cluster agent tree.
+
+    Importing subagents reads the instruction files and creates the LlmAgents, so
+    this is deferred until a run (or the benchmark) actually needs the graph.
+
+    Returns:
+        LoopAgent: The root agent
+    """
+    from google.adk.agents import LoopAgent, SequentialAgent
+    from subagents import agents
+
+    # --------------------------------------------------------------------------
+    # Initialize agents
+    # --------------------------------------------------------------------------
+    fetch_cluster_id_agent = agents["fetch_cluster_id"]
+    fetch_cluster_articles_id_agent = agents["fetch_cluster_articles_id"]
+    extract_article_content_agent = agents["extract_article_content"]
+    summary_creator_agent = agents["summary_creator"]
+    timeline_creator_agent = agents["timeline_creator"]
+    player_detection_agent = agents["player_detection"]
+    player_perspective_agent = agents["player_perspective"]
+    coach_detection_agent = agents["coach_detection"]
+    coach_perspective_agent = agents["coach_perspective"]
+    team_detection_agent = agents["team_detection"]
+    team_perspective_agent = agents["team_perspective"]
+    franchise_perspective_agent = agents["franchise_perspective"]
+    first_dynamic_perspective_detection_agent = agents["first_dynamic_perspective_detection"]
+    first_dynamic_perspective_agent = agents["first_dynamic_perspective"]
+    second_dynamic_perspective_detection_agent = agents["second_dynamic_perspective_detection"]
+    second_dynamic_perspective_agent = agents["second_dynamic_perspective"]
+    content_analyst_for_player = agents["content_analyst"]("player_perspective")
+    content_analyst_for_coach = agents["content_analyst"]("coach_perspective")
+    content_analyst_for_team = agents["content_analyst"]("team_perspective")
+    content_analyst_for_franchise = agents["content_analyst"]("franchise_perspective")
+    content_analyst_for_firstdynamic = agents["content_analyst"]("dynamic_perspective")
+    content_analyst_for_seconddynamic = agents["content_analyst"]("dynamic_perspective2")
+    content_analyst_for_summary = agents["content_analyst"]("summary")
+    data_cleaner_for_summary = agents["data_cleaner"]("summary")
+    summary_uploader_agent = agents["summary_uploader"]
+    timeline_uploader_agent = agents["timeline_uploader"]
+    player_view_uploader_agent = agents["player_view_uploader"]
+    coach_view_uploader_agent = agents["coach_view_uploader"]
+    team_view_uploader_agent = agents["team_view_uploader"]
+    franchise_view_uploader_agent = agents["franchise_view_uploader"]
+    first_dynamic_view_uploader_agent = agents["first_dynamic_view_uploader"]
+    second_dynamic_view_uploader_agent = agents["second_dynamic_view_uploader"]
+    close_cluster_id_agent = agents["close_cluster_id_agent"]
+
+    #--------------------------------------------------------------------------
+    # Sequential Agents
+    #--------------------------------------------------------------------------
+
+    # Sequential Agent to prepare the data.
+
+    # -- Sequential Agent: Data Preparation --
+    fetch_context_agent = SequentialAgent(
+        name="FetchContextAgent",
+        sub_agents=[
+            fetch_cluster_id_agent, 
+            fetch_cluster_articles_id_agent, 
+            extract_article_content_agent,
+        ],
+        description="Fetches cluster content from source.",
+    )
+
+    # Sequential Agents to define the 360 degree view of the player, coach, team, and franchise.
+
+    # -- Sequential Agent: Summary --
+    summary_agent = SequentialAgent(
+        name="SummaryAgent",
+        sub_agents=[
+            summary_creator_agent,
+            content_analyst_for_summary,
+            data_cleaner_for_summary,
+            summary_uploader_agent
+        ],
+        description="Creates a summary and timeline from the cluster data.",
+    )
+
+    # -- Sequential Agent: Timeline --
+    timeline_agent = SequentialAgent(
+        name="TimelineAgent",
+        sub_agents=[
+            timeline_creator_agent,
+            timeline_uploader_agent        
+        ],
+        description="Creates a timeline from the cluster data.",
+    )
+
+    # -- Sequential Agent: Player --
+    player_agent = SequentialAgent(
+        name="PlayerAgent",
+        sub_agents=[
+            player_detection_agent, 
+            player_perspective_agent,
+            content_analyst_for_player,
+            player_view_uploader_agent
         
-    ],
-    description="Executes a sequence of player detection and perspective analysis.",
-)
-
-# -- Sequential Agent: Coach --
-coach_agent = SequentialAgent(
-    name="CoachAgent",
-    sub_agents=[
-        coach_detection_agent, 
-        coach_perspective_agent,
-        content_analyst_for_coach,
-        coach_view_uploader_agent
-    ],
-    description="Executes a sequence of coach detection and perspective analysis.",
-)
-
-# -- Sequential Agent: Team --
-team_agent = SequentialAgent(
-    name="TeamAgent",
-    sub_agents=[
-        team_detection_agent, 
-        team_perspective_agent, 
-        content_analyst_for_team,
-        team_view_uploader_agent,
-    ],
-    description="Executes a sequence of team detection and perspective analysis.",
-)
-
-# -- Sequential Agent: Franchise --
-franchise_agent = SequentialAgent(
-    name="FranchiseAgent",
-    sub_agents=[
-        franchise_perspective_agent, 
-        content_analyst_for_franchise,
-        franchise_view_uploader_agent,
-    ],
-    description="Executes a sequence of franchise perspective analysis.",
-)
-
-# -- Sequential Agent: Dynamic Perspective --
-first_dynamic_agent = SequentialAgent(
-    name="DynamicPerspectiveAgent",
-    sub_agents=[
-        first_dynamic_perspective_detection_agent, 
-        first_dynamic_perspective_agent,
-        content_analyst_for_firstdynamic,
-        first_dynamic_view_uploader_agent,
-    ],
-    description="Executes a sequence of dynamic perspective detection and analysis.",
-)
-
-second_dynamic_agent = SequentialAgent(
-    name="SecondDynamicPerspectiveAgent",
-    sub_agents=[
-        second_dynamic_perspective_detection_agent, 
-        second_dynamic_perspective_agent,
-        content_analyst_for_seconddynamic,
-        second_dynamic_view_uploader_agent,
-    ],
-    description="Executes a sequence of dynamic perspective detection and analysis.",
-)
-
-# three60_agent = SequentialAgent(
-#     name="Three60Agent",
-#     sub_agents=[
-#         player_agent, 
-#         coach_agent, 
-#         team_agent, 
-#         dynamic_agent, 
-#     ],
-#     description="Runs multiple agents to create a comprehensive 360-degree view."
-# )
+        ],
+        description="Executes a sequence of player detection and perspective analysis.",
+    )
 
-#--------------------------------------------------------------------------
-# Loop Agent
-#--------------------------------------------------------------------------
+    # -- Sequential Agent: Coach --
+    coach_agent = SequentialAgent(
+        name="CoachAgent",
+        sub_agents=[
+            coach_detection_agent, 
+            coach_perspective_agent,
+            content_analyst_for_coach,
+            coach_view_uploader_agent
+        ],
+        description="Executes a sequence of coach detection and perspective analysis.",
+    )
 
-"""Loop Agent to iterate through the workflow for fetching and processing cluster data."""
-
-cluster_agent = LoopAgent(
-    name="cluster_agent",
-    max_iterations=1,
-    sub_agents=[
-        fetch_context_agent, 
-        summary_agent,
-        timeline_agent,
-        player_agent,
-        coach_agent,
-        team_agent,
-        franchise_agent,
-        first_dynamic_agent,
-        second_dynamic_agent,
-        close_cluster_id_agent
-    ]
-)
+    # -- Sequential Agent: Team --
+    team_agent = SequentialAgent(
+        name="TeamAgent",
+        sub_agents=[
+            team_detection_agent, 
+            team_perspective_agent, 
+            content_analyst_for_team,
+            team_view_uploader_agent,
+        ],
+        description="Executes a sequence of team detection and perspective analysis.",
+    )
 
-#--------------------------------------------------------------------------
-# Root Agent
-#--------------------------------------------------------------------------
+    # -- Sequential Agent: Franchise --
+    franchise_agent = SequentialAgent(
+        name="FranchiseAgent",
+        sub_agents=[
+            franchise_perspective_agent, 
+            content_analyst_for_franchise,
+            franchise_view_uploader_agent,
+        ],
+        description="Executes a sequence of franchise perspective analysis.",
+    )
+
+    # -- Sequential Agent: Dynamic Perspective --
+    first_dynamic_agent = SequentialAgent(
+        name="DynamicPerspectiveAgent",
+        sub_agents=[
+            first_dynamic_perspective_detection_agent, 
+            first_dynamic_perspective_agent,
+            content_analyst_for_firstdynamic,
+            first_dynamic_view_uploader_agent,
+        ],
+        description="Executes a sequence of dynamic perspective detection and analysis.",
+    )
+
+    second_dynamic_agent = SequentialAgent(
+        name="SecondDynamicPerspectiveAgent",
+        sub_agents=[
+            second_dynamic_perspective_detection_agent, 
+            second_dynamic_perspective_agent,
+            content_analyst_for_seconddynamic,
+            second_dynamic_view_uploader_agent,
+        ],
+        description="Executes a sequence of dynamic perspective detection and analysis.",
+    )
+
+    # three60_agent = SequentialAgent(
+    #     name="Three60Agent",
+    #     sub_agents=[
+    #         player_agent, 
+    #         coach_agent, 
+    #         team_agent, 
+    #         dynamic_agent, 
+    #     ],
+    #     description="Runs multiple agents to create a comprehensive 360-degree view."
+    # )
+
+    #--------------------------------------------------------------------------
+    # Loop Agent
+    #--------------------------------------------------------------------------
 
-root_agent = cluster_agent
+    # Loop Agent to iterate through the workflow for fetching and processing cluster data.
+
+    cluster_agent = LoopAgent(
+        name="cluster_agent",
+        max_iterations=1,
+        sub_agents=[
+            fetch_context_agent, 
+            summary_agent,
+            timeline_agent,
+            player_agent,
+            coach_agent,
+            team_agent,
+            franchise_agent,
+            first_dynamic_agent,
+            second_dynamic_agent,
+            close_cluster_id_agent
+        ]
+    )
+
+    return cluster_agent
 
 #--------------------------------------------------------------------------
 # Expose agency
 #--------------------------------------------------------------------------
 
-# Instantiate constants
-APP_NAME = "cluster_agency_app"
-USER_ID = "BigSlikTobi"
-SESSION_ID = "001"
-
-# Session and Runner
-session_service = InMemorySessionService()
-session = session_service.create_session(
-    app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID
-)
-runner = Runner(
-    agent=root_agent, app_name=APP_NAME, session_service=session_service
-)
-
-def call_agent(query):
+_pipeline = {}
+
+
+def build_pipeline(profiler=None):
+    """
+    Imports the heavy dependencies and builds the agent graph, session store and runner once.
+
+    Sessions are persisted after every event, and every stage is checkpointed, so a
+    run that dies is resumed at its first incomplete stage by the next call_agent().
+
+    Args:
+        profiler (StartupProfiler, optional): Times the startup phases
+
+    Returns:
+        dict: root_agent, session_service and runner
+    """
+    if _pipeline:
+        return _pipeline
+    profiler = profiler or StartupProfiler(enabled=False)
+
+    with profiler.phase("Environment (.env)"):
+        load_environment()
+    with profiler.phase("Import ADK"):
+        from google.adk.runners import Runner
+    with profiler.phase("Import LiteLLM"):
+        import litellm
+        litellm.set_verbose = False
+    with profiler.phase("Import tools (Supabase)"):
+        import tools  # Also imported by subagents; timed on its own here
+    with profiler.phase("Build agent graph (instructions, LlmAgents)"):
+        root_agent = build_root_agent()
+    with profiler.phase("Open session store, create runner"):
+        from checkpoints import SqliteSessionService, add_checkpoints
+        add_checkpoints(root_agent)
+        session_service = SqliteSessionService()
+        runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
+
+    _pipeline.update(root_agent=root_agent, session_service=session_service, runner=runner)
+    return _pipeline
+
+
+def __getattr__(name):
+    # agent.root_agent, agent.runner and agent.session_service are built on first access
+    if name in ("root_agent", "session_service", "runner"):
+        return build_pipeline()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def call_agent(query, session_id=None):
+    """
+    Runs the cluster pipeline, resuming the newest unfinished session if there is one.
+
+    Args:
+        query (str): The message that starts the run
+        session_id (str, optional): Session to resume or create, e.g. a job ID
+
+    Returns:
+        bool: True if every stage completed; otherwise the session stays open for the next run
+    """
+    from google.genai import types
+    from checkpoints import is_run_complete, COMPLETE
+
+    pipeline = build_pipeline()
+    root_agent, session_service, runner = pipeline["root_agent"], pipeline["session_service"], pipeline["runner"]
     content = types.Content(role="user", parts=[types.Part(text=query)])
-    events = runner.run(user_id=USER_ID, session_id=SESSION_ID, new_message=content)
+    session = session_service.resume_or_create(APP_NAME, USER_ID, session_id)
+    tracer = RunTracer(APP_NAME, root_agent)
+    events = tracer.observe(runner.run(user_id=USER_ID, session_id=session.id, new_message=content))
+
+    try:
+        for event in events:
+            if event.content and event.content.parts:
+                final_response = event.content.parts[0].text
+                print("Agent Response:", final_response)
+    finally:
+        tracer.close()
+
+    # The runner reports agent errors without raising, so completion is read from the checkpoints
+    state = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id).state
+    if not is_run_complete(state, root_agent):
+        print(f"Run incomplete; session {session.id} will be resumed by the next run.")
+        return False
+    session_service.set_status(APP_NAME, USER_ID, session.id, COMPLETE)
+    return True
+
+
+def main(argv=None):
+    """Command line entry point; runs the pipeline once and waits for the queued image jobs."""
+    parser = argparse.ArgumentParser(description="Runs the cluster agent pipeline for the oldest new cluster.")
+    parser.add_argument("--session-id", help="Session to resume or create (default: the newest unfinished one)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report the import and setup cost of the pipeline, then exit without running it")
+    parser.add_argument("--deadline", type=float, default=RUN_DEADLINE,
+                        help="Seconds after which LLM and database calls fail instead of starting "
+                             "(default: CLUSTER_RUN_DEADLINE, none if unset)")
+    args = parser.parse_args(argv)
+
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    build_pipeline(profiler)
+    if args.profile_startup:
+        profiler.report()
+        return 0
 
-    for event in events:
-        if event.content and event.content.parts:
-            final_response = event.content.parts[0].text
-            print("Agent Response:", final_response)
+    with run_deadline(args.deadline):
+        call_agent("Start the process.", args.session_id)
+    router.print_stats()
+    wait_for_image_jobs()
+    return 0
 
 
-call_agent("Start the process.")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from typing import Dict, Any, List
+
+# --------------------------------------------------------------------------
+# Offline replay benchmark for the cluster pipeline
+# --------------------------------------------------------------------------
+
+"""
+Runs cluster_agent end to end against FakeSupabase and FakeLlm, so scheduling
+and parallelism changes can be compared without API keys or network access:
+
+    python cluster_agency/benchmark.py --clusters 5 --llm-latency 0.2 --db-latency 0.02
+
+Reports clusters per minute, per-cluster latency, per-agent latency (p50/p95),
+LLM calls and tokens per agent, and Supabase calls per table and operation.
+"""
+
+# agent.py reads the API keys at import time; the fakes never use them
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["IMAGE_JOBS_ENABLED"] = "false"
+os.environ.setdefault("SESSION_DB_PATH", ":memory:")  # The benchmark uses its own InMemorySessionService
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")  # Don't fetch the cost map over the network
+
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from google.genai import types
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+import tools
+import agent
+from shared.tracing import RunTracer, summarize_spans, print_summary, percentile
+from benchmark_fakes import FakeSupabase, FakeLlm, BenchmarkScenario, make_fixtures, load_fixtures
+
+
+def iter_llm_agents(root):
+    """Yields every LlmAgent in an agent tree."""
+    if isinstance(root, LlmAgent):
+        yield root
+    for sub_agent in getattr(root, "sub_agents", None) or []:
+        yield from iter_llm_agents(sub_agent)
+
+
+def install_fakes(root_agent, db: FakeSupabase, llm_latency: float, output_tokens: int) -> Dict[str, Dict[str, int]]:
+    """
+    Points the tools at the fake database and swaps every agent's model for a FakeLlm.
+
+    Returns:
+        dict: Shared per-agent LLM call and token counters
+    """
+    tools.create_client = db.create_client
+    scenario = BenchmarkScenario(db)
+    llm_stats: Dict[str, Dict[str, int]] = {}
+    for llm_agent in iter_llm_agents(root_agent):
+        llm_agent.model = FakeLlm(
+            # The built-in google_search tool only accepts Gemini 2 model names; the fake never searches
+            model=f"gemini-2-fake/{llm_agent.name}",
+            agent_name=llm_agent.name,
+            scenario=scenario,
+            latency=llm_latency,
+            output_tokens=output_tokens,
+            stats=llm_stats,
+        )
+    return llm_stats
+
+
+def run_benchmark(fixtures: Dict[str, List[Dict[str, Any]]], clusters: int, llm_latency: float = 0.0,
+                  db_latency: float = 0.0, output_tokens: int = 300, quiet: bool = True) -> Dict[str, Any]:
+    """
+    Runs the cluster pipeline once per cluster and collects timings and call counts.
+
+    Args:
+        fixtures (dict): Initial table rows (clusters, SourceArticles)
+        clusters (int): Number of clusters to process
+        llm_latency (float): Seconds each fake model call takes
+        db_latency (float): Seconds each fake Supabase query takes
+        output_tokens (int): Size of each fake model answer in tokens
+        quiet (bool): Suppress the pipeline's own print output
+
+    Returns:
+        dict: Benchmark report
+    """
+    db = FakeSupabase(fixtures, latency=db_latency)
+    root_agent = agent.root_agent
+    llm_stats = install_fakes(root_agent, db, llm_latency, output_tokens)
+
+    session_service = InMemorySessionService()
+    runner = Runner(agent=root_agent, app_name="cluster_benchmark", session_service=session_service)
+    trace_dir = tempfile.mkdtemp(prefix="cluster-benchmark-")
+
+    spans, cluster_seconds = [], []
+    started = time.perf_counter()
+    for i in range(clusters):
+        session_id = f"bench-{i}"
+        session_service.create_session(app_name="cluster_benchmark", user_id="benchmark", session_id=session_id)
+        message = types.Content(role="user", parts=[types.Part(text="Start the process.")])
+
+        cluster_start = time.perf_counter()
+        stdout = sys.stdout
+        if quiet:
+            sys.stdout = open(os.devnull, "w")
+        try:
+            tracer = RunTracer(f"cluster-{i}", root_agent, trace_dir=trace_dir)
+            for _ in tracer.observe(runner.run(user_id="benchmark", session_id=session_id, new_message=message)):
+                pass
+            tracer.close()
+        finally:
+            if quiet:
+                sys.stdout.close()
+                sys.stdout = stdout
+        cluster_seconds.append(time.perf_counter() - cluster_start)
+        spans.extend(tracer.spans)
+    elapsed = time.perf_counter() - started
+
+    closed = sum(1 for c in db.tables.get("clusters", []) if c.get("isContent"))
+    agent_rows = summarize_spans(spans)
+    for row in agent_rows:
+        stats = llm_stats.get(row["agent"], {})
+        row["input_tokens"] = stats.get("input_tokens", 0)
+        row["output_tokens"] = stats.get("output_tokens", 0)
+        row["llm_calls"] = stats.get("llm_calls", 0)
+    return {
+        "clusters": clusters,
+        "clusters_closed": closed,
+        "elapsed_sec": round(elapsed, 3),
+        "clusters_per_min": round(clusters / elapsed * 60, 2) if elapsed else None,
+        "cluster_p50_sec": round(percentile(cluster_seconds, 50), 3),
+        "cluster_p95_sec": round(percentile(cluster_seconds, 95), 3),
+        "agents": agent_rows,
+        "llm": llm_stats,
+        "llm_calls": sum(s["llm_calls"] for s in llm_stats.values()),
+        "db_calls": dict(sorted(db.calls.items())),
+        "settings": {"llm_latency": llm_latency, "db_latency": db_latency, "output_tokens": output_tokens},
+        "trace_dir": trace_dir,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Prints a benchmark report."""
+    print(f"\n=== Cluster pipeline benchmark ({report['clusters']} clusters, {report['clusters_closed']} closed) ===")
+    print(f"Elapsed: {report['elapsed_sec']:.2f}s  Throughput: {report['clusters_per_min']} clusters/min")
+    print(f"Per cluster: p50 {report['cluster_p50_sec']:.2f}s  p95 {report['cluster_p95_sec']:.2f}s")
+    print(f"LLM calls: {report['llm_calls']}\n")
+    print_summary(report["agents"])
+    print("\nSupabase calls:")
+    for key, count in report["db_calls"].items():
+        print(f"  {key:<40} {count:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the cluster pipeline")
+    parser.add_argument("--clusters", type=int, default=3, help="Number of clusters to process (default: 3)")
+    parser.add_argument("--articles-per-cluster", type=int, default=5, help="Synthetic articles per cluster (default: 5)")
+    parser.add_argument("--fixtures", help="JSON file with recorded clusters and SourceArticles rows (overrides synthetic data)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake model call (default: 0)")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds per fake Supabase query (default: 0)")
+    parser.add_argument("--output-tokens", type=int, default=300, help="Tokens per fake model answer (default: 300)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else make_fixtures(args.clusters, args.articles_per_cluster)
+    report = run_benchmark(fixtures, args.clusters, args.llm_latency, args.db_latency,
+                           args.output_tokens, quiet=not args.verbose)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json_path}")
+
+    return 0 if report["clusters_closed"] == min(args.clusters, len(fixtures.get("clusters", []))) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
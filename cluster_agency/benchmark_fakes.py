@@ -0,0 +1,371 @@
+import json
+import time
+import random
+import asyncio
+import inspect
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, AsyncGenerator
+
+from google.genai import types
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.function_tool import FunctionTool
+
+# --------------------------------------------------------------------------
+# Offline stand-ins for the cluster pipeline benchmark
+# --------------------------------------------------------------------------
+
+"""
+FakeSupabase is an in-memory replacement for the supabase client covering the
+query builder calls used in tools.py. FakeLlm is a deterministic ADK model that
+calls each agent's function tool once with arguments taken from the scenario and
+then answers with a fixed-size text, after a configurable latency.
+"""
+
+WORDS = ("quarterback", "season", "coach", "trade", "injury", "contract", "draft", "offense",
+         "defense", "playoffs", "franchise", "roster", "game", "touchdown", "practice", "team")
+
+
+# --------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------
+
+def make_fixtures(num_clusters: int, articles_per_cluster: int = 5, words_per_article: int = 600, seed: int = 42):
+    """
+    Builds synthetic clusters and SourceArticles rows.
+
+    Args:
+        num_clusters (int): Number of NEW clusters to create
+        articles_per_cluster (int): Number of source articles per cluster
+        words_per_article (int): Length of each article body in words
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        dict: Table name -> list of rows
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    clusters, articles = [], []
+    article_id = 1
+    for c in range(num_clusters):
+        cluster_id = f"bench-cluster-{c:04d}"
+        clusters.append({
+            "cluster_id": cluster_id,
+            "status": "NEW",
+            "isContent": False,
+            "created_at": (start + timedelta(minutes=c)).isoformat(),
+        })
+        for _ in range(articles_per_cluster):
+            articles.append({
+                "id": article_id,
+                "cluster_id": cluster_id,
+                "headline": " ".join(rng.choice(WORDS) for _ in range(8)).capitalize(),
+                "Content": " ".join(rng.choice(WORDS) for _ in range(words_per_article)),
+                "created_at": (start + timedelta(minutes=c, seconds=article_id)).isoformat(),
+                "isTranslated": False,
+            })
+            article_id += 1
+    return {"clusters": clusters, "SourceArticles": articles}
+
+
+def load_fixtures(path: str):
+    """
+    Loads recorded fixtures from a JSON file of the form {"clusters": [...], "SourceArticles": [...]}.
+
+    Args:
+        path (str): Path to the JSON file
+
+    Returns:
+        dict: Table name -> list of rows
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --------------------------------------------------------------------------
+# Supabase stand-in
+# --------------------------------------------------------------------------
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query on one FakeSupabase table."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.descending = False
+        self.row_limit = None
+
+    def select(self, columns: str = "*", **kwargs):
+        self.operation, self.columns = "select", columns
+        return self
+
+    def insert(self, data, **kwargs):
+        self.operation, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs):
+        self.operation, self.payload = "upsert", data
+        self.conflict_columns = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, data, **kwargs):
+        self.operation, self.payload = "update", data
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def filter(self, column: str, operator: str, value):
+        if operator != "eq":
+            raise NotImplementedError(f"FakeSupabase does not support filter operator '{operator}'")
+        return self.eq(column, value)
+
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.order_by, self.descending = column, desc
+        return self
+
+    def limit(self, count: int):
+        self.row_limit = count
+        return self
+
+    def _matches(self, row) -> bool:
+        return all(f(row) for f in self.filters)
+
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self.columns.split(",")}
+
+    def execute(self) -> FakeResponse:
+        self.db.record_call(self.table_name, self.operation)
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table_name, [])
+
+            if self.operation == "select":
+                result = [r for r in rows if self._matches(r)]
+                if self.order_by:
+                    result.sort(key=lambda r: r.get(self.order_by) or "", reverse=self.descending)
+                if self.row_limit is not None:
+                    result = result[:self.row_limit]
+                return FakeResponse([self._project(r) for r in result])
+
+            if self.operation in ("insert", "upsert"):
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                written = []
+                for new_row in new_rows:
+                    row = dict(new_row)
+                    existing = None
+                    if self.operation == "upsert" and self.conflict_columns:
+                        existing = next((r for r in rows if all(r.get(c) == row.get(c) for c in self.conflict_columns)), None)
+                    if existing is not None:
+                        if self.ignore_duplicates:
+                            continue
+                        existing.update(row)
+                        written.append(dict(existing))
+                    else:
+                        row.setdefault("id", self.db.next_id())
+                        rows.append(row)
+                        written.append(dict(row))
+                return FakeResponse(written)
+
+            if self.operation == "update":
+                updated = []
+                for row in rows:
+                    if self._matches(row):
+                        row.update(self.payload)
+                        updated.append(dict(row))
+                return FakeResponse(updated)
+
+            if self.operation == "delete":
+                deleted = [r for r in rows if self._matches(r)]
+                self.db.tables[self.table_name] = [r for r in rows if not self._matches(r)]
+                return FakeResponse(deleted)
+
+        raise NotImplementedError(f"FakeSupabase does not support '{self.operation}'")
+
+
+class FakeSupabase:
+    """In-memory stand-in for a supabase Client with per-table call counts and optional latency."""
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, latency: float = 0.0):
+        """
+        Args:
+            tables (dict): Initial rows per table
+            latency (float): Seconds each executed query sleeps, to model network round trips
+        """
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.RLock()
+        self._id = 100000
+
+    def next_id(self) -> int:
+        self._id += 1
+        return self._id
+
+    def record_call(self, table: str, operation: str):
+        with self.lock:
+            key = f"{table}.{operation}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def create_client(self, url=None, key=None, *args, **kwargs) -> "FakeSupabase":
+        """Drop-in replacement for supabase.create_client that returns this instance."""
+        return self
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> "FakeRpc":
+        return FakeRpc(self, name, params or {})
+
+    def write_timelines(self, timelines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Local equivalent of sql/write_timelines.sql: all timelines and deduplicated links, or nothing."""
+        with self.lock:
+            new_timelines, new_links, results = [], [], []
+            for item in timelines:
+                data = item.get("timeline_data")
+                if not item.get("timeline_name") or not isinstance(data, dict):
+                    raise ValueError(f"write_timelines: invalid timeline {str(item)[:200]}")
+                timeline_id = self.next_id()
+                new_timelines.append({"id": timeline_id, "timeline_name": item["timeline_name"], "timeline_data": data})
+                entries = data.get("ClusterId") if isinstance(data.get("ClusterId"), list) else []
+                article_ids = {str(a) for entry in entries if isinstance(entry, dict) and isinstance(entry.get("article_id"), list)
+                               for a in entry["article_id"] if isinstance(a, (str, int))}
+                new_links.extend({"timeline_id": timeline_id, "article_id": a} for a in sorted(article_ids))
+                results.append({"timeline_name": item["timeline_name"], "timeline_id": timeline_id, "links": len(article_ids)})
+            self.tables.setdefault("timelines", []).extend(new_timelines)
+            self.tables.setdefault("timeline_article_links", []).extend(new_links)
+            return results
+
+
+class FakeRpc:
+    """Database function call on a FakeSupabase."""
+
+    def __init__(self, db: FakeSupabase, name: str, params: Dict[str, Any]):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.db.record_call("rpc", self.name)
+        if self.name == "write_timelines":
+            return FakeResponse(self.db.write_timelines(self.params.get("timelines") or []))
+        raise NotImplementedError(f"FakeSupabase does not implement the function '{self.name}'")
+
+
+# --------------------------------------------------------------------------
+# Model stand-in
+# --------------------------------------------------------------------------
+
+class BenchmarkScenario:
+    """Values the fake model uses when it has to fill in tool arguments."""
+
+    def __init__(self, db: FakeSupabase):
+        self.db = db
+
+    def current_cluster_id(self) -> Optional[str]:
+        open_clusters = [c for c in self.db.tables.get("clusters", [])
+                         if c.get("status") == "NEW" and not c.get("isContent")]
+        open_clusters.sort(key=lambda c: c.get("created_at") or "")
+        return open_clusters[0]["cluster_id"] if open_clusters else None
+
+    def article_ids(self) -> List[int]:
+        cluster_id = self.current_cluster_id()
+        return [a["id"] for a in self.db.tables.get("SourceArticles", []) if a.get("cluster_id") == cluster_id]
+
+    def argument(self, name: str, annotation) -> Any:
+        """Returns a plausible value for a tool parameter."""
+        if name == "cluster_id":
+            return self.current_cluster_id()
+        if name == "article_ids":
+            return self.article_ids()
+        if name == "article_id":
+            ids = self.article_ids()
+            return ids[0] if ids else 1
+        if name == "timeline_json_data":
+            return {"ClusterId": [{"article_id": [str(i) for i in self.article_ids()]}]}
+        if name == "language":
+            return "en"
+        if annotation is int:
+            return 1
+        if annotation in (list, List[int], List[str]):
+            return []
+        if annotation in (dict, Dict[str, Any]):
+            return {}
+        return f"Benchmark {name.replace('_', ' ')}"
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic ADK model: one function call per tool, then a fixed-size text answer."""
+
+    agent_name: str = ""
+    scenario: Any = None
+    latency: float = 0.0
+    output_tokens: int = 300
+    stats: Any = None  # Shared dict: agent name -> call and token counts
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        prompt_chars = sum(len(p.text or "") for c in llm_request.contents for p in (c.parts or []))
+        if llm_request.config and isinstance(llm_request.config.system_instruction, str):
+            prompt_chars += len(llm_request.config.system_instruction)
+        call = self._next_tool_call(llm_request)
+
+        stats = self.stats.setdefault(self.agent_name, {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0})
+        stats["llm_calls"] += 1
+        stats["input_tokens"] += prompt_chars // 4
+
+        if call is not None:
+            stats["output_tokens"] += 20
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+            return
+
+        stats["output_tokens"] += self.output_tokens
+        words = " ".join(WORDS[i % len(WORDS)] for i in range(int(self.output_tokens * 0.75)))
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=words)]))
+
+    def _next_tool_call(self, llm_request: LlmRequest) -> Optional[types.FunctionCall]:
+        """Calls the agent's first function tool unless it has already answered in this turn."""
+        function_tools = [t for t in llm_request.tools_dict.values() if isinstance(t, FunctionTool)]
+        if not function_tools:
+            return None
+        last = llm_request.contents[-1] if llm_request.contents else None
+        if last is not None and any(p.function_response for p in (last.parts or [])):
+            return None
+
+        tool = function_tools[0]
+        args = {
+            name: self.scenario.argument(name, param.annotation)
+            for name, param in inspect.signature(tool.func).parameters.items()
+            if param.default is inspect.Parameter.empty or name == "language"
+        }
+        return types.FunctionCall(id=f"bench-{tool.name}-{time.monotonic_ns()}", name=tool.name, args=args)
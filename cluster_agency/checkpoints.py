@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from google.genai import types
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+
+# --------------------------------------------------------------------------
+# Durable ADK sessions with per-stage checkpoints
+# --------------------------------------------------------------------------
+
+"""
+SqliteSessionService keeps ADK sessions (state and events) in a local SQLite file,
+so a run that dies half way can be resumed by a later process.
+
+add_checkpoints() marks every sub-agent as completed in the session state when it
+finishes successfully ("checkpoint:<path of the agent>"), and skips it when the session
+is resumed. A restarted run therefore continues at the first incomplete stage and reuses
+the outputs of the finished ones (they are part of the persisted state and history)
+instead of paying for them again.
+
+The runner reports model errors, blocked responses and tool errors as events instead
+of raising, and still calls the after-agent callback. An LLM stage is therefore only
+checkpointed if it wrote its output_key in this run and none of its events carry an
+error; a sequential or parallel stage only once all of its sub-agents are checkpointed.
+"""
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+MAX_RESUME_ATTEMPTS = int(os.getenv("MAX_RESUME_ATTEMPTS", "3"))  # Resumes before a failing run is abandoned
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "7"))  # Finished sessions are pruned after this
+
+CHECKPOINT_PREFIX = "checkpoint:"
+OPEN, COMPLETE, ABANDONED = "open", "complete", "abandoned"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status TEXT NOT NULL,
+    resumes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, seq);
+"""
+
+
+# --------------------------------------------------------------------------
+# Session service
+# --------------------------------------------------------------------------
+
+class SqliteSessionService(InMemorySessionService):
+    """InMemorySessionService that writes every session and event through to SQLite."""
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        """
+        Args:
+            path (str): SQLite database file; created if it does not exist
+        """
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+
+    def _save_session(self, session: Session, status: Optional[str] = None):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions (app_name, user_id, id, state, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (app_name, user_id, id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                (session.app_name, session.user_id, session.id, json.dumps(session.state, default=str),
+                 status or OPEN, now, now)
+            )
+
+    def _load_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        """Loads a session from SQLite into the in-memory cache."""
+        row = self._db.execute(
+            "SELECT * FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", (app_name, user_id, session_id)
+        ).fetchone()
+        if row is None:
+            return None
+        events = [
+            Event.model_validate_json(r["event"]) for r in self._db.execute(
+                "SELECT event FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq",
+                (app_name, user_id, session_id)
+            )
+        ]
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=json.loads(row["state"]),
+                          events=events, last_update_time=row["updated_at"])
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        return session
+
+    def create_session(self, *, app_name: str, user_id: str, state: Optional[Dict[str, Any]] = None,
+                       session_id: Optional[str] = None) -> Session:
+        session = super().create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        self._save_session(session)
+        return session
+
+    def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Optional[Session]:
+        if session_id not in self.sessions.get(app_name, {}).get(user_id, {}):
+            if self._load_session(app_name, user_id, session_id) is None:
+                return None
+        return super().get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        stored = self.sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id, session)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)",
+                (session.app_name, session.user_id, session.id, event.model_dump_json(exclude_none=True))
+            )
+            self._db.execute(
+                "UPDATE sessions SET state = ?, updated_at = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                (json.dumps(stored.state, default=str), time.time(), session.app_name, session.user_id, session.id)
+            )
+        return event
+
+    def list_sessions(self, *, app_name: str, user_id: str):
+        for row in self._db.execute("SELECT id FROM sessions WHERE app_name = ? AND user_id = ?", (app_name, user_id)):
+            if row["id"] not in self.sessions.get(app_name, {}).get(user_id, {}):
+                self._load_session(app_name, user_id, row["id"])
+        return super().list_sessions(app_name=app_name, user_id=user_id)
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self.sessions.get(app_name, {}).get(user_id, {}).pop(session_id, None)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                             (app_name, user_id, session_id))
+            self._db.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                             (app_name, user_id, session_id))
+
+    # -- run bookkeeping ----------------------------------------------------
+
+    def set_status(self, app_name: str, user_id: str, session_id: str, status: str):
+        """Marks a session as open, complete or abandoned; closed sessions leave the memory cache."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE sessions SET status = ?, updated_at = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                (status, time.time(), app_name, user_id, session_id)
+            )
+        if status != OPEN:
+            self.sessions.get(app_name, {}).get(user_id, {}).pop(session_id, None)
+
+    def resume_or_create(self, app_name: str, user_id: str, session_id: Optional[str] = None,
+                         max_resumes: int = MAX_RESUME_ATTEMPTS) -> Session:
+        """
+        Returns the session to run: the given one, the newest open one, or a new session.
+
+        Open sessions that were already resumed max_resumes times are abandoned, so a run
+        that keeps failing at the same stage does not block the pipeline.
+
+        Args:
+            app_name (str): ADK app name
+            user_id (str): ADK user ID
+            session_id (str): Explicit session to resume or create (e.g. a job ID)
+            max_resumes (int): Resumes before an open session is abandoned
+
+        Returns:
+            Session: The session to pass to runner.run()
+        """
+        self.prune()
+        if session_id is None:
+            row = self._db.execute(
+                "SELECT id, resumes FROM sessions WHERE app_name = ? AND user_id = ? AND status = ? "
+                "ORDER BY updated_at DESC LIMIT 1", (app_name, user_id, OPEN)
+            ).fetchone()
+            if row is not None and row["resumes"] >= max_resumes:
+                print(f"Abandoning session {row['id']} after {row['resumes']} resume attempts.")
+                self.set_status(app_name, user_id, row["id"], ABANDONED)
+                row = None
+            session_id = row["id"] if row is not None else f"run-{time.strftime('%Y%m%d-%H%M%S')}"
+
+        session = self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is None:
+            return self.create_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+        with self._lock, self._db:
+            self._db.execute("UPDATE sessions SET resumes = resumes + 1 WHERE app_name = ? AND user_id = ? AND id = ?",
+                             (app_name, user_id, session_id))
+        done = completed_stages(session.state)
+        print(f"Resuming session {session_id}; completed stages: {', '.join(done) if done else 'none'}")
+        return session
+
+    def prune(self, retention_days: float = SESSION_RETENTION_DAYS) -> int:
+        """Deletes complete and abandoned sessions older than retention_days."""
+        cutoff = time.time() - retention_days * 86400
+        with self._lock, self._db:
+            ids = [r["id"] for r in self._db.execute(
+                "SELECT id FROM sessions WHERE status != ? AND updated_at < ?", (OPEN, cutoff)
+            )]
+            self._db.execute(
+                "DELETE FROM events WHERE session_id IN (SELECT id FROM sessions WHERE status != ? AND updated_at < ?)",
+                (OPEN, cutoff)
+            )
+            self._db.execute("DELETE FROM sessions WHERE status != ? AND updated_at < ?", (OPEN, cutoff))
+        return len(ids)
+
+
+# --------------------------------------------------------------------------
+# Stage checkpoints
+# --------------------------------------------------------------------------
+
+def completed_stages(state: Dict[str, Any]) -> List[str]:
+    """Names of the agents checkpointed as completed in a session state."""
+    return [key[len(CHECKPOINT_PREFIX):] for key, value in state.items()
+            if key.startswith(CHECKPOINT_PREFIX) and value]
+
+
+def is_run_complete(state: Dict[str, Any], root_agent) -> bool:
+    """True if every top-level stage of root_agent is checkpointed in the session state."""
+    return all(state.get(CHECKPOINT_PREFIX + stage.name) for stage in root_agent.sub_agents)
+
+
+def _stage_error(callback_context) -> Optional[str]:
+    """Describes the first error event of the current agent in this invocation, or None."""
+    # ADK 0.1.0 only exposes the session events through the invocation context
+    session = callback_context._invocation_context.session
+    for event in session.events:
+        if event.invocation_id != callback_context.invocation_id or event.author != callback_context.agent_name:
+            continue
+        if event.error_code or event.error_message:
+            return f"model error {event.error_code}: {event.error_message}"
+        for response in event.get_function_responses():
+            if isinstance(response.response, dict) and response.response.get("error"):
+                return f"tool {response.name} failed: {response.response['error']}"
+    return None
+
+
+def _wrote_output(callback_context, output_key: str) -> bool:
+    """True if the current agent saved its output_key in this invocation."""
+    session = callback_context._invocation_context.session
+    return any(event.invocation_id == callback_context.invocation_id
+               and event.author == callback_context.agent_name
+               and output_key in event.actions.state_delta
+               for event in session.events)
+
+
+def _stage_completed(callback_context, agent, stage: str) -> bool:
+    """True if the stage finished successfully in this invocation."""
+    error = _stage_error(callback_context)
+    if error:
+        print(f"Not checkpointing {stage}: {error}")
+        return False
+    if agent.sub_agents:
+        missing = [sub.name for sub in agent.sub_agents
+                   if not callback_context.state.get(f"{CHECKPOINT_PREFIX}{stage}/{sub.name}")]
+        if missing:
+            print(f"Not checkpointing {stage}: {', '.join(missing)} did not complete.")
+        return not missing
+    output_key = getattr(agent, "output_key", None)
+    if not output_key or not _wrote_output(callback_context, output_key):
+        print(f"Not checkpointing {stage}: no {output_key or 'output_key'} written.")
+        return False
+    return True
+
+
+def _checkpoint_callbacks(agent, stage: str):
+    """Returns the before/after agent callbacks that skip and record one stage, chained with the agent's own."""
+    key = CHECKPOINT_PREFIX + stage
+    before, after = agent.before_agent_callback, agent.after_agent_callback
+
+    def skip_if_completed(callback_context):
+        if callback_context.state.get(key):
+            print(f"Skipping {stage}: completed before the restart.")
+            return types.Content(role="model", parts=[types.Part(
+                text=f"{callback_context.agent_name} already completed; reusing its earlier output."
+            )])
+        return before(callback_context=callback_context) if before else None
+
+    def mark_completed(callback_context):
+        result = after(callback_context=callback_context) if after else None
+        if _stage_completed(callback_context, agent, stage):
+            callback_context.state[key] = True
+        return result
+
+    return skip_if_completed, mark_completed
+
+
+def add_checkpoints(root_agent, prefix: str = ""):
+    """
+    Adds checkpoint callbacks to every sub-agent of root_agent (recursively).
+
+    Stages are keyed by their path in the tree (e.g. "PlayerAgent/PlayerDetection"),
+    since some agent names are used in more than one branch. Callbacks the agents
+    already have still run: the checkpoint callbacks wrap them.
+
+    Args:
+        root_agent: The root of the agent tree; it is not checkpointed itself,
+            so every new message runs the remaining stages
+        prefix (str): Path of root_agent, used for the recursion
+    """
+    for sub_agent in root_agent.sub_agents:
+        stage = f"{prefix}{sub_agent.name}"
+        sub_agent.before_agent_callback, sub_agent.after_agent_callback = _checkpoint_callbacks(sub_agent, stage)
+        add_checkpoints(sub_agent, f"{stage}/")
@@ -0,0 +1,143 @@
+import os
+import sys
+import queue
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+# --------------------------------------------------------------------------
+# Background image jobs for freshly written cluster content
+# --------------------------------------------------------------------------
+
+"""
+When enabled, every row written by a write_*_to_db tool is handed to a background
+worker that runs the image pipeline (search query generation, candidate search and
+validation, upload) right away, instead of waiting for the next run of the
+*_view_images.yml cron. Rows the worker does not finish keep hasImage=false and
+are still picked up by the cron.
+
+Enable with IMAGE_JOBS_ENABLED=true. In worker mode (worker.py) the rows are handed
+to the durable job queue instead, see set_job_sink().
+"""
+
+IMAGE_JOBS_ENABLED = os.getenv("IMAGE_JOBS_ENABLED", "").lower() in ("1", "true", "yes")
+IMAGE_JOBS_DRAIN_TIMEOUT = float(os.getenv("IMAGE_JOBS_DRAIN_TIMEOUT", "600"))  # Seconds to wait for pending jobs at exit
+
+IMAGE_AGENCY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "image_agency")
+
+_jobs: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+_job_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def set_job_sink(sink: Optional[Callable[[Dict[str, Any]], None]]):
+    """
+    Hands new content rows to sink instead of the background image worker.
+
+    Args:
+        sink (callable): Called with one job dict (table, id, headline, content, cluster_id)
+            per written row, or None to restore the background worker
+    """
+    global _job_sink
+    _job_sink = sink
+
+
+def _create_image_service():
+    """Import and initialize the image pipeline from image_agency."""
+    # image_agency uses flat imports and is normally run from its own directory
+    if IMAGE_AGENCY_DIR not in sys.path:
+        sys.path.append(IMAGE_AGENCY_DIR)
+    from main_image_service import MainImageService
+    return MainImageService()
+
+
+def _run_worker():
+    """Process image jobs until the stop sentinel is received."""
+    try:
+        service = _create_image_service()
+    except Exception as e:
+        print(f"Image worker could not start, leaving images to the scheduled job: {e}")
+        service = None
+
+    while True:
+        job = _jobs.get()
+        try:
+            if job is None:
+                return
+            if service is None:
+                continue
+            print(f"Image worker: processing {job['table']} row {job['id']}.")
+            service.process_article_and_upload_image(job["id"], job["table"], article=job)
+        except Exception as e:
+            print(f"Image worker: failed on {job['table']} row {job['id']}: {e}")
+        finally:
+            _jobs.task_done()
+
+
+def _ensure_worker():
+    """Start the background worker on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="image-jobs", daemon=True)
+            _worker.start()
+
+
+def enqueue_image_job(table_name: str, rows: List[Dict[str, Any]]):
+    """
+    Queues image jobs for newly written content rows.
+
+    Args:
+        table_name (str): The table the rows were written to (e.g. "cluster_player_view")
+        rows (list): The inserted rows as returned by Supabase, with id, cluster_id and content
+
+    Returns:
+        int: The number of jobs queued (0 when image jobs are disabled and no job sink is set)
+    """
+    if not rows or (_job_sink is None and not IMAGE_JOBS_ENABLED):
+        return 0
+
+    queued = 0
+    for row in rows:
+        if not row.get("id") or not row.get("content"):
+            continue
+        job = {
+            "table": table_name,
+            "id": row["id"],
+            "headline": row.get("headline"),
+            "content": row["content"],
+            "cluster_id": row.get("cluster_id"),
+        }
+        if _job_sink is not None:
+            _job_sink(job)
+        else:
+            _jobs.put(job)
+        queued += 1
+
+    if queued:
+        if _job_sink is None:
+            _ensure_worker()
+        print(f"Queued {queued} image job(s) for {table_name}.")
+    return queued
+
+
+def wait_for_image_jobs(timeout: float = IMAGE_JOBS_DRAIN_TIMEOUT):
+    """
+    Stops the background worker after it has finished the queued jobs.
+
+    Args:
+        timeout (float): Maximum number of seconds to wait
+
+    Returns:
+        bool: True if all queued jobs finished, False if the timeout was reached
+    """
+    if _worker is None:
+        return True
+
+    print(f"Waiting up to {timeout:.0f}s for {_jobs.qsize()} pending image job(s)...")
+    _jobs.put(None)
+    _worker.join(timeout)
+    if _worker.is_alive():
+        print("Image jobs still running at timeout; remaining articles are left to the scheduled job.")
+        return False
+    return True
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable
+
+# --------------------------------------------------------------------------
+# Durable local job queue (SQLite)
+# --------------------------------------------------------------------------
+
+"""
+A small persistent job queue used by worker.py to chain the cluster, translation
+and image stages without cron polling.
+
+- Jobs are claimed highest priority first, then oldest first.
+- A claimed job is leased for a visibility timeout. If the worker dies, the lease
+  expires and the job becomes claimable again.
+- Failed jobs are retried with exponential backoff until max_attempts, after which
+  they are moved to the dead-letter state and kept for inspection and requeueing.
+- An optional dedup_key prevents queueing the same work twice while an earlier
+  job for it is still queued or running.
+"""
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "600"))  # Seconds a claimed job stays leased
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "30"))  # Seconds before the first retry, doubled after each failure
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "3600"))
+
+QUEUED, RUNNING, DONE, DEAD = "queued", "running", "done", "dead"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    dedup_key TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, available_at, id);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+"""
+
+
+class JobQueue:
+    """SQLite-backed job queue with visibility timeouts, retries, dead-lettering and priorities."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_base_delay: float = JOB_RETRY_BASE_DELAY,
+                 retry_max_delay: float = JOB_RETRY_MAX_DELAY):
+        """
+        Args:
+            path (str): SQLite database file; created if it does not exist
+            visibility_timeout (float): Default lease in seconds for claimed jobs
+            max_attempts (int): Default number of attempts before a job is dead-lettered
+            retry_base_delay (float): Seconds before the first retry
+            retry_max_delay (float): Upper bound of the retry delay
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are started explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Runs a block in a write transaction, serialized across threads and processes."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    # -- producers ----------------------------------------------------------
+
+    def enqueue(self, kind: str, payload: Optional[Dict[str, Any]] = None, priority: int = 0,
+                delay: float = 0, dedup_key: Optional[str] = None, max_attempts: Optional[int] = None) -> Optional[int]:
+        """
+        Adds a job to the queue.
+
+        Args:
+            kind (str): Job type, used by the worker to pick a handler
+            payload (dict): JSON-serializable job arguments
+            priority (int): Higher priorities are claimed first
+            delay (float): Seconds before the job becomes claimable
+            dedup_key (str): Skip the job if one with this key is already queued or running
+            max_attempts (int): Attempts before dead-lettering (default: the queue's setting)
+
+        Returns:
+            int: The new job ID, or None if it was deduplicated
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if dedup_key is not None:
+                existing = db.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) LIMIT 1",
+                    (dedup_key, QUEUED, RUNNING)
+                ).fetchone()
+                if existing:
+                    return None
+            cursor = db.execute(
+                "INSERT INTO jobs (kind, payload, priority, status, max_attempts, available_at, dedup_key, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload or {}, default=str), priority, QUEUED,
+                 max_attempts or self.max_attempts, now + delay, dedup_key, now, now)
+            )
+            return cursor.lastrowid
+
+    # -- consumers ----------------------------------------------------------
+
+    def claim(self, kinds: Optional[Iterable[str]] = None, visibility_timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Leases the next available job.
+
+        Running jobs whose lease has expired are claimable again; if they already used
+        all their attempts they are dead-lettered instead.
+
+        Args:
+            kinds (list): Only claim jobs of these kinds (default: any)
+            visibility_timeout (float): Lease in seconds (default: the queue's setting)
+
+        Returns:
+            dict: The claimed job with its decoded payload, or None if no job is available
+        """
+        now = time.time()
+        kind_filter, params = "", []
+        if kinds is not None:
+            kinds = list(kinds)
+            kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})"
+            params = kinds
+
+        with self._transaction() as db:
+            # Jobs whose worker died after their last attempt go straight to the dead letters
+            db.execute(
+                "UPDATE jobs SET status = ?, last_error = COALESCE(last_error, 'Lease expired'), updated_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (DEAD, now, RUNNING, now)
+            )
+            row = db.execute(
+                f"SELECT * FROM jobs WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?)) "
+                f"{kind_filter} ORDER BY priority DESC, available_at, id LIMIT 1",
+                [QUEUED, now, RUNNING, now] + params
+            ).fetchone()
+            if row is None:
+                return None
+            lease = visibility_timeout if visibility_timeout is not None else self.visibility_timeout
+            db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now + lease, now, row["id"])
+            )
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._to_job(row)
+
+    def extend(self, job_id: int, seconds: Optional[float] = None) -> None:
+        """Extends the lease of a running job (heartbeat for long jobs)."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (now + (seconds or self.visibility_timeout), now, job_id, RUNNING)
+            )
+
+    def complete(self, job_id: int) -> None:
+        """Marks a job as done."""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                (DONE, time.time(), job_id)
+            )
+
+    def fail(self, job_id: int, error: str) -> str:
+        """
+        Records a failed attempt and schedules a retry, or dead-letters the job.
+
+        Args:
+            job_id (int): The failed job
+            error (str): Error message kept on the job
+
+        Returns:
+            str: The job's new status ("queued" or "dead")
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return DEAD
+            if row["attempts"] >= row["max_attempts"]:
+                status, available_at = DEAD, now
+            else:
+                delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (row["attempts"] - 1))
+                status, available_at = QUEUED, now + delay
+            db.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (status, available_at, error[:2000], now, job_id)
+            )
+            return status
+
+    # -- inspection ---------------------------------------------------------
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns job counts per kind and status."""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        return counts
+
+    def next_available_in(self) -> Optional[float]:
+        """Seconds until the next queued job becomes claimable, or None if nothing is pending."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(CASE WHEN status = ? THEN available_at ELSE lease_expires_at END) AS t "
+                "FROM jobs WHERE status IN (?, ?)",
+                (QUEUED, QUEUED, RUNNING)
+            ).fetchone()
+        if row is None or row["t"] is None:
+            return None
+        return max(0.0, row["t"] - time.time())
+
+    def dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Returns the most recently dead-lettered jobs."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?", (DEAD, limit)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def requeue(self, job_id: int) -> bool:
+        """
+        Moves a dead-lettered job back to the queue with a fresh set of attempts.
+
+        Like enqueue, a job is not requeued while another job with its dedup_key is
+        queued or running.
+
+        Args:
+            job_id (int): The dead-lettered job
+
+        Returns:
+            bool: True if the job was requeued
+        """
+        now = time.time()
+        with self._transaction() as db:
+            duplicate = db.execute(
+                "SELECT 1 FROM jobs AS other JOIN jobs AS job ON other.dedup_key = job.dedup_key "
+                "WHERE job.id = ? AND other.id != job.id AND other.status IN (?, ?) LIMIT 1",
+                (job_id, QUEUED, RUNNING)
+            ).fetchone()
+            if duplicate:
+                return False
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, now, now, job_id, DEAD)
+            )
+            return cursor.rowcount > 0
+
+    def purge_done(self, older_than: float = 7 * 24 * 3600) -> int:
+        """Deletes finished jobs older than the given number of seconds."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "DELETE FROM jobs WHERE status = ? AND updated_at < ?", (DONE, time.time() - older_than)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        self._db.close()
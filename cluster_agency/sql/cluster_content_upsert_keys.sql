@@ -0,0 +1,46 @@
+-- --------------------------------------------------------------------------
+-- Summary and view upsert keys: one row per cluster, language (and entity)
+-- --------------------------------------------------------------------------
+--
+-- tools.upsert_cluster_content inserts with on_conflict on these columns and
+-- ignores duplicates, so a resumed run, a worker job and a retried tool call
+-- that race for the same key cannot create a second row. Postgres only accepts
+-- the on_conflict target with a unique index on exactly these columns.
+--
+-- Duplicates written before the index existed are removed first: the newest row
+-- (highest id) is kept, and the translations of the removed rows go with them.
+-- Safe to run more than once.
+
+do $$
+declare
+    target record;
+begin
+    for target in
+        select * from (values
+            ('cluster_summary', 'cluster_id, language'),
+            ('cluster_player_view', 'cluster_id, language, player'),
+            ('cluster_coach_view', 'cluster_id, language, coach'),
+            ('cluster_team_view', 'cluster_id, language, team'),
+            ('cluster_franchise_view', 'cluster_id, language, team'),
+            ('cluster_dynamic_view', 'cluster_id, language, view')
+        ) as t (table_name, key_columns)
+    loop
+        execute format(
+            'delete from public.%1$I where %2$I in ('
+            '  select id from (select id, row_number() over (partition by %3$s order by id desc) as n'
+            '                  from public.%4$I) ranked where n > 1)',
+            target.table_name || '_int', target.table_name || '_id', target.key_columns, target.table_name
+        );
+        execute format(
+            'delete from public.%1$I where id in ('
+            '  select id from (select id, row_number() over (partition by %2$s order by id desc) as n'
+            '                  from public.%1$I) ranked where n > 1)',
+            target.table_name, target.key_columns
+        );
+        execute format(
+            'create unique index if not exists %1$I on public.%2$I (%3$s)',
+            target.table_name || '_upsert_key_idx', target.table_name, target.key_columns
+        );
+    end loop;
+end
+$$;
@@ -0,0 +1,61 @@
+-- --------------------------------------------------------------------------
+-- write_timelines: atomic timeline + article link write (used by tools.py)
+-- --------------------------------------------------------------------------
+--
+-- Inserts every timeline in the argument together with its timeline_article_links
+-- rows in one transaction: either all timelines and links are written or none.
+-- Article IDs are collected from timeline_data->'ClusterId'[*]->'article_id' and
+-- deduplicated here by their text value, so "123" and 123 are one link. Column types are taken from the tables via
+-- jsonb_populate_record(set), so the function does not assume the ID types.
+--
+-- Call:    select write_timelines('[{"timeline_name": "...", "timeline_data": {...}}]');
+-- Returns: [{"timeline_name": "...", "timeline_id": 123, "links": 4}, ...]
+
+create or replace function public.write_timelines(timelines jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    item jsonb;
+    new_id timelines.id%type;
+    link_count integer;
+    result jsonb := '[]'::jsonb;
+begin
+    for item in select value from jsonb_array_elements(timelines) loop
+        if coalesce(item->>'timeline_name', '') = '' or jsonb_typeof(item->'timeline_data') is distinct from 'object' then
+            raise exception 'write_timelines: invalid timeline %', left(item::text, 200);
+        end if;
+
+        insert into timelines (timeline_name, timeline_data)
+        select r.timeline_name, r.timeline_data
+        from jsonb_populate_record(null::timelines, item) as r
+        returning id into new_id;
+
+        insert into timeline_article_links (timeline_id, article_id)
+        select l.timeline_id, l.article_id
+        from jsonb_populate_recordset(
+            null::timeline_article_links,
+            (
+                select coalesce(jsonb_agg(distinct jsonb_build_object('timeline_id', new_id, 'article_id', a.article_id #>> '{}')), '[]'::jsonb)
+                from jsonb_array_elements(
+                         case when jsonb_typeof(item->'timeline_data'->'ClusterId') = 'array'
+                              then item->'timeline_data'->'ClusterId' else '[]'::jsonb end
+                     ) as c(cluster_entry)
+                cross join lateral jsonb_array_elements(
+                         case when jsonb_typeof(c.cluster_entry->'article_id') = 'array'
+                              then c.cluster_entry->'article_id' else '[]'::jsonb end
+                     ) as a(article_id)
+                where jsonb_typeof(a.article_id) in ('string', 'number')
+            )
+        ) as l;
+        get diagnostics link_count = row_count;
+
+        result := result || jsonb_build_array(jsonb_build_object(
+            'timeline_name', item->>'timeline_name',
+            'timeline_id', new_id,
+            'links', link_count
+        ));
+    end loop;
+    return result;
+end;
+$$;
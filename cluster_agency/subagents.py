@@ -1,10 +1,10 @@
 # ADK Imports
 from google.adk.agents import LlmAgent
 from google.adk.tools import google_search
-from google.adk.models.lite_llm import LiteLlm
 
 # Internal Imports
 from utils import load_instruction_from_file
+from shared.routed_llm import routed_model  # Models per stage are configured in shared/model_router.py
 from tools import fetch_cluster_ids, fetch_articles_by_cluster_id, fetch_cluster_contents, write_summary_to_db, write_timeline_to_db, write_player_view_to_db, write_coaches_view_to_db, write_team_view_to_db, write_franchise_view_to_db, write_dynamic_view_to_db, close_cluster_by_id
 
 #--------------------------------------------------------------------------
@@ -28,7 +28,7 @@ to create the baseline for the 360 degree view.
 # --- Sub Agent 1.1: Article Cluster Id Fetcher ---
 fetch_cluster_id_agent = LlmAgent(
     name="FetchClusterId",
-    model=LiteLlm(model="openai/gpt-4.1-mini"),
+    model=routed_model("FetchClusterId"),
     instruction=load_instruction_from_file("fetch_cluster_id_instructions.txt"),
     tools=[fetch_cluster_ids],
     output_key="cluster_id",  # Save result to state
@@ -37,7 +37,7 @@ fetch_cluster_id_agent = LlmAgent(
 # --- Sub Agent 1.2: Article Fetcher ---
 fetch_cluster_articles_id_agent = LlmAgent(
     name="FetchClusterArticlesId",
-    model=LiteLlm(model="openai/gpt-4.1-mini"),
+    model=routed_model("FetchClusterArticlesId"),
     instruction=load_instruction_from_file("fetch_cluster_articles_ids_instructions.txt"),
     tools=[fetch_articles_by_cluster_id],
     output_key="article_ids",  # Save result to state
@@ -46,7 +46,7 @@ fetch_cluster_articles_id_agent = LlmAgent(
 # --- Sub Agent 1.3: Article Content Extractor ---
 extract_article_content_agent = LlmAgent(
     name="ExtractArticleContent",
-    model=LiteLlm(model="openai/gpt-4.1-mini"),
+    model=routed_model("ExtractArticleContent"),
     instruction=load_instruction_from_file("extract_article_content_instructions.txt"),
     tools=[fetch_cluster_contents],
     output_key="cluster_content",  # Save result to state
@@ -55,7 +55,7 @@ extract_article_content_agent = LlmAgent(
 # --- Sub Agent 1.4: Summary Creator ---
 summary_creator_agent = LlmAgent(
     name="SummaryCreator",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("SummaryCreator"),
     instruction=load_instruction_from_file("summary_creator_instructions.txt"),
     tools=[],
     output_key="summary",  # Save result to state
@@ -64,7 +64,7 @@ summary_creator_agent = LlmAgent(
 # --- Sub Agent 1.5: Timeline Creator ---
 timeline_creator_agent = LlmAgent(
     name="TimelineCreator",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("TimelineCreator"),
     instruction=load_instruction_from_file("timeline_creator_instructions.txt"),
     tools=[],
     output_key="timeline",  # Save result to state
@@ -84,7 +84,7 @@ The following group of agents will be used to review the content of the cluster
 # --- Sub Agent 2.1: Player Detection ---
 player_detection_agent = LlmAgent(
     name="PlayerDetection",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("PlayerDetection"),
     instruction=load_instruction_from_file("player_detection_instructions.txt"),
     tools=[google_search],
     output_key="player_name", 
@@ -93,7 +93,7 @@ player_detection_agent = LlmAgent(
 # --- Sub Agent 2.2: Player Perspective ---
 player_perspective_agent = LlmAgent(
     name="PlayerPerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("PlayerPerspective"),
     instruction=load_instruction_from_file("player_perspective_instructions.txt"),
     tools=[google_search],
     output_key="player_perspective", 
@@ -102,7 +102,7 @@ player_perspective_agent = LlmAgent(
 # --- Sub Agent 2.3: Coach Detection ---
 coach_detection_agent = LlmAgent(
     name="CoachDetection",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("CoachDetection"),
     instruction=load_instruction_from_file("coach_detection_instructions.txt"),
     tools=[google_search],
     output_key="coach_name", 
@@ -111,7 +111,7 @@ coach_detection_agent = LlmAgent(
 # --- Sub Agent 2.4: Coach Perspective ---
 coach_perspective_agent = LlmAgent(
     name="CoachPerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("CoachPerspective"),
     instruction=load_instruction_from_file("coach_perspective_instructions.txt"),
     tools=[google_search],
     output_key="coach_perspective", 
@@ -120,7 +120,7 @@ coach_perspective_agent = LlmAgent(
 # --- Sub Agent 2.5: Team Detection ---
 team_detection_agent = LlmAgent(
     name="TeamDetection",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("TeamDetection"),
     instruction=load_instruction_from_file("team_detection_instructions.txt"),
     tools=[google_search],
     output_key="team_name", 
@@ -128,7 +128,7 @@ team_detection_agent = LlmAgent(
 # --- Sub Agent 2.6: Team Perspective ---
 team_perspective_agent = LlmAgent(
     name="TeamPerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("TeamPerspective"),
     instruction=load_instruction_from_file("team_perspective_instructions.txt"),
     tools=[google_search],
     output_key="team_perspective", 
@@ -137,7 +137,7 @@ team_perspective_agent = LlmAgent(
 # --- Sub Agent 2.7: Franchise Perspective ---
 franchise_perspective_agent = LlmAgent(
     name="FranchisePerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("FranchisePerspective"),
     instruction=load_instruction_from_file("franchise_perspective_instructions.txt"),
     tools=[google_search],
     output_key="franchise_perspective", 
@@ -154,7 +154,7 @@ Therefore the articles will be analyzed for 1 additional dynamic perspective tha
 # --- Sub Agent 3.1: Dynamic Perspective Detection ---
 first_dynamic_perspective_detection_agent = LlmAgent(
     name="firstDynamicPerspectiveDetection",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("firstDynamicPerspectiveDetection"),
     instruction=load_instruction_from_file("first_dynamic_perspective_detection_instructions.txt"),
     tools=[google_search],
     output_key="dynamic_name1", 
@@ -162,7 +162,7 @@ first_dynamic_perspective_detection_agent = LlmAgent(
 # --- Sub Agent 3.2: Dynamic Perspective ---   
 first_dynamic_perspective_agent = LlmAgent(
     name="firstDynamicPerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("firstDynamicPerspective"),
     instruction=load_instruction_from_file("first_dynamic_perspective_instructions.txt"),
     tools=[google_search],
     output_key="dynamic_perspective", 
@@ -171,7 +171,7 @@ first_dynamic_perspective_agent = LlmAgent(
 # --- Sub Agent 3.3: Dynamic Perspective ---
 second_dynamic_perspective_detection_agent = LlmAgent(
     name="secondDynamicPerspectiveDetection",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("secondDynamicPerspectiveDetection"),
     instruction=load_instruction_from_file("second_dynamic_perspective_detection_instructions.txt"),
     tools=[google_search],
     output_key="dynamic_name2", 
@@ -179,7 +179,7 @@ second_dynamic_perspective_detection_agent = LlmAgent(
 # --- Sub Agent 3.4: Dynamic Perspective ---   
 second_dynamic_perspective_agent = LlmAgent(
     name="secondDynamicPerspective",
-    model="gemini-2.5-flash-preview-04-17",
+    model=routed_model("secondDynamicPerspective"),
     instruction=load_instruction_from_file("second_dynamic_perspective_instructions.txt"),
     tools=[google_search],
     output_key="dynamic_perspective2", 
@@ -207,7 +207,7 @@ def make_content_analyst(content_key: str) -> LlmAgent:
 
     return LlmAgent(
         name=f"ContentAnalyst_{content_key}",   # brackets → underscore
-        model="gemini-2.0-flash-lite",
+        model=routed_model(f"ContentAnalyst_{content_key}"),
         instruction=instruction,
         tools=[],
         output_key="analysis_report",
@@ -223,7 +223,7 @@ def make_data_cleaner(content_key: str) -> LlmAgent:
     )
     return LlmAgent(
         name=f"DataCleaner_{content_key}",
-        model="gemini-2.5-flash-preview-04-17",
+        model=routed_model(f"DataCleaner_{content_key}"),
         instruction=instruction,    
         tools=[],
         output_key="cleaned_data",  # Save result to state
@@ -232,7 +232,7 @@ def make_data_cleaner(content_key: str) -> LlmAgent:
 # --- Sub Agent 4.3.1.: Summary Uploader ---
 summary_uploader = LlmAgent(
     name="SummaryUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("SummaryUploader"),
     instruction=load_instruction_from_file("summary_uploader_instructions.txt"),
     tools=[write_summary_to_db],
     output_key="summary_response", 
@@ -241,7 +241,7 @@ summary_uploader = LlmAgent(
 # --- Sub Agent 4.3.2.: timeline Uploader ---
 timeline_uploader = LlmAgent(
     name="TimelineUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("TimelineUploader"),
     instruction=load_instruction_from_file("timeline_uploader_instructions.txt"),
     tools=[write_timeline_to_db],
     output_key="timeline_response", 
@@ -250,7 +250,7 @@ timeline_uploader = LlmAgent(
 # --- Sub Agent 4.3.3.: Player view Uploader ---
 player_view_uploader = LlmAgent(
     name="PlayerViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("PlayerViewUploader"),
     instruction=load_instruction_from_file("player_view_uploader_instructions.txt"),
     tools=[write_player_view_to_db],
     output_key="player_view_response", 
@@ -259,7 +259,7 @@ player_view_uploader = LlmAgent(
 # --- Sub Agent 4.3.4.: Coach view Uploader ---
 coach_view_uploader = LlmAgent(
     name="CoachViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("CoachViewUploader"),
     instruction=load_instruction_from_file("coach_view_uploader_instructions.txt"),
     tools=[write_coaches_view_to_db],
     output_key="coach_view_response", 
@@ -268,7 +268,7 @@ coach_view_uploader = LlmAgent(
 # --- Sub Agent 4.3.5.: Team view Uploader ---
 team_view_uploader = LlmAgent(
     name="TeamViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("TeamViewUploader"),
     instruction=load_instruction_from_file("team_view_uploader_instructions.txt"),
     tools=[write_team_view_to_db],
     output_key="team_view_response", 
@@ -277,7 +277,7 @@ team_view_uploader = LlmAgent(
 # --- Sub Agent 4.3.6.: Franchise view Uploader ---
 franchise_view_uploader = LlmAgent(
     name="FranchiseViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("FranchiseViewUploader"),
     instruction=load_instruction_from_file("franchise_view_uploader_instructions.txt"),
     tools=[write_franchise_view_to_db],
     output_key="franchise_view_response", 
@@ -286,7 +286,7 @@ franchise_view_uploader = LlmAgent(
 # --- Sub Agent 4.3.7.: First Dynamic view Uploader ---
 first_dynamic_view_uploader = LlmAgent(
     name="DynamicViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("DynamicViewUploader"),
     instruction=load_instruction_from_file("dynamic_view1_uploader_instructions.txt"),
     tools=[write_dynamic_view_to_db],
     output_key="first_dynamic_view_response", 
@@ -295,7 +295,7 @@ first_dynamic_view_uploader = LlmAgent(
 # --- Sub Agent 4.3.8.: Second Dynamic view Uploader ---
 second_dynamic_view_uploader = LlmAgent(
     name="DynamicViewUploader",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("DynamicViewUploader"),
     instruction=load_instruction_from_file("dynamic_view2_uploader_instructions.txt"),
     tools=[write_dynamic_view_to_db],
     output_key="second_dynamic_view_response", 
@@ -311,7 +311,7 @@ Finally the cluster will be closed and the isContent status of the cluster will
 # --- Sub Agent 5.1: Close Cluster ---
 close_cluster_id_agent = LlmAgent(
     name="CloseClusterId",
-    model="gemini-2.0-flash-lite",
+    model=routed_model("CloseClusterId"),
     instruction=load_instruction_from_file("close_cluster_id_instructions.txt"),
     tools=[close_cluster_by_id],
     output_key="close_cluster_response", 
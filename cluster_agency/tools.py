@@ -1,14 +1,25 @@
 import os
+import hashlib
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from typing import Dict, Any, List, Optional, Set
 
+from image_jobs import enqueue_image_job
+from shared.resilience import call
+
 load_dotenv()
 
 # --------------------------------------------------------------------------
 # Tools to fetch cluster information and articles from Supabase
 # --------------------------------------------------------------------------
 
+"""
+Every Supabase request goes through resilience.call("supabase", ...): transient
+errors are retried with jittered backoff and a flapping database trips its circuit
+breaker, so the agent fails fast instead of waiting on every tool call. Plain
+inserts and the write_timelines function are not idempotent and get a single attempt.
+"""
+
 def fetch_cluster_ids():
     """
     Fetches the oldest cluster ID from the clusters table where status is 'NEW' and isContent is false.
@@ -23,13 +34,13 @@ def fetch_cluster_ids():
     supabase: Client = create_client(url, key)
 
 
-    response = supabase.table('clusters') \
+    query = supabase.table('clusters') \
         .select('cluster_id') \
         .eq('isContent', False) \
         .eq('status', 'NEW') \
         .order('created_at') \
-        .limit(1) \
-        .execute()
+        .limit(1)
+    response = call("supabase", query.execute)
     
     cluster_ids = [record['cluster_id'] for record in response.data]
     print("Found oldest cluster ID:", cluster_ids)
@@ -47,10 +58,10 @@ def fetch_articles_by_cluster_id(cluster_id: str):
     key: str = os.environ.get("SUPABASE_KEY")
     supabase: Client = create_client(url, key)
     
-    response = supabase.table('SourceArticles') \
+    query = supabase.table('SourceArticles') \
         .select('*') \
-        .eq('cluster_id', cluster_id) \
-        .execute()
+        .eq('cluster_id', cluster_id)
+    response = call("supabase", query.execute)
     
     articles = response.data
     print(f"Fetched {len(articles)} articles for cluster ID {cluster_id}.")
@@ -71,10 +82,10 @@ def fetch_cluster_contents(article_ids: list[int]):
     supabase: Client = create_client(url, key)
 
     # Query all articles by IDs
-    response = supabase.table("SourceArticles") \
+    query = supabase.table("SourceArticles") \
         .select("Content, headline, created_at") \
-        .in_("id", article_ids) \
-        .execute()
+        .in_("id", article_ids)
+    response = call("supabase", query.execute)
     
     # Get data from response
     articles = response.data if response.data else []
@@ -87,6 +98,87 @@ def fetch_cluster_contents(article_ids: list[int]):
 # Tools to write results and articles back to Supabase
 #--------------------------------------------------------------------------
 
+def content_hash(headline: Optional[str], content: Optional[str]) -> str:
+    """
+    Hashes a headline and content, to detect rewrites that did not change anything.
+
+    Args:
+        headline (str): The headline
+        content (str): The content
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    text = f"{(headline or '').strip()}\n{(content or '').strip()}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def upsert_cluster_content(table_name: str, match: Dict[str, Any], headline: str, content: str):
+    """
+    Writes a summary or view row with upsert semantics on its key columns.
+
+    The table is the view type and match holds cluster_id, language and, for views,
+    the entity column (player, coach, team or view). If a row with that key exists
+    and its headline and content are unchanged, nothing is written and no image or
+    translation work is queued; if they changed, that row is updated in place.
+    New rows are inserted with on_conflict on the key columns and duplicates ignored,
+    so the unique index (sql/cluster_content_upsert_keys.sql) keeps retried tool
+    calls, resumed runs and worker jobs that race for the same key from creating
+    duplicate rows; the insert is therefore safe to retry.
+
+    An updated row keeps its image (hasImage and its cluster_images row are left
+    alone and no image job is queued), but its translations were made from the old
+    text: they are deleted from <table>_int, so the translation sweep
+    (translate-articles.py, or the worker's translate_sweep) translates the row again.
+
+    Args:
+        table_name (str): The summary or view table
+        match (dict): Column values identifying the row
+        headline (str): The headline
+        content (str): The content
+
+    Returns:
+        list: The written (or unchanged existing) rows
+    """
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_KEY")
+    supabase: Client = create_client(url, key)
+
+    def fetch_existing():
+        query = supabase.table(table_name).select('id, cluster_id, headline, content')
+        for column, value in match.items():
+            query = query.eq(column, value)
+        return call("supabase", query.order('id', desc=True).limit(1).execute).data
+
+    data = dict(match, headline=headline, content=content)
+    existing = fetch_existing()
+    if not existing:
+        # The unique index on the key columns (sql/cluster_content_upsert_keys.sql) decides races:
+        # only one concurrent writer inserts, the others get no row back and compare instead
+        insert = supabase.table(table_name).upsert(data, on_conflict=",".join(match), ignore_duplicates=True)
+        response = call("supabase", insert.execute)
+        if response.data:
+            print(f"Written {table_name} for cluster {match['cluster_id']} to database.")
+            enqueue_image_job(table_name, response.data)
+            return response.data
+        existing = fetch_existing()
+
+    row = existing[0]
+    if content_hash(row.get('headline'), row.get('content')) == content_hash(headline, content):
+        print(f"{table_name} row {row['id']} for cluster {match['cluster_id']} is unchanged; skipping write.")
+        return existing
+    # Stale translations go first: if the update then fails, they are only redone from the old text
+    stale = supabase.table(f"{table_name}_int") \
+        .delete() \
+        .eq(f"{table_name}_id", row['id'])
+    call("supabase", stale.execute)
+    update = supabase.table(table_name) \
+        .update(data) \
+        .eq('id', row['id'])
+    response = call("supabase", update.execute)
+    print(f"Updated {table_name} row {row['id']} for cluster {match['cluster_id']}; "
+          f"its translations will be redone, its image is kept.")
+    return response.data
+
 def write_summary_to_db(cluster_id: str, headline: str, content: str, language: str = "en"):
     """
     Write the summary to the cluster_summary table in Supabase.
@@ -100,23 +192,78 @@ def write_summary_to_db(cluster_id: str, headline: str, content: str, language:
     Returns:
         dict: Response data from the database operation
     """
+    match = {
+        "cluster_id": cluster_id,
+        "language": language
+    }
+    return upsert_cluster_content('cluster_summary', match, headline, content)
+
+def write_timelines_to_db(timelines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Writes one or more timelines and their timeline_article_links atomically.
+
+    Uses the write_timelines database function (sql/write_timelines.sql), which
+    inserts all timelines and their deduplicated article links in one transaction
+    and one round trip. If the function is not deployed, the timelines are written
+    with separate requests and a timeline whose links fail is deleted again.
+
+    Args:
+        timelines (list): Dicts with "timeline_name" and "timeline_data"; timeline_data
+            is expected to have a "ClusterId" array whose entries list "article_id"s
+
+    Returns:
+        list: One dict per timeline with timeline_name, timeline_id and the number of links
+    """
     url: str = os.environ.get("SUPABASE_URL")
     key: str = os.environ.get("SUPABASE_KEY")
     supabase: Client = create_client(url, key)
-    
-    data = {
-        "cluster_id": cluster_id,
-        "language": language,
-        "headline": headline,
-        "content": content
-    }
-    
-    response = supabase.table('cluster_summary') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+
+    timelines = [
+        {"timeline_name": t.get("timeline_name"), "timeline_data": t.get("timeline_data")}
+        for t in timelines
+    ]
+    if not timelines:
+        return []
+
+    try:
+        response = call("supabase", supabase.rpc('write_timelines', {'timelines': timelines}).execute,
+                        max_attempts=1)
+    except Exception as e:
+        # PGRST202: the function does not exist in the database (yet)
+        if getattr(e, 'code', None) != 'PGRST202':
+            raise
+        print("write_timelines function not found; writing timelines with separate requests.")
+        return [_write_timeline_without_rpc(supabase, t) for t in timelines]
+
+    results = response.data or []
+    for result in results:
+        print(f"Successfully inserted timeline: '{result['timeline_name']}' with ID: {result['timeline_id']} "
+              f"and {result['links']} article link(s).")
+    return results
+
+def _write_timeline_without_rpc(supabase: Client, timeline: Dict[str, Any]) -> Dict[str, Any]:
+    """Writes one timeline and its links with two requests, deleting the timeline if the links fail."""
+    timeline_response = call("supabase", supabase.table('timelines').insert(timeline).execute, max_attempts=1)
+    timeline_id = timeline_response.data[0]['id']
+
+    article_ids: Set[str] = set()
+    for cluster in timeline["timeline_data"].get("ClusterId") or []:
+        if isinstance(cluster, dict) and isinstance(cluster.get("article_id"), list):
+            article_ids.update(str(article_id) for article_id in cluster["article_id"])
+
+    try:
+        if article_ids:
+            links = supabase.table('timeline_article_links').insert(
+                [{'timeline_id': timeline_id, 'article_id': article_id} for article_id in sorted(article_ids)]
+            )
+            call("supabase", links.execute, max_attempts=1)
+    except Exception:
+        call("supabase", supabase.table('timelines').delete().eq('id', timeline_id).execute)
+        raise
+
+    print(f"Successfully inserted timeline: '{timeline['timeline_name']}' with ID: {timeline_id} "
+          f"and {len(article_ids)} article link(s).")
+    return {"timeline_name": timeline["timeline_name"], "timeline_id": timeline_id, "links": len(article_ids)}
 
 def write_timeline_to_db(
     timeline_name: str,
@@ -124,7 +271,7 @@ def write_timeline_to_db(
     ) -> Optional[str]:
         """
         Inserts a single timeline's data into the Supabase tables
-        (timelines and timeline_article_links). Does NOT interact with the articles table.
+        (timelines and timeline_article_links) in one transaction. Does NOT interact with the articles table.
 
         Args:
             timeline_name: The name for this timeline (e.g., "Vikings QB Search Timeline").
@@ -134,80 +281,21 @@ def write_timeline_to_db(
         Returns:
             The ID of the newly created timeline record if successful, None otherwise.
         """
-        # Initialize Supabase client
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        supabase: Client = create_client(url, key)
-        
-        new_timeline_id = None
-        try:
-            # 1. Insert into the timelines table
-            # Ensure timeline_name is not empty and timeline_json_data is valid
-            if not timeline_name or not timeline_json_data or "ClusterId" not in timeline_json_data:
-                print("Error: Invalid timeline name or data provided.")
-                return None
+        if not timeline_name or not timeline_json_data or "ClusterId" not in timeline_json_data:
+            print("Error: Invalid timeline name or data provided.")
+            return None
 
-            timeline_response = supabase.table('timelines').insert({
+        try:
+            results = write_timelines_to_db([{
                 'timeline_name': timeline_name,
                 'timeline_data': timeline_json_data
-            }).execute()
-
-            if not timeline_response.data:
-                print(f"Error inserting timeline '{timeline_name}': No data returned from insert.")
-                # Consider checking response status code or error property for more details
-                return None
-
-            new_timeline_id = timeline_response.data[0]['id']
-            print(f"Successfully inserted timeline: '{timeline_name}' with ID: {new_timeline_id}")
-
-            # 2. Extract all unique article_ids from the JSON data
-            all_article_ids: Set[str] = set()
-            if isinstance(timeline_json_data.get("ClusterId"), list):
-                for cluster in timeline_json_data["ClusterId"]:
-                    if isinstance(cluster.get("article_id"), list):
-                        for article_id in cluster["article_id"]:
-                            if isinstance(article_id, str):
-                                all_article_ids.add(article_id)
-                            else:
-                                print(f"Warning: Found non-string article_id: {article_id} in timeline '{timeline_name}'. Skipping.")
-                    else:
-                        print(f"Warning: 'article_id' not found or not a list in a cluster for timeline '{timeline_name}'.")
-            else:
-                print(f"Warning: 'ClusterId' not found or not a list in timeline data for '{timeline_name}'. No articles or links to process.")
-
-
-            # 3. Prepare data for batch insert into timeline_article_links
-            link_insert_data: List[Dict[str, str]] = []
-            for art_id in all_article_ids:
-                link_insert_data.append({
-                    'timeline_id': new_timeline_id,
-                    'article_id': art_id
-                })
-
-            # 4. Insert links into timeline_article_links table
-            if link_insert_data:
-                # Use on_conflict to ignore if the timeline_id, article_id pair already exists
-                # This is primarily to handle potential edge cases, though unlikely with a new timeline ID
-                link_insert_response = supabase.table('timeline_article_links').insert(
-                    link_insert_data,
-                    on_conflict='timeline_id, article_id'
-                ).execute()
-
-                if link_insert_response.data:
-                    print(f"Successfully inserted {len(link_insert_response.data)} timeline_article links for timeline '{timeline_name}'.")
-                else:
-                    # This might indicate an issue or simply that no links were extracted (empty ClusterId array)
-                    print(f"No new timeline_article links inserted for timeline '{timeline_name}'.") # Consider adding more specific error check here
-
-
-            # If we reached here without errors, return the new timeline ID
-            return new_timeline_id
+            }])
+            return results[0]['timeline_id'] if results else None
 
         except Exception as e:
+            # Through write_timelines nothing was written. Without the function, a timeline whose
+            # links failed is deleted again; if that delete failed too, the timeline is left without links
             print(f"An error occurred during insertion of timeline '{timeline_name}': {e}")
-            # Consider adding cleanup logic here to delete the partially inserted
-            # timeline and links if the process fails mid-way. This would require
-            # transaction support or explicit delete calls.
             return None
 
 def write_player_view_to_db(cluster_id: str, headline: str, content: str, player: str, language: str = "en"):
@@ -224,24 +312,12 @@ def write_player_view_to_db(cluster_id: str, headline: str, content: str, player
     Returns:
         dict: Response data from the database operation
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    supabase: Client = create_client(url, key)
-    
-    data = {
+    match = {
         "cluster_id": cluster_id,
         "language": language,
-        "player": player,
-        "headline": headline,
-        "content": content
+        "player": player
     }
-    
-    response = supabase.table('cluster_player_view') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+    return upsert_cluster_content('cluster_player_view', match, headline, content)
 
 def write_coaches_view_to_db(cluster_id: str, headline: str, content: str, coach: str, language: str = "en"):
     """
@@ -257,24 +333,12 @@ def write_coaches_view_to_db(cluster_id: str, headline: str, content: str, coach
     Returns:
         dict: Response data from the database operation
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    supabase: Client = create_client(url, key)
-    
-    data = {
+    match = {
         "cluster_id": cluster_id,
         "language": language,
-        "coach": coach,
-        "headline": headline,
-        "content": content
+        "coach": coach
     }
-    
-    response = supabase.table('cluster_coach_view') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+    return upsert_cluster_content('cluster_coach_view', match, headline, content)
 
 def write_franchise_view_to_db(cluster_id: str, headline: str, content: str, team: str, language: str = "en"):
     """
@@ -290,24 +354,12 @@ def write_franchise_view_to_db(cluster_id: str, headline: str, content: str, tea
     Returns:
         dict: Response data from the database operation
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    supabase: Client = create_client(url, key)
-    
-    data = {
+    match = {
         "cluster_id": cluster_id,
         "language": language,
-        "team": team,
-        "headline": headline,
-        "content": content
+        "team": team
     }
-    
-    response = supabase.table('cluster_franchise_view') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+    return upsert_cluster_content('cluster_franchise_view', match, headline, content)
 
 def write_team_view_to_db(cluster_id: str, headline: str, content: str, team: str, language: str = "en"):
     """
@@ -323,24 +375,12 @@ def write_team_view_to_db(cluster_id: str, headline: str, content: str, team: st
     Returns:
         dict: Response data from the database operation
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    supabase: Client = create_client(url, key)
-    
-    data = {
+    match = {
         "cluster_id": cluster_id,
         "language": language,
-        "team": team,
-        "headline": headline,
-        "content": content
+        "team": team
     }
-    
-    response = supabase.table('cluster_team_view') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+    return upsert_cluster_content('cluster_team_view', match, headline, content)
 
 def write_dynamic_view_to_db(cluster_id: str, headline: str, content: str, view: str, language: str = "en"):
     """
@@ -356,24 +396,12 @@ def write_dynamic_view_to_db(cluster_id: str, headline: str, content: str, view:
     Returns:
         dict: Response data from the database operation
     """
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
-    supabase: Client = create_client(url, key)
-    
-    data = {
+    match = {
         "cluster_id": cluster_id,
         "language": language,
-        "view": view,
-        "headline": headline,
-        "content": content
+        "view": view
     }
-    
-    response = supabase.table('cluster_dynamic_view') \
-        .insert(data) \
-        .execute()
-    
-    print(f"Written summary for cluster {cluster_id} to database.")
-    return response.data
+    return upsert_cluster_content('cluster_dynamic_view', match, headline, content)
 
 def close_cluster_by_id(cluster_id: str):
     """
@@ -390,10 +418,10 @@ def close_cluster_by_id(cluster_id: str):
     supabase: Client = create_client(url, key)
     
     # Use explicit boolean True value for PostgreSQL compatibility
-    response = supabase.table('clusters') \
+    update = supabase.table('clusters') \
         .update({"isContent": bool(True)}) \
-        .eq("cluster_id", cluster_id) \
-        .execute()
+        .eq("cluster_id", cluster_id)
+    response = call("supabase", update.execute)
     
     print(f"Marked cluster {cluster_id} as processed.")
     return response.data
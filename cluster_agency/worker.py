@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import importlib.util
+from typing import Dict, Any, List, Optional
+
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from job_queue import JobQueue, JOB_QUEUE_PATH
+from shared.resilience import run_deadline
+import image_jobs
+
+# --------------------------------------------------------------------------
+# Long-running pipeline worker
+# --------------------------------------------------------------------------
+
+"""
+Runs the cluster, translation and image stages as jobs on a durable local queue
+instead of separate cron-started processes:
+
+    python cluster_agency/worker.py run
+
+- A "cluster" job processes the oldest NEW cluster. If there is none it is
+  rescheduled after CLUSTER_POLL_INTERVAL, otherwise the next one starts right away.
+- Every row written by the cluster tools becomes one "translate" job per language
+  in TRANSLATION_LANGUAGES, and the first of them chains an "image" job.
+- "translate_sweep" and "image_sweep" jobs periodically catch up on rows that were
+  written outside the worker, like the *_view_images.yml and translation crons do.
+
+Downstream stages have a higher priority, so a cluster's translations and images
+are finished before the next cluster is started. Failed jobs are retried with
+backoff and dead-lettered after their last attempt; see `worker.py dead` and
+`worker.py requeue ID`. A job's LLM and database calls share a deadline just short
+of its lease (JOB_DEADLINE_FRACTION), so a slow dependency fails the job instead of
+letting its lease expire while another worker picks it up.
+"""
+
+CLUSTER_POLL_INTERVAL = float(os.getenv("CLUSTER_POLL_INTERVAL", "300"))  # Seconds between checks for new clusters
+TRANSLATION_LANGUAGES = [l.strip() for l in os.getenv("TRANSLATION_LANGUAGES", "de").split(",") if l.strip()]
+TRANSLATION_SWEEP_INTERVAL = float(os.getenv("TRANSLATION_SWEEP_INTERVAL", "1800"))
+IMAGE_SWEEP_INTERVAL = float(os.getenv("IMAGE_SWEEP_INTERVAL", "14400"))
+WORKER_IDLE_SLEEP = float(os.getenv("WORKER_IDLE_SLEEP", "5"))  # Longest sleep when no job is available
+JOB_DEADLINE_FRACTION = float(os.getenv("JOB_DEADLINE_FRACTION", "0.9"))  # Share of the lease a job's calls may use
+
+# Tables whose rows are translated into <table>_int with a <table>_id foreign key
+TRANSLATED_TABLES = [
+    "cluster_summary",
+    "cluster_player_view",
+    "cluster_coach_view",
+    "cluster_team_view",
+    "cluster_franchise_view",
+    "cluster_dynamic_view",
+]
+
+# Per stage: claim priority (higher first), lease in seconds and attempts before dead-lettering
+STAGES = {
+    "image": {"priority": 30, "visibility_timeout": 900, "max_attempts": 2},
+    "translate": {"priority": 20, "visibility_timeout": 300, "max_attempts": 4},
+    "cluster": {"priority": 10, "visibility_timeout": 3600, "max_attempts": 3},
+    "translate_sweep": {"priority": 5, "visibility_timeout": 1800, "max_attempts": 2},
+    "image_sweep": {"priority": 0, "visibility_timeout": 3600, "max_attempts": 2},
+}
+
+# Jobs that reschedule themselves after every run
+PERIODIC_STAGES = ("cluster", "translate_sweep", "image_sweep")
+
+TRANSLATE_SCRIPT = os.path.join(PROJECT_DIR, "translation_agency", "translate-articles.py")
+
+
+# --------------------------------------------------------------------------
+# Lazily loaded stage implementations
+# --------------------------------------------------------------------------
+
+_modules: Dict[str, Any] = {}
+
+
+def _translator():
+    """Loads translation_agency/translate-articles.py (its file name is not importable)."""
+    if "translator" not in _modules:
+        spec = importlib.util.spec_from_file_location("translate_articles", TRANSLATE_SCRIPT)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules["translator"] = module
+    return _modules["translator"]
+
+
+def _image_service():
+    if "image_service" not in _modules:
+        _modules["image_service"] = image_jobs._create_image_service()
+    return _modules["image_service"]
+
+
+def _cluster_agent():
+    if "agent" not in _modules:
+        import agent
+        _modules["agent"] = agent
+    return _modules["agent"]
+
+
+# --------------------------------------------------------------------------
+# Stage handlers
+# --------------------------------------------------------------------------
+
+class PipelineWorker:
+    """Claims jobs from a JobQueue and runs the matching pipeline stage."""
+
+    def __init__(self, queue: JobQueue, kinds: Optional[List[str]] = None):
+        """
+        Args:
+            queue (JobQueue): The durable job queue
+            kinds (list): Only run these job kinds (default: all stages)
+        """
+        self.queue = queue
+        self.kinds = kinds or list(STAGES)
+        self.stopping = False
+        self.handlers = {
+            "cluster": self.run_cluster,
+            "translate": self.run_translate,
+            "image": self.run_image,
+            "translate_sweep": self.run_translate_sweep,
+            "image_sweep": self.run_image_sweep,
+        }
+
+    def enqueue(self, kind: str, payload: Optional[Dict[str, Any]] = None, delay: float = 0,
+                dedup_key: Optional[str] = None) -> Optional[int]:
+        """Queues a job with the stage's priority and attempt limit."""
+        stage = STAGES[kind]
+        return self.queue.enqueue(kind, payload, priority=stage["priority"], delay=delay,
+                                  dedup_key=dedup_key, max_attempts=stage["max_attempts"])
+
+    def on_content_written(self, row: Dict[str, Any]):
+        """Job sink for image_jobs: chains translation and image jobs for a new content row."""
+        for i, language in enumerate(TRANSLATION_LANGUAGES):
+            self.enqueue("translate", dict(row, language=language, chain_image=(i == 0)),
+                         dedup_key=f"translate:{row['table']}:{row['id']}:{language}")
+        if not TRANSLATION_LANGUAGES:
+            self.enqueue("image", row, dedup_key=f"image:{row['table']}:{row['id']}")
+
+    def seed_periodic_jobs(self):
+        """Makes sure every periodic stage this worker runs has a pending job."""
+        for kind in PERIODIC_STAGES:
+            if kind in self.kinds:
+                self.enqueue(kind, dedup_key=kind)
+
+    def run_cluster(self, job: Dict[str, Any]) -> float:
+        """Processes the oldest NEW cluster; returns the delay before the next cluster job."""
+        import tools
+        if not tools.fetch_cluster_ids():
+            return CLUSTER_POLL_INTERVAL
+        # One session per job: a retried job resumes at its first incomplete stage
+        if not _cluster_agent().call_agent("Start the process.", session_id=f"job-{job['id']}"):
+            raise RuntimeError("Cluster run stopped before its last stage")
+        return 0
+
+    def run_translate(self, job: Dict[str, Any]):
+        payload = job["payload"]
+        translator = _translator()
+        table = payload["table"]
+        translation = translator.translate_article(payload, payload["language"])
+        if not translation:
+            raise RuntimeError(f"Translation of {table} row {payload['id']} to {payload['language']} failed")
+        if not translator.save_translation(translation, f"{table}_int", f"{table}_id"):
+            raise RuntimeError(f"Saving the {payload['language']} translation of {table} row {payload['id']} failed")
+        if payload.get("chain_image"):
+            row = {k: payload[k] for k in ("table", "id", "headline", "content", "cluster_id")}
+            self.enqueue("image", row, dedup_key=f"image:{table}:{payload['id']}")
+
+    def run_image(self, job: Dict[str, Any]):
+        payload = job["payload"]
+        image_url = _image_service().process_article_and_upload_image(payload["id"], payload["table"], article=payload)
+        if not image_url:
+            raise RuntimeError(f"No image stored for {payload['table']} row {payload['id']}")
+
+    def run_translate_sweep(self, job: Dict[str, Any]) -> float:
+        translator = _translator()
+        for table in TRANSLATED_TABLES:
+            for language in TRANSLATION_LANGUAGES:
+                translator.batch_translate_articles(table, f"{table}_int", f"{table}_id", language,
+                                                    translator.DEFAULT_TIME_LIMIT_HOURS, translator.DEFAULT_BATCH_SIZE)
+        return TRANSLATION_SWEEP_INTERVAL
+
+    def run_image_sweep(self, job: Dict[str, Any]) -> float:
+        _image_service().process_backlog(limit=10)
+        return IMAGE_SWEEP_INTERVAL
+
+    # -- main loop ----------------------------------------------------------
+
+    def run_job(self, job: Dict[str, Any]) -> bool:
+        """
+        Runs one claimed job and records the outcome in the queue.
+
+        Returns:
+            bool: True if the job succeeded
+        """
+        kind = job["kind"]
+        self.queue.extend(job["id"], STAGES[kind]["visibility_timeout"])
+        print(f"\n=== Job {job['id']}: {kind} (attempt {job['attempts']}/{job['max_attempts']}) ===")
+        started = time.time()
+        try:
+            with run_deadline(STAGES[kind]["visibility_timeout"] * JOB_DEADLINE_FRACTION):
+                next_delay = self.handlers[kind](job)
+        except Exception as e:
+            status = self.queue.fail(job["id"], f"{type(e).__name__}: {e}")
+            print(f"Job {job['id']} ({kind}) failed after {time.time() - started:.1f}s: {e} -> {status}")
+            if status == "dead" and kind in PERIODIC_STAGES:
+                # Keep the periodic stages alive even if one run is dead-lettered
+                self.enqueue(kind, delay=CLUSTER_POLL_INTERVAL, dedup_key=kind)
+            return False
+
+        self.queue.complete(job["id"])
+        print(f"Job {job['id']} ({kind}) done in {time.time() - started:.1f}s.")
+        if kind in PERIODIC_STAGES:
+            self.enqueue(kind, delay=next_delay or 0, dedup_key=kind)
+        return True
+
+    def run(self, max_runtime: Optional[float] = None, drain: bool = False) -> Dict[str, int]:
+        """
+        Processes jobs until stopped.
+
+        Args:
+            max_runtime (float): Stop claiming new jobs after this many seconds
+            drain (bool): Stop when no job is ready instead of waiting for scheduled ones
+
+        Returns:
+            dict: Number of succeeded and failed jobs
+        """
+        image_jobs.set_job_sink(self.on_content_written)
+        if not drain:
+            self.seed_periodic_jobs()
+        deadline = time.time() + max_runtime if max_runtime else None
+        counts = {"succeeded": 0, "failed": 0}
+
+        try:
+            while not self.stopping and (deadline is None or time.time() < deadline):
+                job = self.queue.claim(self.kinds)
+                if job is None:
+                    if drain:
+                        break
+                    wait = self.queue.next_available_in()
+                    time.sleep(min(WORKER_IDLE_SLEEP if wait is None else max(wait, 0.1), WORKER_IDLE_SLEEP))
+                    continue
+                counts["succeeded" if self.run_job(job) else "failed"] += 1
+        finally:
+            image_jobs.set_job_sink(None)
+
+        print(f"Worker stopped: {counts['succeeded']} job(s) succeeded, {counts['failed']} failed.")
+        return counts
+
+    def stop(self, *args):
+        """Finishes the current job, then exits the run loop (SIGTERM/SIGINT handler)."""
+        print("Stop requested; finishing the current job.")
+        self.stopping = True
+
+
+# --------------------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable job queue worker for the cluster, translation and image stages")
+    parser.add_argument("--queue", default=JOB_QUEUE_PATH, help=f"SQLite queue file (default: {JOB_QUEUE_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Process jobs until stopped")
+    run_parser.add_argument("--kinds", help=f"Comma-separated job kinds to run (default: all of {', '.join(STAGES)})")
+    run_parser.add_argument("--max-runtime", type=float, help="Stop after this many seconds")
+    run_parser.add_argument("--drain", action="store_true", help="Exit when no job is ready")
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Queue a job")
+    enqueue_parser.add_argument("kind", choices=list(STAGES))
+    enqueue_parser.add_argument("--payload", default="{}", help="JSON payload")
+    enqueue_parser.add_argument("--delay", type=float, default=0, help="Seconds before the job is claimable")
+
+    subparsers.add_parser("stats", help="Show job counts per kind and status")
+
+    dead_parser = subparsers.add_parser("dead", help="List dead-lettered jobs")
+    dead_parser.add_argument("--limit", type=int, default=20)
+
+    requeue_parser = subparsers.add_parser("requeue", help="Move a dead-lettered job back to the queue")
+    requeue_parser.add_argument("job_id", type=int)
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue)
+
+    if args.command == "run":
+        kinds = [k.strip() for k in args.kinds.split(",")] if args.kinds else None
+        worker = PipelineWorker(queue, kinds)
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        worker.run(max_runtime=args.max_runtime, drain=args.drain)
+    elif args.command == "enqueue":
+        job_id = PipelineWorker(queue).enqueue(args.kind, json.loads(args.payload), delay=args.delay)
+        print(f"Queued job {job_id} ({args.kind}).")
+    elif args.command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == "dead":
+        for job in queue.dead_letters(args.limit):
+            print(f"{job['id']:>6} {job['kind']:<16} attempts={job['attempts']} error={job['last_error']}")
+    elif args.command == "requeue":
+        print("Requeued." if queue.requeue(args.job_id) else f"Job {args.job_id} is not dead-lettered.")
+
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
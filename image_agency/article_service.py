@@ -1,5 +1,6 @@
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any, Tuple
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -10,6 +11,7 @@ from config import (
     ARTICLE_CONTENT_COLUMN,
     TABLES_FOR_IMAGES
 )
+from shared.resilience import call
 
 class ArticleService:
     """Service to fetch article content from Supabase database"""
@@ -36,11 +38,11 @@ class ArticleService:
         """
         print(f"Fetching article with ID '{article_id}' from table '{ARTICLE_TABLE_NAME}'...")
         try:
-            response = self.supabase.table(ARTICLE_TABLE_NAME)\
+            query = self.supabase.table(ARTICLE_TABLE_NAME)\
                                .select(f"{ARTICLE_CONTENT_COLUMN}")\
                                .eq(ARTICLE_ID_COLUMN, article_id)\
-                               .single()\
-                               .execute()
+                               .single()
+            response = call("supabase", query.execute)
                                
             if response.data and ARTICLE_CONTENT_COLUMN in response.data:
                 article_content = response.data[ARTICLE_CONTENT_COLUMN]
@@ -78,11 +80,11 @@ class ArticleService:
         
         try:
             # Also fetch cluster_id for the cluster_images table
-            response = self.supabase.table(table_name)\
+            query = self.supabase.table(table_name)\
                                 .select(f"{id_col}, {content_col}, cluster_id")\
                                 .eq(has_image_col, False)\
-                                .limit(limit)\
-                                .execute()
+                                .limit(limit)
+            response = call("supabase", query.execute)
                                 
             if response.data:
                 articles = []
@@ -106,6 +108,116 @@ class ArticleService:
             print(f"Error fetching articles from Supabase: {e}\n{traceback.format_exc()}")
             return []
             
+    def fetch_image_backlog(self, table_names: Optional[List[str]] = None, limit_per_table: int = 10,
+                            total_limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fetch articles without images from several tables in one pass and prioritize them.
+        
+        The tables are queried concurrently, projecting only id, content, cluster_id
+        and created_at. Articles are ordered newest cluster first (by the newest row
+        of each cluster) and, within a cluster, by table priority from
+        TABLES_FOR_IMAGES (summaries before views).
+        
+        Args:
+            table_names: Tables to query; defaults to all tables in TABLES_FOR_IMAGES
+            limit_per_table: Maximum number of articles to fetch per table
+            total_limit: Maximum number of articles to return overall
+            
+        Returns:
+            A prioritized list of article dictionaries containing id, content, cluster_id,
+            created_at and table
+        """
+        table_names = list(table_names or TABLES_FOR_IMAGES.keys())
+        for table_name in table_names:
+            if table_name not in TABLES_FOR_IMAGES:
+                raise ValueError(f"Unknown table: {table_name}. Available tables: {list(TABLES_FOR_IMAGES.keys())}")
+                
+        print(f"Fetching image backlog from {len(table_names)} tables (up to {limit_per_table} each)...")
+        
+        def fetch_table(table_name: str) -> List[Dict[str, Any]]:
+            table_config = TABLES_FOR_IMAGES[table_name]
+            id_col = table_config["id_column"]
+            content_col = table_config["content_column"]
+            try:
+                query = self.supabase.table(table_name)\
+                                    .select(f"{id_col}, {content_col}, cluster_id, created_at")\
+                                    .eq(table_config["has_image_column"], False)\
+                                    .order("created_at", desc=True)\
+                                    .limit(limit_per_table)
+                response = call("supabase", query.execute)
+            except Exception as e:
+                print(f"Error fetching backlog from table '{table_name}': {e}")
+                return []
+            return [{
+                "id": row[id_col],
+                "content": row[content_col],
+                "cluster_id": row.get("cluster_id"),
+                "created_at": row.get("created_at") or "",
+                "table": table_name
+            } for row in response.data or [] if row.get(content_col)]
+            
+        with ThreadPoolExecutor(max_workers=len(table_names) or 1) as executor:
+            articles = [article for rows in executor.map(fetch_table, table_names) for article in rows]
+            
+        # Newest row per cluster decides the cluster's position
+        cluster_newest: Dict[Any, str] = {}
+        for article in articles:
+            key = article["cluster_id"] or f"{article['table']}:{article['id']}"
+            if article["created_at"] > cluster_newest.get(key, ""):
+                cluster_newest[key] = article["created_at"]
+                
+        # Two stable sorts: table priority within a cluster, then newest cluster first
+        articles.sort(key=lambda a: TABLES_FOR_IMAGES[a["table"]].get("priority", 1))
+        articles.sort(key=lambda a: cluster_newest.get(a["cluster_id"] or f"{a['table']}:{a['id']}", ""), reverse=True)
+        
+        if total_limit is not None:
+            articles = articles[:total_limit]
+            
+        print(f"Image backlog contains {len(articles)} articles.")
+        return articles
+        
+    def fetch_article_by_id(self, table_name: str, article_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a single article from a specific table by its ID.
+        
+        Args:
+            table_name: The name of the table containing the article
+            article_id: The ID of the article to fetch
+            
+        Returns:
+            An article dictionary containing id, content, and cluster_id, or None if not found
+        """
+        if table_name not in TABLES_FOR_IMAGES:
+            raise ValueError(f"Unknown table: {table_name}. Available tables: {list(TABLES_FOR_IMAGES.keys())}")
+            
+        table_config = TABLES_FOR_IMAGES[table_name]
+        id_col = table_config["id_column"]
+        content_col = table_config["content_column"]
+        
+        print(f"Fetching article with ID '{article_id}' from table '{table_name}'...")
+        
+        try:
+            # Single lookup on the primary key, projecting only the columns we need
+            query = self.supabase.table(table_name)\
+                                .select(f"{id_col}, {content_col}, cluster_id")\
+                                .eq(id_col, article_id)\
+                                .limit(1)
+            response = call("supabase", query.execute)
+                                
+            if response.data and content_col in response.data[0]:
+                article = response.data[0]
+                article_data = {
+                    "id": article[id_col],
+                    "content": article[content_col]
+                }
+                if "cluster_id" in article:
+                    article_data["cluster_id"] = article["cluster_id"]
+                return article_data
+            else:
+                print(f"No article found for ID '{article_id}' in table '{table_name}'.")
+                return None
+        except Exception as e:
+            print(f"Error fetching article from Supabase: {e}\n{traceback.format_exc()}")
+            return None
+            
     def update_article_has_image(self, table_name: str, article_id: str, image_url: str) -> bool:
         """Update an article to mark it as having an image and store the image URL.
         
@@ -128,10 +240,10 @@ class ArticleService:
         
         try:
             # Only update the hasImage column, as the imageUrl is now stored in the cluster_images table
-            response = self.supabase.table(table_name)\
+            query = self.supabase.table(table_name)\
                                 .update({has_image_col: True})\
-                                .eq(id_col, article_id)\
-                                .execute()
+                                .eq(id_col, article_id)
+            response = call("supabase", query.execute)
                                 
             if response.data:
                 print(f"Successfully updated article {article_id} to mark as having an image.")
@@ -144,4 +256,41 @@ class ArticleService:
                 return False
         except Exception as e:
             print(f"Error updating article: {e}")
+            return False
+            
+    def mark_articles_have_images(self, table_name: str, article_ids: List[str]) -> bool:
+        """Mark several articles in one table as having an image with a single update.
+        
+        Args:
+            table_name: The name of the table containing the articles
+            article_ids: The IDs of the articles to update
+            
+        Returns:
+            True if update was successful, False otherwise
+        """
+        if table_name not in TABLES_FOR_IMAGES:
+            raise ValueError(f"Unknown table: {table_name}. Available tables: {list(TABLES_FOR_IMAGES.keys())}")
+        if not article_ids:
+            return True
+            
+        table_config = TABLES_FOR_IMAGES[table_name]
+        id_col = table_config["id_column"]
+        has_image_col = table_config["has_image_column"]
+        
+        print(f"Updating {len(article_ids)} articles in table {table_name} to set {has_image_col}=True")
+        
+        try:
+            query = self.supabase.table(table_name)\
+                                .update({has_image_col: True})\
+                                .in_(id_col, article_ids)
+            response = call("supabase", query.execute)
+                                
+            if response.data:
+                print(f"Successfully marked {len(response.data)} articles in {table_name} as having an image.")
+                return True
+            else:
+                print(f"Failed to update articles in {table_name}.")
+                return False
+        except Exception as e:
+            print(f"Error updating articles: {e}")
             return False
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Async Image Service - Runs the image pipeline for many articles concurrently
+"""
+import asyncio
+import time
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+
+from http_client import AsyncHttpClient
+from rate_limiter import AsyncRateLimiter
+from image_write_sink import ImageWriteSink
+from config import (
+    CANDIDATES_TO_LLM_FOR_SELECTION,
+    MAX_ARTICLES_IN_FLIGHT,
+    LLM_REQUESTS_PER_SECOND
+)
+
+if TYPE_CHECKING:
+    from main_image_service import MainImageService
+
+class AsyncMainImageService:
+    """Async variant of MainImageService.
+    
+    Image validation and download run as coroutines on an AsyncHttpClient, so
+    one process can keep many articles in flight. DDGS, Gemini and Supabase have
+    no async clients; their calls run in worker threads. Gemini requests are
+    paced by an awaitable rate limiter, DDGS requests by the shared limiter
+    inside ImageSearch.
+    """
+    
+    def __init__(self, service: "MainImageService", max_in_flight: int = MAX_ARTICLES_IN_FLIGHT):
+        """Initialize the async service around the components of a MainImageService.
+        
+        Args:
+            service: Initialized MainImageService whose components are reused
+            max_in_flight: Maximum number of articles processed concurrently
+        """
+        self.service = service
+        self.max_in_flight = max_in_flight
+        self.llm_limiter = AsyncRateLimiter(LLM_REQUESTS_PER_SECOND, burst=2)
+    
+    async def _call_llm(self, func, *args):
+        """Run a blocking LLM call in a worker thread within the LLM rate limit."""
+        await self.llm_limiter.acquire()
+        return await asyncio.to_thread(func, *args)
+    
+    async def _search_valid(self, query: str, num_to_fetch: int, max_retries: int, max_valid: int,
+                            http_client: AsyncHttpClient, article_snippet: str,
+                            search_query: str) -> List[Dict[str, Any]]:
+        """Validate the DDGS results best first as they stream in, until max_valid have passed.
+        
+        The results are read in windows of max_valid, each window is ranked
+        locally (no network) and validated best first, and the search stream is
+        closed as soon as enough candidates have passed, so the remaining results
+        are never read. The returned candidates are sorted by 'rank_score'.
+        """
+        service = self.service
+        candidate_stream = service.image_search.iter_images(query, num_to_fetch, max_retries)
+        ranked_stream = service.image_ranker.iter_ranked(candidate_stream, article_snippet, search_query, max_valid)
+        valid = await service.image_validator.filter_valid_images_async(ranked_stream, http_client, max_valid=max_valid)
+        return sorted(valid, key=lambda candidate: -candidate['rank_score'])
+        
+    async def _rank_duplicates(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hash candidate thumbnails concurrently, then down-rank near-duplicates."""
+        deduplicator = self.service.image_deduplicator
+        hashes = await asyncio.gather(*(
+            asyncio.to_thread(deduplicator.compute_candidate_hash, candidate) for candidate in candidates
+        ))
+        for candidate, hex_hash in zip(candidates, hashes):
+            candidate['phash'] = hex_hash
+        # The BK-tree is only read and written on the event loop thread
+        return deduplicator.partition_duplicates(candidates)
+    
+    async def process_article_and_upload_image(self, article_id: str, table_name: str = None,
+                                               article: Optional[Dict[str, Any]] = None,
+                                               search_query: Optional[str] = None,
+                                               write_sink: Optional[ImageWriteSink] = None,
+                                               http_client: Optional[AsyncHttpClient] = None,
+                                               generate_query: bool = True) -> Optional[str]:
+        """Process an article and find, select, and upload a relevant image.
+        
+        Args:
+            article_id: The ID of the article to process
+            table_name: The name of the table containing the article
+            article: Optional already-fetched article record (id, content, cluster_id)
+            search_query: Optional pre-generated image search query
+            write_sink: Optional sink that buffers the database writes after upload
+            http_client: Open AsyncHttpClient to share between articles; a new one is opened if omitted
+            generate_query: Whether to ask the LLM for a query if search_query is missing. False when a
+                            batched request (including its single-request fallback) already failed for
+                            the article, so the failure is not paid for twice.
+        
+        Returns:
+            URL of uploaded image or None if any step fails
+        """
+        if http_client is None:
+            async with AsyncHttpClient() as client:
+                return await self.process_article_and_upload_image(
+                    article_id, table_name, article, search_query, write_sink, client, generate_query
+                )
+        
+        service = self.service
+        print(f"\n--- Processing image for article ID: {article_id} in table: {table_name or 'default'} ---")
+        
+        # Step 1: Fetch article content
+        article_content, cluster_id = await asyncio.to_thread(service._load_article, article_id, table_name, article)
+        if not article_content:
+            print("Failed to fetch article content. Aborting.")
+            return None
+        
+        # Step 2: Generate search query with LLM
+        if not service.llm_service.is_available():
+            print("LLM service not available. Aborting.")
+            return None
+        
+        if not search_query and generate_query:
+            search_query = await self._call_llm(service.llm_service.generate_search_query, article_content)
+        if not search_query:
+            print("Failed to generate search query. Aborting.")
+            return None
+        
+        # Step 3: Stream the search results in locally ranked windows into concurrent
+        # validation; the search stops as soon as enough candidates have passed
+        article_snippet = article_content[:4000]
+        max_valid = CANDIDATES_TO_LLM_FOR_SELECTION + 5
+        valid_image_candidates = await self._search_valid(search_query, 20, 3, max_valid, http_client,
+                                                          article_snippet, search_query)
+        if not valid_image_candidates:
+            alt_query = " ".join(search_query.split()[:2] + ["photos"])
+            print(f"No valid results with specific query. Trying alternative query: '{alt_query}'")
+            valid_image_candidates = await self._search_valid(alt_query, 15, 2, max_valid, http_client,
+                                                              article_snippet, search_query)
+            
+        if not valid_image_candidates:
+            print(f"No valid image candidates found for '{search_query}'. Aborting.")
+            return None
+            
+        # Step 4: Down-rank near-duplicates of already stored images
+        print(f"Found {len(valid_image_candidates)} valid image candidates.")
+        valid_image_candidates = await self._rank_duplicates(valid_image_candidates)
+        
+        # Step 5: Select the best image, asking the LLM only if local ranking is not confident
+        selected_image = service.image_ranker.confident_choice(valid_image_candidates)
+        if not selected_image:
+            selected_image = await self._call_llm(
+                service.llm_service.select_best_image,
+                valid_image_candidates[:CANDIDATES_TO_LLM_FOR_SELECTION],
+                article_snippet,
+                search_query
+            )
+        
+        if not selected_image:
+            print("LLM did not select an image or selection failed. Aborting.")
+            return None
+        
+        # Step 6: Download and upload the selected image
+        final_image_url = await service.image_storage.process_and_upload_image_async(
+            selected_image, search_query, http_client
+        )
+        if not final_image_url:
+            print(f"FAILED to download/upload the selected image for article {article_id}.")
+            return None
+        
+        print(f"SUCCESS: Image processed and uploaded for article {article_id}. URL: {final_image_url}")
+        phash = selected_image.get("phash")
+        if phash:
+            service.image_deduplicator.add(phash)
+        
+        if write_sink is not None and table_name:
+            write_sink.add(table_name, article_id, final_image_url, cluster_id=cluster_id,
+                           view=service._view_from_table(table_name),
+                           original_url=selected_image.get("url", "unknown"), phash=phash)
+        else:
+            await asyncio.to_thread(service._record_image, article_id, table_name, cluster_id,
+                                    final_image_url, selected_image)
+        return final_image_url
+    
+    async def process_articles(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Find and upload images for already-fetched articles concurrently.
+        
+        Args:
+            articles: Article dictionaries with id, content, cluster_id and table
+        
+        Returns:
+            List of results with article IDs, tables and status, in input order
+        """
+        service = self.service
+        search_queries = {}
+        if service.llm_service.is_available():
+            search_queries = await self._call_llm(service.llm_service.generate_search_queries, [
+                {"id": f"{article['table']}:{article['id']}", "content": article["content"]}
+                for article in articles
+            ])
+        
+        write_sink = ImageWriteSink(service.image_storage, service.article_service)
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        
+        async with AsyncHttpClient() as http_client:
+            
+            async def process_one(article: Dict[str, Any]) -> Dict[str, Any]:
+                article_id = article["id"]
+                table_name = article["table"]
+                async with in_flight:
+                    print(f"\nProcessing article {article_id} from {table_name}...")
+                    start_time = time.time()
+                    try:
+                        image_url = await self.process_article_and_upload_image(
+                            article_id, table_name, article=article,
+                            search_query=search_queries.get(f"{table_name}:{article_id}"),
+                            write_sink=write_sink,
+                            http_client=http_client,
+                            # The batched generation already fell back to a single request
+                            generate_query=f"{table_name}:{article_id}" not in search_queries
+                        )
+                    except Exception as e:
+                        print(f"Error processing article {article_id}: {e}")
+                        return {
+                            "article_id": article_id,
+                            "table": table_name,
+                            "status": "error",
+                            "error_message": str(e)
+                        }
+                    process_time = time.time() - start_time
+                
+                if image_url:
+                    return {
+                        "article_id": article_id,
+                        "table": table_name,
+                        "status": "success",
+                        "image_url": image_url,
+                        "process_time_sec": round(process_time, 2)
+                    }
+                return {
+                    "article_id": article_id,
+                    "table": table_name,
+                    "status": "failed",
+                    "process_time_sec": round(process_time, 2)
+                }
+            
+            results = await asyncio.gather(*(process_one(article) for article in articles))
+        
+        if not await asyncio.to_thread(write_sink.flush):
+            print("Warning: Some image records could not be written to the database.")
+        
+        return list(results)
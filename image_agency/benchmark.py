@@ -0,0 +1,513 @@
+"""
+Image Service Benchmark - Load-tests the image pipeline against local HTTP fixtures
+
+Serves generated images from a local HTTP(S) server with configurable latency,
+size, status codes and redirect chains, replaces DDGS, Gemini and Supabase with
+in-process stand-ins, and runs MainImageService over synthetic articles:
+
+    python benchmark.py --articles 20 --concurrency 8 --mix fast=6,slow=2,redirect=2,missing=2,big=1,html=1,ssl=1
+
+Reports articles/min and per-stage timings for validation, download, optimize
+and upload.
+"""
+import os
+import io
+import sys
+import ssl
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+import functools
+import inspect
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from PIL import Image
+
+# The service reads credentials at startup; the stand-ins never use them
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.pop("GEMINI_API_KEY", None)
+
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+import image_storage
+import article_service
+from main_image_service import MainImageService
+
+# Fixture profiles: query parameters understood by FixtureHandler
+PROFILES = {
+    "fast": {"latency": 0.01, "size": 150_000},
+    "slow": {"latency": 0.5, "size": 300_000},
+    "big": {"latency": 0.05, "size": 12 * 1024 * 1024},
+    "redirect": {"latency": 0.02, "size": 150_000, "redirects": 3},
+    "missing": {"latency": 0.02, "status": 404},
+    "html": {"latency": 0.02, "type": "html"},
+    "ssl": {"latency": 0.02, "size": 150_000, "tls": 1},
+}
+DEFAULT_MIX = "fast=6,slow=2,redirect=2,missing=2,big=1,html=1,ssl=1"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves generated images according to the query parameters of each request"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is exercised
+
+    def do_HEAD(self):
+        self._serve(include_body=False)
+
+    def do_GET(self):
+        self._serve(include_body=True)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _serve(self, include_body: bool):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        self.server.stats.record(self.command, params.get("profile", "thumb"))
+
+        time.sleep(float(params.get("latency", 0)))
+
+        redirects = int(params.get("redirects", 0))
+        if redirects > 0:
+            params["redirects"] = redirects - 1
+            self._send(302, b"", "text/plain", {"Location": f"{parsed.path}?{urlencode(params)}"}, include_body)
+            return
+
+        status = int(params.get("status", 200))
+        if status != 200:
+            self._send(status, b"not found", "text/plain", {}, include_body)
+            return
+
+        if params.get("type") == "html":
+            self._send(200, b"<html><body>Not an image</body></html>", "text/html", {}, include_body)
+            return
+
+        body = self.server.images.get(int(params.get("seed", 0)), int(params.get("size", 0)),
+                                      int(params.get("w", 1600)), int(params.get("h", 900)))
+        self._send(200, body, "image/jpeg", {}, include_body)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str], include_body: bool):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if include_body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client aborted a download above its size cap
+
+
+class ImageCache:
+    """Generates fixture JPEGs once per (seed, size, dimensions)"""
+
+    def __init__(self):
+        self._images: Dict[Tuple[int, int, int, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, seed: int, size: int, width: int, height: int) -> bytes:
+        key = (seed % 16, size, width, height)
+        with self._lock:
+            if key not in self._images:
+                rng = random.Random(key[0])
+                image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+                noise = Image.effect_noise((width // 4, height // 4), 40 + key[0]).convert("RGB").resize((width, height))
+                image = Image.blend(image, noise, 0.5)
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=90)
+                data = buffer.getvalue()
+                # Trailing padding is ignored by decoders and lets profiles control the byte size
+                self._images[key] = data + b"\0" * max(0, size - len(data))
+            return self._images[key]
+
+
+class RequestStats:
+    """Counts fixture server requests by method and profile"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, profile: str):
+        with self._lock:
+            key = f"{method} {profile}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class FixtureServer:
+    """Local HTTP server, plus an HTTPS server with a self-signed certificate if possible"""
+
+    def __init__(self):
+        self.stats = RequestStats()
+        self.images = ImageCache()
+        self.http = self._make_server()
+        self.https = self._make_tls_server()
+
+    def _make_server(self) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        server.daemon_threads = True
+        server.stats = self.stats
+        server.images = self.images
+        return server
+
+    def _make_tls_server(self) -> Optional[ThreadingHTTPServer]:
+        """HTTPS server whose certificate fails verification, to exercise the verify=False retry."""
+        try:
+            cert_file, key_file = self._self_signed_certificate()
+        except ImportError:
+            print("cryptography is not installed; the 'ssl' profile is served over plain HTTP.")
+            return None
+        server = self._make_server()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_file, key_file)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        return server
+
+    @staticmethod
+    def _self_signed_certificate() -> Tuple[str, str]:
+        import datetime
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "benchmark.invalid")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (x509.CertificateBuilder()
+                       .subject_name(name).issuer_name(name)
+                       .public_key(key.public_key())
+                       .serial_number(x509.random_serial_number())
+                       .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+                       .sign(key, hashes.SHA256()))
+        directory = tempfile.mkdtemp(prefix="image-benchmark-")
+        cert_file, key_file = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+        with open(cert_file, "wb") as f:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
+        with open(key_file, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                      serialization.NoEncryption()))
+        return cert_file, key_file
+
+    def start(self):
+        for server in (self.http, self.https):
+            if server is not None:
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        for server in (self.http, self.https):
+            if server is not None:
+                server.shutdown()
+
+    def url(self, profile: str, seed: int) -> str:
+        """URL of a fixture image for a profile."""
+        params = dict(PROFILES[profile])
+        tls = params.pop("tls", 0) and self.https is not None
+        server = self.https if tls else self.http
+        scheme = "https" if tls else "http"
+        params.update({"profile": profile, "seed": seed})
+        return f"{scheme}://127.0.0.1:{server.server_address[1]}/img/{profile}/{seed}.jpg?{urlencode(params)}"
+
+    def thumbnail_url(self, seed: int) -> str:
+        params = {"seed": seed, "w": 64, "h": 36}
+        return f"http://127.0.0.1:{self.http.server_address[1]}/thumb/{seed}.jpg?{urlencode(params)}"
+
+
+class FakeImageSearch:
+    """Stand-in for ImageSearch that returns fixture URLs in a fixed profile mix"""
+
+    def __init__(self, server: FixtureServer, mix: List[str], latency: float = 0.0):
+        self.server = server
+        self.mix = mix
+        self.latency = latency
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def iter_images(self, query: str, num_to_fetch: int = 10, max_retries: int = 3) -> Iterator[Dict[str, Any]]:
+        time.sleep(self.latency)
+        for i in range(num_to_fetch):
+            with self._lock:
+                self._counter += 1
+                seed = self._counter
+            profile = self.mix[(seed + i) % len(self.mix)]
+            yield {
+                "url": self.server.url(profile, seed),
+                "title": f"{query} {profile} {i}",
+                "thumbnailUrl": self.server.thumbnail_url(seed),
+                "width": 1600,
+                "height": 900,
+            }
+
+    def search_images(self, query: str, num_to_fetch: int = 10, max_retries: int = 3) -> List[Dict[str, Any]]:
+        return list(self.iter_images(query, num_to_fetch, max_retries))
+
+
+class FakeLLMService:
+    """Stand-in for LLMService with fixed answers and configurable latency"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_search_query(self, article_content: str) -> Optional[str]:
+        time.sleep(self.latency)
+        return " ".join(article_content.split()[:4])
+
+    def generate_search_queries(self, articles: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        time.sleep(self.latency)
+        return {article["id"]: " ".join(article["content"].split()[:4]) for article in articles}
+
+    def select_best_image(self, image_candidates: List[Dict[str, Any]], article_snippet: str,
+                          search_query: str) -> Optional[Dict[str, Any]]:
+        time.sleep(self.latency)
+        return image_candidates[0] if image_candidates else None
+
+
+class FakeSupabase:
+    """In-memory stand-in for the Supabase client calls made by ImageStorage and ArticleService"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.stored: set = set()
+        self.storage = self
+        self._lock = threading.Lock()
+
+    def create_client(self, url=None, key=None, *args, **kwargs) -> "FakeSupabase":
+        return self
+
+    # Storage API: storage.from_(bucket).list / upload
+    def from_(self, bucket: str) -> "FakeSupabase":
+        return self
+
+    def list(self, folder: str, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        name = (options or {}).get("search", "")
+        return [{"name": name}] if f"{folder}/{name}" in self.stored else []
+
+    def upload(self, path: str, file: bytes, file_options: Optional[Dict[str, str]] = None):
+        time.sleep(self.latency)
+        with self._lock:
+            self.stored.add(path)
+
+    # Table API: every builder call returns the query; execute echoes the payload
+    def table(self, name: str) -> "FakeQuery":
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    """Chainable table query that records nothing and echoes written rows"""
+
+    def __init__(self, db: FakeSupabase):
+        self.db = db
+        self.rows: List[Dict[str, Any]] = []
+
+    def __getattr__(self, name):
+        if name == "not_":
+            return self
+        return self._chain
+
+    def _chain(self, *args, **kwargs) -> "FakeQuery":
+        if args and isinstance(args[0], (dict, list)):
+            self.rows = args[0] if isinstance(args[0], list) else [args[0]]
+        return self
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        return type("Response", (), {"data": self.rows})()
+
+
+class StageTimer:
+    """Wraps service methods to record how long each call takes"""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings.setdefault(stage, []).append(seconds)
+
+    def wrap(self, obj, method_name: str, stage: str):
+        method = getattr(obj, method_name)
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            setattr(obj, method_name, timed_async)
+        else:
+            @functools.wraps(method)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            setattr(obj, method_name, timed)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        rows = []
+        for stage, values in self.timings.items():
+            rows.append({
+                "stage": stage,
+                "calls": len(values),
+                "total_sec": round(sum(values), 3),
+                "p50_sec": round(percentile(values, 50), 3),
+                "p95_sec": round(percentile(values, 95), 3),
+            })
+        return sorted(rows, key=lambda row: row["total_sec"], reverse=True)
+
+
+def parse_mix(mix: str) -> List[str]:
+    """Expand "fast=6,slow=2" into a list with each profile repeated by its weight."""
+    profiles = []
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f"Unknown profile '{name}'. Available profiles: {list(PROFILES)}")
+        profiles.extend([name] * int(weight or 1))
+    return profiles
+
+
+def build_service(server: FixtureServer, mix: List[str], concurrency: int, llm_latency: float,
+                  search_latency: float, db_latency: float) -> Tuple[MainImageService, StageTimer, FakeSupabase]:
+    """Create a MainImageService wired to the fixture server and stand-ins, with stage timers installed."""
+    db = FakeSupabase(db_latency)
+    image_storage.create_client = db.create_client
+    article_service.create_client = db.create_client
+
+    service = MainImageService(concurrency)
+    service.llm_service = FakeLLMService(llm_latency)
+    service.image_search = FakeImageSearch(server, mix, search_latency)
+
+    timer = StageTimer()
+    timer.wrap(service.image_validator, "inspect_image_url_async", "validate (HEAD)")
+    timer.wrap(service.image_deduplicator, "compute_candidate_hash", "thumbnail hash")
+    timer.wrap(service.image_storage, "download_image_async", "download")
+    timer.wrap(service.image_storage, "optimize_image", "optimize")
+    timer.wrap(service.image_storage, "upload_to_supabase", "upload")
+    timer.wrap(service.image_storage, "store_image_bytes", "store (optimize+upload)")
+    return service, timer, db
+
+
+def run_benchmark(articles: int, concurrency: int, mix: str = DEFAULT_MIX, llm_latency: float = 0.0,
+                  search_latency: float = 0.0, db_latency: float = 0.0, quiet: bool = True) -> Dict[str, Any]:
+    """Run the image pipeline over synthetic articles and collect throughput and stage timings.
+
+    Args:
+        articles: Number of articles to process
+        concurrency: Maximum number of articles in flight
+        mix: Fixture profile weights, e.g. "fast=6,slow=2"
+        llm_latency: Seconds per stand-in LLM call
+        search_latency: Seconds per stand-in search
+        db_latency: Seconds per stand-in Supabase call
+        quiet: Suppress the pipeline's own output
+
+    Returns:
+        Benchmark report
+    """
+    server = FixtureServer()
+    server.start()
+    try:
+        output = open(os.devnull, "w") if quiet else sys.stdout
+        with contextlib.redirect_stdout(output):
+            service, timer, db = build_service(server, parse_mix(mix), concurrency, llm_latency, search_latency, db_latency)
+            batch = [{
+                "id": str(i),
+                "table": "cluster_summary",
+                "cluster_id": f"bench-cluster-{i}",
+                "content": f"Benchmark article {i} about the quarterback trade and the playoff race."
+            } for i in range(articles)]
+
+            start = time.perf_counter()
+            results = service._process_articles(batch)
+            elapsed = time.perf_counter() - start
+        if quiet:
+            output.close()
+    finally:
+        server.stop()
+
+    succeeded = sum(1 for r in results if r.get("status") == "success")
+    article_times = [r["process_time_sec"] for r in results if "process_time_sec" in r]
+    return {
+        "articles": articles,
+        "succeeded": succeeded,
+        "elapsed_sec": round(elapsed, 3),
+        "articles_per_min": round(articles / elapsed * 60, 2) if elapsed else None,
+        "article_p50_sec": round(percentile(article_times, 50), 3),
+        "article_p95_sec": round(percentile(article_times, 95), 3),
+        "stages": timer.summary(),
+        "requests": dict(sorted(server.stats.counts.items())),
+        "uploads": len(db.stored),
+        "settings": {"concurrency": concurrency, "mix": mix, "llm_latency": llm_latency,
+                     "search_latency": search_latency, "db_latency": db_latency},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a benchmark report."""
+    print(f"\n=== Image pipeline benchmark ({report['articles']} articles, concurrency {report['settings']['concurrency']}) ===")
+    print(f"Succeeded: {report['succeeded']}/{report['articles']}  Uploads: {report['uploads']}")
+    print(f"Elapsed: {report['elapsed_sec']:.2f}s  Throughput: {report['articles_per_min']} articles/min")
+    print(f"Per article: p50 {report['article_p50_sec']:.2f}s  p95 {report['article_p95_sec']:.2f}s\n")
+    print(f"{'stage':<26} {'calls':>6} {'total s':>9} {'p50 s':>8} {'p95 s':>8}")
+    for row in report["stages"]:
+        print(f"{row['stage']:<26} {row['calls']:>6} {row['total_sec']:>9.2f} {row['p50_sec']:>8.3f} {row['p95_sec']:>8.3f}")
+    print("\nFixture server requests:")
+    for key, count in report["requests"].items():
+        print(f"  {key:<24} {count:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the image pipeline against local HTTP fixtures')
+    parser.add_argument('--articles', type=int, default=20, help='Number of articles to process (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum number of articles in flight (default: 8)')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'Fixture profile weights (default: {DEFAULT_MIX}); profiles: {", ".join(PROFILES)}')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Seconds per stand-in LLM call (default: 0)')
+    parser.add_argument('--search-latency', type=float, default=0.0, help='Seconds per stand-in search (default: 0)')
+    parser.add_argument('--db-latency', type=float, default=0.0, help='Seconds per stand-in Supabase call (default: 0)')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.articles, args.concurrency, args.mix, args.llm_latency,
+                           args.search_latency, args.db_latency, quiet=not args.verbose)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json_path}")
+
+    return 0 if report["succeeded"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
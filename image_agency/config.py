@@ -6,28 +6,82 @@ ARTICLE_ID_COLUMN = "id"
 ARTICLE_CONTENT_COLUMN = "content"
 
 # Multi-table configuration
+# Lower priority values are processed first when working across tables
 TABLES_FOR_IMAGES = {
-    "cluster_coach_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"},
-    "cluster_dynamic_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"},
-    "cluster_franchise_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"},
-    "cluster_player_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"},
-    "cluster_team_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"},
-    "cluster_summary": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage"}
+    "cluster_coach_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 1},
+    "cluster_dynamic_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 1},
+    "cluster_franchise_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 1},
+    "cluster_player_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 1},
+    "cluster_team_view": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 1},
+    "cluster_summary": {"id_column": "id", "content_column": "content", "has_image_column": "hasImage", "priority": 0}
 }
 
+# Write-behind batching of image metadata writes
+CLUSTER_IMAGES_UPSERT_KEY = "cluster_id,view,image_url"  # Unique index: sql/cluster_images_upsert_key.sql
+WRITE_SINK_FLUSH_SIZE = 20                               # Flush buffered writes after this many images
+
 # LLM configuration
-LLM_MODEL_NAME = "gemini-1.5-flash-latest"
+LLM_ROUTING_STAGES = {"query": "ImageQueryGeneration", "selection": "ImageSelection"}  # Models per stage: shared/model_router.py
 MAX_ARTICLE_CHARS_FOR_LLM_QUERY_GEN = 15000  # For generating search query
 MAX_ARTICLE_CHARS_FOR_LLM_SELECTION = 4000   # For image selection prompt
 CANDIDATES_TO_LLM_FOR_SELECTION = 7          # How many image candidates to present to LLM for final choice
+QUERY_GEN_BATCH_CHAR_BUDGET = 30000          # Total article characters packed into one batched query-generation request
+QUERY_GEN_BATCH_ITEM_CHARS = 4000            # Max characters per article excerpt in a batched request
+QUERY_GEN_MAX_BATCH_SIZE = 10                # Max articles per batched query-generation request
 
 # Image search configuration
 MIN_DDGS_IMAGE_DIMENSION = 100  # Minimal heuristic: smallest dimension for a DDGS result to be considered
+DDGS_REQUESTS_PER_SECOND = 0.5      # Sustained DDGS request rate while no rate limits are observed
+DDGS_BURST = 2                      # Requests allowed back to back before pacing kicks in
+DDGS_MIN_REQUESTS_PER_SECOND = 0.05 # Slowest rate the limiter backs off to after repeated rate limits
+DDGS_RATE_RECOVERY_STEP = 0.05      # Rate regained per successful request after a backoff
 
 # Image preferences
 DESIRED_MIN_WIDTH = 1200
 DESIRED_MIN_HEIGHT = 400
 
+# Image download and upload configuration
+MAX_IMAGE_DOWNLOAD_BYTES = 10 * 1024 * 1024  # Abort downloads larger than this
+IMAGE_DOWNLOAD_CHUNK_SIZE = 64 * 1024        # Streaming chunk size for downloads
+TARGET_IMAGE_WIDTH = 1200                    # Downscale wider images to this width before upload
+REENCODE_MIN_BYTES = 300 * 1024              # Re-encode images above this size even if not too wide
+IMAGE_OUTPUT_FORMAT = "JPEG"                 # "JPEG" (progressive) or "WEBP"
+IMAGE_OUTPUT_QUALITY = 85
+IMAGE_STORAGE_BUCKET = "images"
+IMAGE_STORAGE_FOLDER = "public"              # Content-addressed images live at {folder}/{sha256}.{ext}
+
+# Shared HTTP client for image hosts
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+HTTP_POOL_CONNECTIONS = 32      # Number of host pools kept alive
+HTTP_POOL_MAXSIZE = 8           # Keep-alive connections per host pool
+MAX_CONNECTIONS_PER_HOST = 4    # Concurrent requests allowed per host
+
+# Async pipeline
+MAX_ARTICLES_IN_FLIGHT = 16     # Articles processed concurrently by the async image service
+LLM_REQUESTS_PER_SECOND = 1.0   # Sustained Gemini request rate shared by all in-flight articles
+
+# Local candidate ranking (before LLM selection)
+RANKING_WEIGHTS = {"text": 0.5, "dimensions": 0.3, "domain": 0.2}
+RANKING_MIN_CONFIDENT_SCORE = 0.6   # Top candidate must score at least this to skip the LLM...
+RANKING_CONFIDENCE_MARGIN = 0.15    # ...and beat every other candidate by this margin
+DEFAULT_DOMAIN_SCORE = 0.5
+DOMAIN_SCORES = {
+    'nfl.com': 1.0,
+    'espn.com': 0.9,
+    'apnews.com': 0.9,
+    'cbssports.com': 0.8,
+    'si.com': 0.8,
+    'usatoday.com': 0.8,
+    'upload.wikimedia.org': 0.8,
+    'pinterest.com': 0.2,
+    'redd.it': 0.2,
+}
+
+# Near-duplicate detection (perceptual hashing)
+PHASH_MAX_DISTANCE = 10         # Hamming distance (of 64 bits) at which two images count as near-duplicates
+PHASH_INDEX_SIZE = 2000         # Number of most recent cluster_images hashes loaded into the index
+THUMBNAIL_MAX_BYTES = 512 * 1024
+
 # Domain blacklist for image sources
 BLACKLISTED_DOMAINS = [
     'lookaside.instagram.com',
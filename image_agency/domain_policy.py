@@ -0,0 +1,182 @@
+import os
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import BLACKLISTED_DOMAINS, DOMAIN_SCORES, DEFAULT_DOMAIN_SCORE
+from shared.resilience import call
+
+ALLOW = "allow"
+DENY = "deny"
+
+class DomainPolicy:
+    """Allow/deny lists and reputation scores for image source domains.
+    
+    Domains are stored in a suffix trie keyed by host labels from the TLD down
+    (com -> alamy -> c8), so a lookup costs one step per label of the URL's host
+    regardless of how many domains the policy holds. The most specific matching
+    rule wins, e.g. an allow rule for images.example.com overrides a deny rule
+    for example.com.
+    """
+    
+    def __init__(self):
+        """Initialize an empty policy"""
+        self.root: Dict[str, Any] = {}
+        self.size = 0
+        
+    @staticmethod
+    def _labels(domain: str) -> list:
+        """Host labels from TLD to leftmost label, ignoring a leading 'www.' and trailing dot."""
+        domain = domain.strip().lower().rstrip('.')
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        return [label for label in reversed(domain.split('.')) if label]
+        
+    def add(self, domain: str, action: Optional[str] = None, score: Optional[float] = None) -> None:
+        """Add or update a rule for a domain and all its subdomains.
+        
+        Args:
+            domain: Domain name, e.g. "alamy.com"
+            action: ALLOW, DENY or None to leave the action unchanged
+            score: Reputation score in [0, 1] or None to leave the score unchanged
+        """
+        if action not in (None, ALLOW, DENY):
+            raise ValueError(f"Unknown domain policy action: {action}")
+            
+        labels = self._labels(domain)
+        if not labels:
+            return
+        node = self.root
+        for label in labels:
+            node = node.setdefault(label, {})
+        if "$" not in node:
+            node["$"] = {"action": None, "score": None}
+            self.size += 1
+        if action is not None:
+            node["$"]["action"] = action
+        if score is not None:
+            node["$"]["score"] = float(score)
+            
+    def lookup(self, url: str) -> Tuple[Optional[str], Optional[float]]:
+        """Find the most specific action and score for a URL's host.
+        
+        Args:
+            url: Full URL or bare host name
+            
+        Returns:
+            Tuple of (action, score); either is None if no rule matches
+        """
+        host = urlparse(url).hostname if '://' in url else url
+        action, score = None, None
+        node = self.root
+        for label in self._labels(host or ''):
+            node = node.get(label)
+            if node is None:
+                break
+            rule = node.get("$")
+            if rule:
+                if rule["action"] is not None:
+                    action = rule["action"]
+                if rule["score"] is not None:
+                    score = rule["score"]
+        return action, score
+        
+    def is_denied(self, url: str) -> bool:
+        """Check whether the URL's host is on the deny list (and not explicitly allowed)."""
+        return self.lookup(url)[0] == DENY
+        
+    def score(self, url: str) -> float:
+        """Reputation score of the URL's host, DEFAULT_DOMAIN_SCORE if unknown."""
+        score = self.lookup(url)[1]
+        return DEFAULT_DOMAIN_SCORE if score is None else score
+        
+    def load_file(self, path: str) -> int:
+        """Load rules from a text file.
+        
+        Each non-empty line holds "<action> <domain> [score]" where action is
+        allow, deny or score (score-only rule). Lines starting with # are ignored.
+        
+        Args:
+            path: Path to the policy file
+            
+        Returns:
+            Number of rules loaded
+        """
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                parts = line.split('#', 1)[0].split()
+                if not parts:
+                    continue
+                try:
+                    action = parts[0].lower()
+                    score = float(parts[2]) if len(parts) > 2 else None
+                    self.add(parts[1], action=None if action == "score" else action, score=score)
+                    loaded += 1
+                except (IndexError, ValueError) as e:
+                    print(f"WARNING: Skipping invalid domain policy line {line_number} in {path}: {e}")
+        print(f"Loaded {loaded} domain policy rules from {path}")
+        return loaded
+        
+    def load_table(self, supabase, table_name: str) -> int:
+        """Load rules from a Supabase table with columns domain, action and score.
+        
+        Args:
+            supabase: Supabase client
+            table_name: Name of the policy table
+            
+        Returns:
+            Number of rules loaded, 0 on error
+        """
+        try:
+            response = call("supabase", supabase.table(table_name).select("domain, action, score").execute)
+        except Exception as e:
+            print(f"WARNING: Failed to load domain policy from table '{table_name}': {e}")
+            return 0
+            
+        loaded = 0
+        for row in response.data or []:
+            try:
+                self.add(row["domain"], action=row.get("action"), score=row.get("score"))
+                loaded += 1
+            except (KeyError, ValueError) as e:
+                print(f"WARNING: Skipping invalid domain policy row {row}: {e}")
+        print(f"Loaded {loaded} domain policy rules from table '{table_name}'")
+        return loaded
+        
+    @classmethod
+    def from_config(cls) -> "DomainPolicy":
+        """Build a policy from BLACKLISTED_DOMAINS and DOMAIN_SCORES in config."""
+        policy = cls()
+        for domain in BLACKLISTED_DOMAINS:
+            policy.add(domain, action=DENY)
+        for domain, score in DOMAIN_SCORES.items():
+            policy.add(domain, score=score)
+        return policy
+
+def load_domain_policy(supabase=None) -> DomainPolicy:
+    """Build the startup domain policy from config, an optional file and an optional table.
+    
+    The file and table are taken from the DOMAIN_POLICY_FILE and DOMAIN_POLICY_TABLE
+    environment variables. Later sources override earlier ones.
+    
+    Args:
+        supabase: Supabase client used to read DOMAIN_POLICY_TABLE, if set
+        
+    Returns:
+        The combined DomainPolicy
+    """
+    policy = DomainPolicy.from_config()
+    
+    policy_file = os.environ.get("DOMAIN_POLICY_FILE")
+    if policy_file:
+        try:
+            policy.load_file(policy_file)
+        except OSError as e:
+            print(f"WARNING: Could not read domain policy file {policy_file}: {e}")
+            
+    policy_table = os.environ.get("DOMAIN_POLICY_TABLE")
+    if policy_table and supabase is not None:
+        policy.load_table(supabase, policy_table)
+        
+    print(f"Domain policy initialized with {policy.size} domains.")
+    return policy
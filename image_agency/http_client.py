@@ -0,0 +1,155 @@
+import ssl
+import asyncio
+import threading
+import httpx
+import requests
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Iterator, AsyncIterator
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+from config import (
+    HTTP_USER_AGENT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    MAX_CONNECTIONS_PER_HOST
+)
+from shared.resilience import dependency
+
+def host_of(url: str) -> str:
+    """Lower-cased host name of a URL."""
+    return (urlparse(url).hostname or "").lower()
+
+def is_ssl_error(error: BaseException) -> bool:
+    """Check whether an exception was caused by a TLS/certificate failure."""
+    while error is not None:
+        if isinstance(error, (ssl.SSLError, requests.exceptions.SSLError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def consume_retry(url: str) -> bool:
+    """Take one retry from the host's budget in shared/resilience.py.
+    
+    The budget refills as the host gets traffic (every request through
+    HttpClient or AsyncHttpClient counts), so a host that failed a few times
+    earlier in a long-running process gets retries again.
+    
+    Args:
+        url: URL about to be retried
+        
+    Returns:
+        True if the retry may proceed, False if the host's budget is exhausted
+    """
+    if dependency("image_host", host_of(url)).budget.try_spend():
+        return True
+    print(f"Retry budget exhausted for host {host_of(url)}.")
+    return False
+
+class HttpClient:
+    """Shared HTTP client for image hosts.
+    
+    Wraps a single requests.Session so validation (HEAD) and download (GET)
+    requests to the same host reuse keep-alive connections instead of
+    re-resolving DNS and re-handshaking TLS. Concurrent requests per host are
+    capped, and every request earns its host retries in the per-host retry
+    budget (see consume_retry), so a failing CDN cannot absorb unbounded retries.
+    """
+    
+    def __init__(self, max_per_host: int = MAX_CONNECTIONS_PER_HOST):
+        """Initialize the session with keep-alive connection pools.
+        
+        Args:
+            max_per_host: Maximum number of concurrent requests per host
+        """
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": HTTP_USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self.max_per_host = max_per_host
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        """Per-host semaphore limiting concurrent requests."""
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+            
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """Send a HEAD request within the host's concurrency limit."""
+        dependency("image_host", host_of(url)).budget.on_call()
+        with self._slot(host_of(url)):
+            return self.session.head(url, **kwargs)
+            
+    @contextmanager
+    def stream(self, url: str, **kwargs) -> Iterator[requests.Response]:
+        """Send a streaming GET request and hold the host slot until the body is consumed.
+        
+        Usage:
+            with client.stream(url, timeout=15) as response:
+                for chunk in response.iter_content(...): ...
+        """
+        with self._slot(host_of(url)):
+            response = self.session.get(url, stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+class AsyncHttpClient:
+    """Async counterpart of HttpClient built on httpx.
+    
+    Must be used as an async context manager inside the event loop that uses it.
+    httpx fixes certificate verification per client, so a second pool is kept
+    for hosts that only work with verification disabled.
+    """
+    
+    def __init__(self, max_per_host: int = MAX_CONNECTIONS_PER_HOST):
+        """Initialize the client configuration.
+        
+        Args:
+            max_per_host: Maximum number of concurrent requests per host
+        """
+        self.max_per_host = max_per_host
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._clients: Dict[bool, httpx.AsyncClient] = {}
+        
+    async def __aenter__(self) -> "AsyncHttpClient":
+        limits = httpx.Limits(max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                              max_keepalive_connections=HTTP_POOL_CONNECTIONS)
+        for verify in (True, False):
+            self._clients[verify] = httpx.AsyncClient(
+                headers={"User-Agent": HTTP_USER_AGENT},
+                limits=limits,
+                follow_redirects=True,
+                verify=verify
+            )
+        return self
+        
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+        
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        """Per-host semaphore limiting concurrent requests."""
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_slots[host]
+        
+    async def head(self, url: str, verify: bool = True, timeout: float = 10) -> httpx.Response:
+        """Send a HEAD request within the host's concurrency limit."""
+        dependency("image_host", host_of(url)).budget.on_call()
+        async with self._slot(host_of(url)):
+            return await self._clients[verify].head(url, timeout=timeout)
+            
+    @asynccontextmanager
+    async def stream(self, url: str, verify: bool = True, timeout: float = 15) -> AsyncIterator[httpx.Response]:
+        """Send a streaming GET request and hold the host slot until the body is consumed."""
+        async with self._slot(host_of(url)):
+            async with self._clients[verify].stream("GET", url, timeout=timeout) as response:
+                yield response
@@ -0,0 +1,168 @@
+import io
+from typing import List, Dict, Any, Optional, Tuple
+from PIL import Image
+
+from http_client import HttpClient
+from config import PHASH_MAX_DISTANCE, THUMBNAIL_MAX_BYTES
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> Optional[int]:
+    """Compute the difference hash (dHash) of an image.
+    
+    The image is reduced to a (hash_size+1) x hash_size grayscale grid and every
+    bit records whether a pixel is brighter than its right neighbour. The hash is
+    stable under rescaling and recompression, so near-duplicates differ in only a
+    few bits.
+    
+    Args:
+        image_bytes: The encoded image data
+        hash_size: Grid height; the hash has hash_size * hash_size bits
+        
+    Returns:
+        The hash as an integer, or None if the image could not be decoded
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            pixels = list(img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes())
+    except Exception as e:
+        print(f"WARNING: Could not compute perceptual hash: {e}")
+        return None
+        
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes with Hamming distance.
+    
+    Range queries only descend into children whose edge distance lies within
+    [d - radius, d + radius], so lookups visit a small part of the tree.
+    """
+    
+    def __init__(self):
+        """Initialize an empty tree"""
+        self.root: Optional[Tuple[int, Dict[int, Any]]] = None
+        self.size = 0
+        
+    def add(self, value: int) -> None:
+        """Insert a hash into the tree (duplicates are ignored)."""
+        if self.root is None:
+            self.root = (value, {})
+            self.size = 1
+            return
+            
+        node_value, children = self.root
+        while True:
+            distance = hamming_distance(value, node_value)
+            if distance == 0:
+                return
+            if distance not in children:
+                children[distance] = (value, {})
+                self.size += 1
+                return
+            node_value, children = children[distance]
+            
+    def search(self, value: int, radius: int) -> List[Tuple[int, int]]:
+        """Find all hashes within a Hamming radius of value.
+        
+        Args:
+            value: The hash to look up
+            radius: Maximum Hamming distance
+            
+        Returns:
+            List of (distance, hash) tuples sorted by distance
+        """
+        if self.root is None:
+            return []
+            
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_value, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                matches.append((distance, node_value))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return sorted(matches)
+
+class ImageDeduplicator:
+    """Detects candidates that are near-duplicates of recently used images"""
+    
+    def __init__(self, known_hashes: Optional[List[str]] = None, max_distance: int = PHASH_MAX_DISTANCE,
+                 http_client: Optional[HttpClient] = None):
+        """Initialize the deduplicator with hashes of images already in use.
+        
+        Args:
+            known_hashes: Hex-encoded dHashes of previously stored images
+            max_distance: Hamming distance at which candidates count as near-duplicates
+            http_client: Shared HTTP client for thumbnail downloads
+        """
+        self.max_distance = max_distance
+        self.http_client = http_client or HttpClient()
+        self.tree = BKTree()
+        for hex_hash in known_hashes or []:
+            try:
+                self.tree.add(int(hex_hash, 16))
+            except (TypeError, ValueError):
+                continue
+        print(f"ImageDeduplicator initialized with {self.tree.size} known image hashes.")
+        
+    def add(self, hex_hash: str) -> None:
+        """Record a newly used image hash."""
+        self.tree.add(int(hex_hash, 16))
+        
+    def compute_candidate_hash(self, candidate: Dict[str, Any]) -> Optional[str]:
+        """Compute the dHash of a candidate from its thumbnail.
+        
+        Args:
+            candidate: Image candidate object with a 'thumbnailUrl'
+            
+        Returns:
+            Hex-encoded hash, or None if no thumbnail is available or it could not be fetched
+        """
+        thumbnail_url = candidate.get('thumbnailUrl')
+        if not thumbnail_url:
+            return None
+            
+        try:
+            with self.http_client.stream(thumbnail_url, timeout=10) as response:
+                response.raise_for_status()
+                data = response.raw.read(THUMBNAIL_MAX_BYTES + 1, decode_content=True)
+            if len(data) > THUMBNAIL_MAX_BYTES:
+                return None
+        except Exception as e:
+            print(f"WARNING: Could not fetch thumbnail {thumbnail_url}: {e}")
+            return None
+            
+        value = dhash(data)
+        return f"{value:016x}" if value is not None else None
+        
+    def partition_duplicates(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Move candidates whose precomputed 'phash' is a near-duplicate to the end of the list.
+        
+        Args:
+            candidates: List of image candidate objects with a 'phash' key
+            
+        Returns:
+            Reordered list of candidates
+        """
+        fresh, duplicates = [], []
+        for candidate in candidates:
+            hex_hash = candidate.get('phash')
+            if hex_hash and self.tree.search(int(hex_hash, 16), self.max_distance):
+                print(f"Near-duplicate of a recently used image: {candidate.get('url')}")
+                duplicates.append(candidate)
+            else:
+                fresh.append(candidate)
+                
+        if duplicates:
+            print(f"Down-ranked {len(duplicates)} near-duplicate candidates.")
+        return fresh + duplicates
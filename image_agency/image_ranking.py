@@ -0,0 +1,159 @@
+import re
+import math
+from collections import Counter
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from urllib.parse import urlparse
+import numpy as np
+
+from domain_policy import DomainPolicy
+
+from config import (
+    DESIRED_MIN_WIDTH,
+    DESIRED_MIN_HEIGHT,
+    RANKING_WEIGHTS,
+    RANKING_MIN_CONFIDENT_SCORE,
+    RANKING_CONFIDENCE_MARGIN
+)
+
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'are', 'was', 'were', 'has', 'have',
+    'had', 'his', 'her', 'their', 'they', 'will', 'would', 'been', 'into', 'after', 'about',
+    'www', 'com', 'http', 'https', 'jpg', 'jpeg', 'png', 'webp', 'gif', 'image', 'images',
+    'photo', 'photos', 'stock', 'picture'
+}
+MAX_ARTICLE_TERMS = 200  # Vocabulary size taken from the article text
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens without stopwords and very short tokens."""
+    return [t for t in re.findall(r'[a-z0-9]+', (text or '').lower()) if len(t) > 2 and t not in STOPWORDS]
+
+class ImageRanker:
+    """Scores image candidates locally on text relevance, dimensions and source domain"""
+    
+    def __init__(self, domain_policy: Optional[DomainPolicy] = None):
+        """Initialize the ranker with a domain policy providing reputation scores.
+        
+        Args:
+            domain_policy: Policy with per-domain scores; defaults to DOMAIN_SCORES from config
+        """
+        self.domain_policy = domain_policy or DomainPolicy.from_config()
+        
+    def _text_scores(self, candidates: List[Dict[str, Any]], article_text: str, search_query: str) -> np.ndarray:
+        """Cosine similarity between candidate title/URL tokens and the article/query terms."""
+        query_terms = set(tokenize(search_query))
+        article_counts = Counter(tokenize(article_text))
+        
+        vocabulary = list(query_terms | {t for t, _ in article_counts.most_common(MAX_ARTICLE_TERMS)})
+        if not vocabulary:
+            return np.zeros(len(candidates))
+        index = {term: i for i, term in enumerate(vocabulary)}
+        
+        # Article weights are log-scaled term frequencies; query terms get a strong boost
+        weights = np.array([math.log1p(article_counts.get(t, 0)) + (3.0 if t in query_terms else 0.0)
+                            for t in vocabulary])
+        
+        features = np.zeros((len(candidates), len(vocabulary)))
+        for row, candidate in enumerate(candidates):
+            url_path = urlparse(candidate.get('url') or '').path
+            for term in set(tokenize(f"{candidate.get('title', '')} {url_path}")):
+                col = index.get(term)
+                if col is not None:
+                    features[row, col] = 1.0
+                    
+        norms = np.sqrt(features.sum(axis=1)) * np.linalg.norm(weights)
+        return np.divide(features @ weights, norms, out=np.zeros(len(candidates)), where=norms > 0)
+        
+    def _dimension_scores(self, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        """Score size against the desired minimum and aspect ratio against landscape formats."""
+        widths = np.array([float(c.get('width') or 0) for c in candidates])
+        heights = np.array([float(c.get('height') or 0) for c in candidates])
+        
+        size_fit = np.minimum(widths / DESIRED_MIN_WIDTH, 1.0) * np.minimum(heights / DESIRED_MIN_HEIGHT, 1.0)
+        
+        # Full score for ratios between 4:3 and the desired banner ratio, decaying outside
+        ratios = np.divide(widths, heights, out=np.zeros_like(widths), where=heights > 0)
+        low, high = 4 / 3, max(4 / 3, DESIRED_MIN_WIDTH / DESIRED_MIN_HEIGHT)
+        clipped = np.clip(ratios, low, high)
+        aspect_fit = np.where(ratios > 0, np.exp(-np.abs(np.log(np.maximum(ratios, 1e-6) / clipped))), 0.0)
+        
+        return np.sqrt(size_fit) * aspect_fit
+        
+    def rank_candidates(self, candidates: List[Dict[str, Any]], article_text: str,
+                        search_query: str) -> List[Dict[str, Any]]:
+        """Score all candidates and sort them best first.
+        
+        Each candidate gets a 'rank_score' key in [0, 1].
+        
+        Args:
+            candidates: List of image candidate objects
+            article_text: The article text (or a snippet of it)
+            search_query: The search query used to find the candidates
+            
+        Returns:
+            The candidates sorted by descending score
+        """
+        if not candidates:
+            return []
+            
+        domain_scores = np.array([self.domain_policy.score(c.get('url') or '') for c in candidates])
+        scores = (RANKING_WEIGHTS["text"] * self._text_scores(candidates, article_text, search_query)
+                  + RANKING_WEIGHTS["dimensions"] * self._dimension_scores(candidates)
+                  + RANKING_WEIGHTS["domain"] * domain_scores)
+        
+        for candidate, score in zip(candidates, scores):
+            candidate['rank_score'] = round(float(score), 4)
+            
+        order = np.argsort(-scores, kind='stable')
+        ranked = [candidates[i] for i in order]
+        print(f"Ranked {len(ranked)} candidates locally. Top score: {ranked[0]['rank_score']}")
+        return ranked
+        
+    def iter_ranked(self, candidates: Iterable[Dict[str, Any]], article_text: str, search_query: str,
+                    window: int) -> Iterator[Dict[str, Any]]:
+        """Rank a lazy stream of candidates in windows, best first within each window.
+        
+        Only window candidates are read from the stream before the first one is
+        yielded, so a consumer that stops early (such as filter_valid_images_async)
+        never pulls the rest of the search results. Closing this generator closes
+        the underlying stream as well.
+        
+        Args:
+            candidates: Image candidate objects, as a list or a lazy iterator
+            article_text: The article text (or a snippet of it)
+            search_query: The search query used to find the candidates
+            window: Number of candidates read and ranked together
+            
+        Yields:
+            The candidates with 'rank_score', window by window
+        """
+        stream = iter(candidates)
+        try:
+            while True:
+                chunk = list(islice(stream, window))
+                if not chunk:
+                    return
+                yield from self.rank_candidates(chunk, article_text, search_query)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+        
+    def confident_choice(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the first candidate if it clearly beats all others, so the LLM can be skipped.
+        
+        Args:
+            candidates: Ranked image candidates with 'rank_score'
+            
+        Returns:
+            The first candidate if it clears the confidence thresholds, otherwise None
+        """
+        if not candidates:
+            return None
+            
+        top_score = candidates[0].get('rank_score', 0.0)
+        runner_up = max((c.get('rank_score', 0.0) for c in candidates[1:]), default=0.0)
+        if top_score >= RANKING_MIN_CONFIDENT_SCORE and top_score - runner_up >= RANKING_CONFIDENCE_MARGIN:
+            print(f"Local ranking is confident (score {top_score} vs {runner_up}). Skipping LLM selection.")
+            return candidates[0]
+        return None
@@ -1,15 +1,57 @@
-import traceback
 import time
-import random
-from typing import List, Dict, Any, Optional
+import traceback
+from typing import List, Dict, Any, Optional, Iterator
 from duckduckgo_search import DDGS
 from duckduckgo_search.exceptions import RatelimitException
 
-from config import MIN_DDGS_IMAGE_DIMENSION
+from rate_limiter import AdaptiveRateLimiter
+from shared.resilience import CircuitOpenError, DeadlineExceeded, Dependency, dependency, is_transient_error
+from config import (
+    MIN_DDGS_IMAGE_DIMENSION,
+    DDGS_REQUESTS_PER_SECOND,
+    DDGS_BURST,
+    DDGS_MIN_REQUESTS_PER_SECOND,
+    DDGS_RATE_RECOVERY_STEP
+)
 
 class ImageSearch:
     """Handles image search functionality using DDGS"""
     
+    def __init__(self, rate_limiter: Optional[AdaptiveRateLimiter] = None):
+        """Initialize the image search.
+        
+        Args:
+            rate_limiter: Limiter shared by all DDGS requests; requests only wait
+                          when its budget is exhausted, and it slows down when
+                          DDGS reports rate limits
+        """
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            DDGS_REQUESTS_PER_SECOND,
+            burst=DDGS_BURST,
+            min_rate=DDGS_MIN_REQUESTS_PER_SECOND,
+            recovery_step=DDGS_RATE_RECOVERY_STEP
+        )
+        
+    def _acquire(self) -> None:
+        """Wait for the DDGS request budget, logging only when pacing actually kicks in."""
+        waited = self.rate_limiter.acquire()
+        if waited > 0:
+            print(f"DDGS request budget exhausted; waited {waited:.2f}s.")
+            
+    @staticmethod
+    def _wait_for_retry(dep: Dependency, attempt: int, max_retries: int) -> bool:
+        """Sleep the jittered backoff before the next attempt.
+        
+        Returns:
+            False if no retry is allowed (retries, retry budget or deadline used up)
+        """
+        delay = dep.retry_delay(attempt + 1, max_retries + 1)
+        if delay is None:
+            return False
+        print(f"Retrying DDGS search in {delay:.1f}s...")
+        time.sleep(delay)
+        return True
+    
     def search_images(self, query: str, num_to_fetch: int = 10, max_retries: int = 3) -> List[Dict[str, Any]]:
         """Search for images using DDGS with retry logic.
         
@@ -21,16 +63,39 @@ class ImageSearch:
         Returns:
             List of image candidate objects with pre-filtering applied
         """
+        pre_filtered_candidates = list(self.iter_images(query, num_to_fetch, max_retries))
+        print(f"{len(pre_filtered_candidates)} candidates after minimal pre-filtering.")
+        return pre_filtered_candidates
+        
+    def iter_images(self, query: str, num_to_fetch: int = 10, max_retries: int = 3) -> Iterator[Dict[str, Any]]:
+        """Lazily search for images using DDGS with retry logic.
+        
+        Results are pre-filtered and yielded as DDGS returns them, so a consumer
+        that has seen enough candidates can stop iterating (or close the
+        generator) without the remaining results being processed.
+        
+        A search is only retried while it has not yielded anything; once results
+        have been handed out, a rate limit or error ends the stream instead of
+        repeating candidates. Retries wait a jittered exponential backoff and
+        are paid from the shared DDGS retry budget; while the DDGS circuit
+        breaker is open, nothing is requested at all (see shared/resilience.py).
+        
+        Args:
+            query: Search query string
+            num_to_fetch: Maximum number of raw DDGS results to consume
+            max_retries: Maximum number of retry attempts
+            
+        Yields:
+            Image candidate objects with pre-filtering applied
+        """
         print(f"Searching DDGS for '{query}' (fetching ~{num_to_fetch})...")
-        raw_results = []
+        raw_count = 0
+        dep = dependency("ddgs")
         
-        # Try with backoff for rate limiting
+        # Retry rate-limited searches; the limiter backs off after each rate limit
         for attempt in range(max_retries + 1):
             if attempt > 0:
-                # Exponential backoff with jitter
-                backoff_time = min(30, 2 ** attempt) + random.uniform(0, 2)
-                print(f"Rate limit encountered. Retry attempt {attempt}/{max_retries} after {backoff_time:.2f}s delay...")
-                time.sleep(backoff_time)
+                print(f"Retry attempt {attempt}/{max_retries}...")
                 
                 # Slightly modify query on retries to avoid identical requests
                 retry_query = f"{query} {'' if attempt % 2 == 0 else 'photos'}"
@@ -39,10 +104,14 @@ class ImageSearch:
                 retry_query = query
             
             try:
+                dep.before_attempt(attempt)
+            except (CircuitOpenError, DeadlineExceeded) as e:
+                print(f"Skipping DDGS search for '{query}': {e}")
+                return
+            
+            try:
+                self._acquire()
                 with DDGS() as ddgs:
-                    # Add a small delay to prevent immediate rate limiting
-                    time.sleep(random.uniform(0.5, 1.5))
-                    
                     ddgs_gen = ddgs.images(
                         keywords=retry_query, 
                         region='wt-wt', 
@@ -50,73 +119,88 @@ class ImageSearch:
                         size=None, 
                         max_results=num_to_fetch + 5
                     )
+                    dep.record(None, is_transient_error)
                     
                     if not ddgs_gen: 
                         print("DDGS returned no generator.")
                         continue  # Try again with modified query
                         
-                    result_count = 0
                     for r in ddgs_gen:
-                        # Add intentional small random delays between result processing
-                        if result_count > 0 and result_count % 5 == 0:
-                            time.sleep(random.uniform(0.1, 0.3))
-                            
-                        if r and r.get('image'): 
-                            raw_results.append(r)
-                            result_count += 1
+                        if not r or not r.get('image'):
+                            continue
+                        raw_count += 1
+                        
+                        candidate = self._pre_filter(r)
+                        if candidate:
+                            yield candidate
                             
-                        if len(raw_results) >= num_to_fetch: 
+                        if raw_count >= num_to_fetch: 
                             break  # Stop if we have enough
-                    
-                    if raw_results:  # If we got any results, break the retry loop
-                        print(f"DDGS returned {len(raw_results)} raw results on attempt {attempt+1}.")
-                        break
+                        
+                    self.rate_limiter.on_success()
+                    if raw_count:  # If we got any results, stop retrying
+                        print(f"DDGS returned {raw_count} raw results on attempt {attempt+1}.")
+                        return
                         
             except RatelimitException as e:
                 print(f"Rate limit error on attempt {attempt+1}: {e}")
-                if attempt >= max_retries:
-                    print("Max retries exceeded for rate limit. Trying fallback search method...")
-                    fallback_results = self._search_images_fallback(query, num_to_fetch)
-                    if fallback_results:
-                        raw_results = fallback_results
-                        break
-                    print("Fallback search also failed. Giving up.")
+                self.rate_limiter.on_rate_limited()
+                dep.record(e, is_transient_error)
+                if raw_count:
+                    print(f"Keeping the {raw_count} results received before the rate limit.")
+                    return
+                if not self._wait_for_retry(dep, attempt, max_retries):
+                    print("Retries exhausted for rate limit. Trying fallback search method...")
+                    yield from self._iter_fallback(query, num_to_fetch)
+                    return
                 # Continue to next retry attempt if not max retries yet
                     
             except Exception as e:
                 print(f"ERROR in DDGS search attempt {attempt+1}: {e}\n{traceback.format_exc()}")
-                if attempt >= max_retries:
+                dep.record(e, is_transient_error)
+                if raw_count:
+                    return
+                if not self._wait_for_retry(dep, attempt, max_retries):
                     print("Trying fallback search method...")
-                    fallback_results = self._search_images_fallback(query, num_to_fetch)
-                    if fallback_results:
-                        raw_results = fallback_results
-                        break
+                    yield from self._iter_fallback(query, num_to_fetch)
+                    return
         
-        # If no results after all retries, return empty list
-        if not raw_results:
-            print(f"No suitable image candidates found for '{query}' after {max_retries+1} attempts.")
-            return []
-
-        # Apply minimal heuristic pre-filter for dimensions
-        pre_filtered_candidates = []
-        for r in raw_results:
-            width = r.get('width', 0)
-            height = r.get('height', 0)
+        print(f"No suitable image candidates found for '{query}' after {max_retries+1} attempts.")
+        
+    def _iter_fallback(self, query: str, num_to_fetch: int) -> Iterator[Dict[str, Any]]:
+        """Pre-filtered candidates from the fallback text search."""
+        fallback_results = self._search_images_fallback(query, num_to_fetch)
+        if not fallback_results:
+            print("Fallback search also failed. Giving up.")
+        for r in fallback_results:
+            candidate = self._pre_filter(r)
+            if candidate:
+                yield candidate
+                
+    @staticmethod
+    def _pre_filter(r: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply the minimal dimension heuristic to a raw DDGS result.
+        
+        Args:
+            r: Raw DDGS image result
             
-            if isinstance(width, int) and isinstance(height, int) and \
-               width >= MIN_DDGS_IMAGE_DIMENSION and height >= MIN_DDGS_IMAGE_DIMENSION:
-                pre_filtered_candidates.append({
-                    'url': r.get('image'),
-                    'title': r.get('title', ''),
-                    'thumbnailUrl': r.get('thumbnail', ''),  # Though not used, keep for structure
-                    'width': width,
-                    'height': height
-                })
-            else:
-                print(f"DDGS pre-filter: Discarding candidate due to small/missing dimensions: {r.get('title', 'No Title')[:50]}")
+        Returns:
+            Image candidate object, or None if the result is too small or has no dimensions
+        """
+        width = r.get('width', 0)
+        height = r.get('height', 0)
         
-        print(f"{len(pre_filtered_candidates)} candidates after minimal pre-filtering.")
-        return pre_filtered_candidates
+        if isinstance(width, int) and isinstance(height, int) and \
+           width >= MIN_DDGS_IMAGE_DIMENSION and height >= MIN_DDGS_IMAGE_DIMENSION:
+            return {
+                'url': r.get('image'),
+                'title': r.get('title', ''),
+                'thumbnailUrl': r.get('thumbnail', ''),
+                'width': width,
+                'height': height
+            }
+        print(f"DDGS pre-filter: Discarding candidate due to small/missing dimensions: {r.get('title', 'No Title')[:50]}")
+        return None
     
     def _search_images_fallback(self, query: str, num_to_fetch: int = 20) -> List[Dict[str, Any]]:
         """Alternative search method when main DDGS image search fails.
@@ -133,20 +217,26 @@ class ImageSearch:
         raw_results = []
         
         image_query = f"{query} images high resolution photos"
+        dep = dependency("ddgs")
+        
+        try:
+            dep.before_attempt(0)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"Skipping fallback search: {e}")
+            return raw_results
         
         try:
+            self._acquire()
             with DDGS() as ddgs:
                 # Use text search instead of image search
-                time.sleep(random.uniform(1.0, 2.0))  # Slightly longer delay for fallback
-                
                 text_results = ddgs.text(
                     keywords=image_query,
                     region='wt-wt',
                     safesearch='moderate',
                     max_results=num_to_fetch * 2  # Get more text results to find images
                 )
+                dep.record(None, is_transient_error)
                 
-                result_count = 0
                 for result in text_results:
                     # Extract potential image sites from domains
                     if not result or not result.get('href'):
@@ -168,18 +258,19 @@ class ImageSearch:
                             'thumbnail': '',
                             'is_fallback': True  # Mark as coming from fallback
                         })
-                        result_count += 1
-                        
-                    # Add occasional small delay
-                    if result_count % 3 == 0:
-                        time.sleep(random.uniform(0.1, 0.2))
                         
                     if len(raw_results) >= num_to_fetch:
                         break
                         
                 print(f"Fallback search found {len(raw_results)} potential image candidates.")
+            self.rate_limiter.on_success()
                         
+        except RatelimitException as e:
+            print(f"Rate limit error in fallback search: {e}")
+            self.rate_limiter.on_rate_limited()
+            dep.record(e, is_transient_error)
         except Exception as e:
             print(f"ERROR in fallback search: {e}\n{traceback.format_exc()}")
+            dep.record(e, is_transient_error)
             
         return raw_results
\ No newline at end of file
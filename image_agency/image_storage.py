@@ -1,18 +1,119 @@
 import os
 import time
 import hashlib
-import re
+import io
+import asyncio
 import requests
 import traceback
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from PIL import Image
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from http_client import HttpClient, AsyncHttpClient, host_of, is_ssl_error
+from domain_policy import DomainPolicy
+from shared.resilience import CircuitOpenError, DeadlineExceeded, Dependency, call, dependency, is_transient_error, time_left
+from config import (
+    MAX_IMAGE_DOWNLOAD_BYTES,
+    IMAGE_DOWNLOAD_CHUNK_SIZE,
+    TARGET_IMAGE_WIDTH,
+    REENCODE_MIN_BYTES,
+    IMAGE_OUTPUT_FORMAT,
+    IMAGE_OUTPUT_QUALITY,
+    IMAGE_STORAGE_BUCKET,
+    IMAGE_STORAGE_FOLDER,
+    CLUSTER_IMAGES_UPSERT_KEY
+)
+
+# Content types and file extensions for the image formats we accept
+IMAGE_FORMATS = {
+    "jpeg": ("image/jpeg", "jpg"),
+    "png": ("image/png", "png"),
+    "gif": ("image/gif", "gif"),
+    "webp": ("image/webp", "webp"),
+}
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """Detect the image format from the leading magic bytes.
+    
+    Args:
+        data: The first bytes of the image (at least 12 bytes)
+        
+    Returns:
+        One of the keys of IMAGE_FORMATS, or None if the bytes are not a known image format
+    """
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+class ImageStreamBuffer:
+    """Collects a streamed image body, enforcing the size cap and sniffing the format early"""
+    
+    def __init__(self, url: str, max_bytes: int):
+        """Initialize an empty buffer.
+        
+        Args:
+            url: The URL being downloaded (for log messages)
+            max_bytes: Maximum number of bytes to accept
+        """
+        self.url = url
+        self.max_bytes = max_bytes
+        self.buffer = bytearray()
+        self.image_format: Optional[str] = None
+        
+    def accepts_content_length(self, headers) -> bool:
+        """Reject the download up front if the advertised size exceeds the cap."""
+        content_length = headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            print(f"SKIPPING: Content-Length {content_length} exceeds limit of {self.max_bytes} bytes: {self.url}")
+            return False
+        return True
+        
+    def feed(self, chunk: bytes) -> bool:
+        """Append a chunk; returns False if the download should be aborted."""
+        if not chunk:
+            return True
+        self.buffer.extend(chunk)
+        
+        if len(self.buffer) > self.max_bytes:
+            print(f"SKIPPING: Download exceeded limit of {self.max_bytes} bytes: {self.url}")
+            return False
+            
+        # Sniff the format as soon as we have enough bytes
+        if self.image_format is None and len(self.buffer) >= 12:
+            self.image_format = sniff_image_format(bytes(self.buffer[:12]))
+            if self.image_format is None:
+                print(f"SKIPPING: Downloaded data is not a supported image format: {self.url}")
+                return False
+        return True
+        
+    def result(self) -> Optional[bytes]:
+        """The downloaded image bytes, or None if they are not a recognizable image."""
+        if self.image_format is None:
+            print(f"SKIPPING: Downloaded data too short to be an image ({len(self.buffer)} bytes): {self.url}")
+            return None
+        image_data = bytes(self.buffer)
+        if len(image_data) < 500:
+            print(f"WARNING: Downloaded data small ({len(image_data)} bytes) from {self.url}.")
+        return image_data
+
 class ImageStorage:
     """Handles image downloading and storage operations"""
     
-    def __init__(self):
-        """Initialize the image storage service with Supabase connection"""
+    def __init__(self, http_client: Optional[HttpClient] = None, domain_policy: Optional[DomainPolicy] = None):
+        """Initialize the image storage service with Supabase connection
+        
+        Args:
+            http_client: Shared HTTP client for downloads; a private one is created if not given
+            domain_policy: Policy the download URL (after redirects) is checked against;
+                           defaults to the config blacklist
+        """
         load_dotenv()
         SUPABASE_URL = os.environ.get("SUPABASE_URL")
         SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
@@ -22,85 +123,285 @@ class ImageStorage:
             
         self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
         self.supabase_project_url = SUPABASE_URL
+        self.http_client = http_client or HttpClient()
+        self.domain_policy = domain_policy or DomainPolicy.from_config()
+        # Content hash -> public URL for images already known to be in storage
+        self.content_index: Dict[str, str] = {}
+        
+    @staticmethod
+    def _start_download(url: str, attempt: int) -> Optional[Dependency]:
+        """Check the image host's circuit breaker and the deadline before a download attempt.
+        
+        Returns:
+            The host's Dependency, or None if the download must be skipped
+        """
+        dep = dependency("image_host", host_of(url))
+        try:
+            dep.before_attempt(attempt)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"Skipping download of {url}: {e}")
+            return None
+        return dep
+        
+    @staticmethod
+    def _retry_delay(dep: Dependency, error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+        """Record a failed download attempt and decide whether to retry it.
+        
+        Transient errors (timeouts, connection errors, 429/5xx) and TLS errors (retried
+        with verify=False) are retried after a jittered backoff, as long as the host's
+        retry budget (which refills as the host gets traffic) and the deadline allow it.
         
-    def download_image(self, url: str, max_retries: int = 1) -> Optional[bytes]:
+        Returns:
+            Seconds to wait before the next attempt, or None if the download is given up
+        """
+        transient = dep.record(error, is_transient_error)
+        if not transient and not is_ssl_error(error):
+            return None
+        return dep.retry_delay(attempt + 1, max_retries + 1)
+        
+    def download_image(self, url: str, max_retries: int = 1,
+                       max_bytes: int = MAX_IMAGE_DOWNLOAD_BYTES, verify_ssl: bool = True) -> Optional[bytes]:
         """Download image data from a URL.
         
+        The body is streamed in chunks. The download is aborted as soon as it
+        exceeds max_bytes or the first bytes are not a known image format.
+        Every host has its own circuit breaker (see shared/resilience.py): a host that
+        keeps failing is skipped without a request until its breaker recovers.
+        
         Args:
             url: The image URL to download
             max_retries: Maximum number of retry attempts
+            max_bytes: Maximum number of bytes to download
+            verify_ssl: Whether to verify the certificate on the first attempt. Pass False
+                        if validation already found the host only works without verification.
             
         Returns:
             Image bytes if download is successful, None otherwise
         """
         print(f"Downloading image from: {url}")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
         
         for attempt in range(max_retries + 1):
+            dep = self._start_download(url, attempt)
+            if dep is None:
+                return None
             try:
-                verify_ssl = True if attempt == 0 else False  # Try verify=False on retry
-                response = requests.get(
+                verify = verify_ssl and attempt == 0  # Try verify=False on retry
+                with self.http_client.stream(
                     url, 
                     allow_redirects=True, 
-                    timeout=15, 
-                    headers=headers, 
-                    stream=True, 
-                    verify=verify_ssl
-                )
-                response.raise_for_status()
-                image_data = response.content
-                
-                if len(image_data) < 500:
-                    print(f"WARNING: Downloaded data small ({len(image_data)} bytes) from {url}.")
+                    timeout=time_left(15), 
+                    verify=verify
+                ) as response:
+                    response.raise_for_status()
+                    dep.record(None, is_transient_error)
+                    
+                    stream_buffer = ImageStreamBuffer(url, max_bytes)
+                    if not stream_buffer.accepts_content_length(response.headers):
+                        return None
+                    for chunk in response.iter_content(chunk_size=IMAGE_DOWNLOAD_CHUNK_SIZE):
+                        if not stream_buffer.feed(chunk):
+                            return None
+                    
+                image_data = stream_buffer.result()
+                if image_data is None:
+                    return None
                     
-                print(f"SUCCESS: Downloaded {len(image_data)} bytes from {url}" + 
-                      (" (verify=False)" if not verify_ssl else ""))
+                print(f"SUCCESS: Downloaded {len(image_data)} bytes ({stream_buffer.image_format}) from {url}" + 
+                      (" (verify=False)" if not verify else ""))
                 return image_data
                 
             except requests.exceptions.RequestException as e_req:  # Catches SSLError, ConnectionError, Timeout, HTTPError
                 print(f"REQUEST ERROR (attempt {attempt+1}) downloading {url}: {e_req}.")
-                if attempt >= max_retries:
-                    print(f"Max retries for {url}.")
+                delay = self._retry_delay(dep, e_req, attempt, max_retries)
+                if delay is None:
+                    print(f"Not retrying {url}.")
                     return None
-                time.sleep(1)  # Simple 1s wait
+                time.sleep(delay)
                 
             except Exception as e_gen:  # Catch-all for unexpected errors
                 print(f"UNEXPECTED ERROR (attempt {attempt+1}) downloading {url}: {e_gen}.")
-                if attempt >= max_retries:
-                    print(f"Max retries for {url}.")
+                delay = self._retry_delay(dep, e_gen, attempt, max_retries)
+                if delay is None:
+                    print(f"Not retrying {url}.")
                     return None
-                time.sleep(1)
+                time.sleep(delay)
                 
         return None
         
-    def upload_to_supabase(self, image_bytes: bytes, destination_path: str) -> Optional[str]:
+    async def download_image_async(self, url: str, http_client: AsyncHttpClient, max_retries: int = 1,
+                                   max_bytes: int = MAX_IMAGE_DOWNLOAD_BYTES, verify_ssl: bool = True) -> Optional[bytes]:
+        """Async variant of download_image.
+        
+        Args:
+            url: The image URL to download
+            http_client: Open AsyncHttpClient to download with
+            max_retries: Maximum number of retry attempts
+            max_bytes: Maximum number of bytes to download
+            verify_ssl: Whether to verify the certificate on the first attempt
+            
+        Returns:
+            Image bytes if download is successful, None otherwise
+        """
+        print(f"Downloading image from: {url}")
+        
+        for attempt in range(max_retries + 1):
+            dep = self._start_download(url, attempt)
+            if dep is None:
+                return None
+            verify = verify_ssl and attempt == 0  # Try verify=False on retry
+            try:
+                async with http_client.stream(url, verify=verify) as response:
+                    response.raise_for_status()
+                    dep.record(None, is_transient_error)
+                    
+                    stream_buffer = ImageStreamBuffer(url, max_bytes)
+                    if not stream_buffer.accepts_content_length(response.headers):
+                        return None
+                    async for chunk in response.aiter_bytes(IMAGE_DOWNLOAD_CHUNK_SIZE):
+                        if not stream_buffer.feed(chunk):
+                            return None
+                            
+                image_data = stream_buffer.result()
+                if image_data is None:
+                    return None
+                    
+                print(f"SUCCESS: Downloaded {len(image_data)} bytes ({stream_buffer.image_format}) from {url}" + 
+                      (" (verify=False)" if not verify else ""))
+                return image_data
+                
+            except Exception as e:  # httpx.HTTPError covers SSL, connection, timeout and status errors
+                print(f"REQUEST ERROR (attempt {attempt+1}) downloading {url}: {e}.")
+                delay = self._retry_delay(dep, e, attempt, max_retries)
+                if delay is None:
+                    print(f"Not retrying {url}.")
+                    return None
+                await asyncio.sleep(delay)
+                
+        return None
+        
+    def optimize_image(self, image_bytes: bytes) -> Tuple[bytes, str]:
+        """Downscale and re-encode an image before upload.
+        
+        Images wider than TARGET_IMAGE_WIDTH are resized, and images that are too
+        wide or larger than REENCODE_MIN_BYTES are re-encoded as progressive JPEG
+        (or WebP, see IMAGE_OUTPUT_FORMAT). Animated GIFs and images that cannot be
+        decoded are returned unchanged.
+        
+        Args:
+            image_bytes: The downloaded image data
+            
+        Returns:
+            Tuple of (image bytes, image format key from IMAGE_FORMATS)
+        """
+        original_format = sniff_image_format(image_bytes[:12]) or "jpeg"
+        
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                if getattr(img, "is_animated", False):
+                    return image_bytes, original_format
+                    
+                too_wide = img.width > TARGET_IMAGE_WIDTH
+                if not too_wide and len(image_bytes) <= REENCODE_MIN_BYTES:
+                    return image_bytes, original_format
+                    
+                if too_wide:
+                    target_height = max(1, round(img.height * TARGET_IMAGE_WIDTH / img.width))
+                    img = img.resize((TARGET_IMAGE_WIDTH, target_height), Image.LANCZOS)
+                    
+                output_format = IMAGE_OUTPUT_FORMAT.upper()
+                if output_format == "JPEG" and img.mode != "RGB":
+                    img = img.convert("RGB")
+                    
+                output = io.BytesIO()
+                if output_format == "WEBP":
+                    img.save(output, format="WEBP", quality=IMAGE_OUTPUT_QUALITY, method=4)
+                else:
+                    img.save(output, format="JPEG", quality=IMAGE_OUTPUT_QUALITY, optimize=True, progressive=True)
+                optimized_bytes = output.getvalue()
+                
+            # Keep the original if re-encoding did not help and no resize was needed
+            if not too_wide and len(optimized_bytes) >= len(image_bytes):
+                return image_bytes, original_format
+                
+            print(f"Optimized image: {len(image_bytes)} -> {len(optimized_bytes)} bytes ({output_format.lower()})")
+            return optimized_bytes, output_format.lower()
+            
+        except Exception as e:
+            print(f"WARNING: Could not optimize image, uploading original: {e}")
+            return image_bytes, original_format
+        
+    def get_public_url(self, destination_path: str) -> Optional[str]:
+        """Build the public URL of an object in the image bucket.
+        
+        Args:
+            destination_path: The path of the object in the storage bucket
+            
+        Returns:
+            The public URL, or None if SUPABASE_URL is missing
+        """
+        if not self.supabase_project_url:
+            print("ERROR: SUPABASE_URL missing.")
+            return None
+        return f"{self.supabase_project_url.rstrip('/')}/storage/v1/object/public/{IMAGE_STORAGE_BUCKET}/{destination_path}"
+        
+    def find_existing_image(self, content_hash: str, destination_path: str) -> Optional[str]:
+        """Look up an already stored image by its content hash.
+        
+        Checks the in-process index first and then the storage bucket itself, since
+        the destination path is derived from the content hash.
+        
+        Args:
+            content_hash: SHA-256 hex digest of the image bytes
+            destination_path: The content-addressed path in the storage bucket
+            
+        Returns:
+            Public URL of the stored image, or None if it is not stored yet
+        """
+        if content_hash in self.content_index:
+            return self.content_index[content_hash]
+            
+        folder, _, filename = destination_path.rpartition('/')
+        try:
+            existing = call("supabase", self.supabase.storage.from_(IMAGE_STORAGE_BUCKET).list,
+                            folder, {"search": filename, "limit": 1})
+            if any(item.get("name") == filename for item in existing or []):
+                public_url = self.get_public_url(destination_path)
+                if public_url:
+                    self.content_index[content_hash] = public_url
+                return public_url
+        except Exception as e:
+            print(f"WARNING: Storage lookup for {destination_path} failed, uploading anyway: {e}")
+        return None
+        
+    def upload_to_supabase(self, image_bytes: bytes, destination_path: str,
+                           content_type: str = "image/jpeg") -> Optional[str]:
         """Upload image bytes to Supabase storage.
         
         Args:
             image_bytes: The image data to upload
             destination_path: The destination path in the storage bucket
+            content_type: The MIME type of the image data
             
         Returns:
             Public URL of the uploaded image, or None if upload fails
         """
-        bucket_name = 'images'
-        content_type = "image/jpeg"
+        bucket_name = IMAGE_STORAGE_BUCKET
         print(f"Uploading {len(image_bytes)} bytes to Supabase: {bucket_name}/{destination_path}")
         
         try:
-            self.supabase.storage.from_(bucket_name).upload(
+            # upsert=true makes the upload safe to retry
+            call(
+                "supabase",
+                self.supabase.storage.from_(bucket_name).upload,
                 path=destination_path, 
                 file=image_bytes, 
                 file_options={"contentType": content_type, "cacheControl": "3600", "upsert": "true"}
             )
             
-            if not self.supabase_project_url:
-                print("ERROR: SUPABASE_URL missing.")
+            public_url = self.get_public_url(destination_path)
+            if not public_url:
                 return None
                 
-            public_url = f"{self.supabase_project_url.rstrip('/')}/storage/v1/object/public/{bucket_name}/{destination_path}"
             print(f"SUCCESS: Uploaded to Supabase. URL: {public_url}")
             return public_url
             
@@ -108,7 +409,8 @@ class ImageStorage:
             print(f"ERROR: Supabase upload failed: {e}\n{traceback.format_exc()}")
             return None
             
-    def save_image_info(self, cluster_id: str, image_url: str, original_url: str, view: str) -> bool:
+    def save_image_info(self, cluster_id: str, image_url: str, original_url: str, view: str,
+                        phash: Optional[str] = None) -> bool:
         """Save image information to the cluster_images table.
         
         Args:
@@ -116,6 +418,8 @@ class ImageStorage:
             image_url: The URL of the stored image in Supabase
             original_url: The original URL the image was downloaded from
             view: The view/perspective (e.g., "coach", "team", "player", etc.)
+            phash: Hex-encoded perceptual hash of the image, if known (needs the
+                   phash column, see sql/cluster_images_phash.sql)
             
         Returns:
             True if the save was successful, False otherwise
@@ -129,8 +433,10 @@ class ImageStorage:
                 "original_url": original_url,
                 "view": view
             }
+            if phash:
+                data["phash"] = phash
             
-            response = self.supabase.table("cluster_images").insert(data).execute()
+            response = call("supabase", self.supabase.table("cluster_images").insert(data).execute, max_attempts=1)
             
             if response.data:
                 print(f"Successfully saved image info to cluster_images table for cluster {cluster_id}, view {view}")
@@ -143,12 +449,115 @@ class ImageStorage:
             print(f"ERROR: Failed to save image info to cluster_images table: {e}\n{traceback.format_exc()}")
             return False
             
+    def save_image_infos(self, rows: List[Dict[str, Any]]) -> bool:
+        """Save several image records to the cluster_images table in one request.
+        
+        Rows are upserted on CLUSTER_IMAGES_UPSERT_KEY (unique index in
+        sql/cluster_images_upsert_key.sql), so writing the same rows again (e.g.
+        when retrying a failed flush) does not create duplicates. Rows sharing a
+        key within the batch are collapsed to the last one first: articles of the
+        same cluster and view can store byte-identical images, which get the same
+        content-addressed URL, and Postgres rejects an upsert that would update
+        one row twice.
+        
+        Args:
+            rows: Dictionaries with cluster_id, image_url, original_url, view and optionally phash
+            
+        Returns:
+            True if the save was successful, False otherwise
+        """
+        if not rows:
+            return True
+            
+        key_columns = CLUSTER_IMAGES_UPSERT_KEY.split(",")
+        rows = list({tuple(row.get(column) for column in key_columns): row for row in rows}.values())
+            
+        print(f"Saving {len(rows)} image records to cluster_images table...")
+        try:
+            query = self.supabase.table("cluster_images")\
+                                .upsert(rows, on_conflict=CLUSTER_IMAGES_UPSERT_KEY)
+            response = call("supabase", query.execute)
+            if response.data:
+                print(f"Successfully saved {len(response.data)} image records to cluster_images table.")
+                return True
+            else:
+                print(f"Failed to save image records to cluster_images. Response: {response}")
+                return False
+        except Exception as e:
+            print(f"ERROR: Failed to save image records to cluster_images table: {e}\n{traceback.format_exc()}")
+            return False
+            
+    def fetch_recent_image_hashes(self, limit: int) -> List[str]:
+        """Fetch perceptual hashes of the most recently stored images.
+        
+        Requires the phash column of cluster_images (sql/cluster_images_phash.sql).
+        
+        Args:
+            limit: Maximum number of hashes to fetch
+            
+        Returns:
+            List of hex-encoded hashes, empty on error
+        """
+        try:
+            query = self.supabase.table("cluster_images")\
+                                .select("phash")\
+                                .not_.is_("phash", "null")\
+                                .order("created_at", desc=True)\
+                                .limit(limit)
+            response = call("supabase", query.execute)
+            return [row["phash"] for row in response.data or [] if row.get("phash")]
+        except Exception as e:
+            print(f"WARNING: Failed to fetch image hashes from cluster_images: {e}")
+            return []
+            
     def process_and_upload_image(self, image_data: Dict[str, Any], query_for_filename: str) -> Optional[str]:
         """Download an image and upload it to Supabase storage.
         
+        Images are stored content-addressed under the SHA-256 of the optimized
+        bytes, so the same image found via different URLs or queries is stored
+        once and its existing public URL is reused.
+        
+        If the candidate carries HEAD metadata from ImageValidator.inspect_image_url,
+        the download goes straight to the resolved URL with the TLS mode that worked
+        during validation, and images known to exceed the size cap are skipped.
+        
+        Args:
+            image_data: Dictionary containing image URL and metadata
+            query_for_filename: Search query the image was found with (only used for logging)
+            
+        Returns:
+            Public URL of the uploaded image, or None if processing fails
+        """
+        image_url = image_data.get("url")
+        if not image_url:
+            print("No URL in selected image data.")
+            return None
+        
+        print(f"Processing image for upload: {image_url} (query: '{query_for_filename}')")
+        download_url = self._download_url(image_data)
+        if not download_url or self._exceeds_size_limit(image_data):
+            return None
+            
+        image_bytes = self.download_image(
+            download_url,
+            verify_ssl=image_data.get("verify_ssl", True)
+        )
+        if not image_bytes:
+            return None
+        
+        return self.store_image_bytes(image_bytes)
+        
+    async def process_and_upload_image_async(self, image_data: Dict[str, Any], query_for_filename: str,
+                                             http_client: AsyncHttpClient) -> Optional[str]:
+        """Async variant of process_and_upload_image.
+        
+        The download is awaited on the async client; optimizing and uploading run
+        in a worker thread since Pillow and the Supabase client are blocking.
+        
         Args:
             image_data: Dictionary containing image URL and metadata
-            query_for_filename: Search query to use in the filename
+            query_for_filename: Search query the image was found with (only used for logging)
+            http_client: Open AsyncHttpClient to download with
             
         Returns:
             Public URL of the uploaded image, or None if processing fails
@@ -158,13 +567,65 @@ class ImageStorage:
             print("No URL in selected image data.")
             return None
         
-        print(f"Processing image for upload: {image_url}")
-        image_bytes = self.download_image(image_url)
+        print(f"Processing image for upload: {image_url} (query: '{query_for_filename}')")
+        download_url = self._download_url(image_data)
+        if not download_url or self._exceeds_size_limit(image_data):
+            return None
+            
+        image_bytes = await self.download_image_async(
+            download_url,
+            http_client,
+            verify_ssl=image_data.get("verify_ssl", True)
+        )
         if not image_bytes:
             return None
         
-        safe_query_part = re.sub(r'\W+', '_', query_for_filename.split()[0] if query_for_filename else "ai_img")[:20]
-        url_hash = hashlib.md5(image_url.encode()).hexdigest()[:8]
-        destination_path = f"public/{safe_query_part}_{url_hash}.jpg"
+        return await asyncio.to_thread(self.store_image_bytes, image_bytes)
+        
+    def _download_url(self, image_data: Dict[str, Any]) -> Optional[str]:
+        """The URL to download: the redirect target found during validation, if the domain policy allows it.
+        
+        Returns:
+            The URL, or None if the original URL or its redirect target is on a denied host
+        """
+        image_url = image_data["url"]
+        resolved_url = image_data.get("resolved_url") or image_url
+        for url in {image_url, resolved_url}:
+            if self.domain_policy.is_denied(url):
+                print(f"SKIPPING: {image_url} resolves to blacklisted URL: {url}")
+                return None
+        return resolved_url
+        
+    @staticmethod
+    def _exceeds_size_limit(image_data: Dict[str, Any]) -> bool:
+        """Check the Content-Length recorded during validation against the download cap."""
+        content_length = image_data.get("content_length")
+        if content_length and content_length > MAX_IMAGE_DOWNLOAD_BYTES:
+            print(f"SKIPPING: Image is {content_length} bytes, above the limit of {MAX_IMAGE_DOWNLOAD_BYTES}: {image_data.get('url')}")
+            return True
+        return False
+        
+    def store_image_bytes(self, image_bytes: bytes) -> Optional[str]:
+        """Optimize downloaded image bytes and store them content-addressed.
+        
+        Args:
+            image_bytes: The downloaded image data
+            
+        Returns:
+            Public URL of the stored image (existing or newly uploaded), or None if the upload fails
+        """
+        image_bytes, image_format = self.optimize_image(image_bytes)
+        content_type, extension = IMAGE_FORMATS[image_format]
+        
+        content_hash = hashlib.sha256(image_bytes).hexdigest()
+        destination_path = f"{IMAGE_STORAGE_FOLDER}/{content_hash}.{extension}"
+        
+        existing_url = self.find_existing_image(content_hash, destination_path)
+        if existing_url:
+            print(f"SUCCESS: Image already stored, reusing {existing_url}")
+            return existing_url
         
-        return self.upload_to_supabase(image_bytes, destination_path)
\ No newline at end of file
+        public_url = self.upload_to_supabase(image_bytes, destination_path, content_type)
+        if public_url:
+            self.content_index[content_hash] = public_url
+        return public_url
@@ -1,15 +1,25 @@
+import asyncio
+import httpx
 import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
+from itertools import islice
 import traceback
 
-from config import BLACKLISTED_DOMAINS
+from domain_policy import DomainPolicy
+from http_client import HttpClient, AsyncHttpClient, consume_retry, is_ssl_error
 
 class ImageValidator:
     """Handles validation of image URLs"""
     
-    def __init__(self):
-        """Initialize the image validator with blacklist domains"""
-        self.blacklisted_domains = BLACKLISTED_DOMAINS
+    def __init__(self, domain_policy: Optional[DomainPolicy] = None, http_client: Optional[HttpClient] = None):
+        """Initialize the image validator with a domain allow/deny policy
+        
+        Args:
+            domain_policy: Policy to check image hosts against; defaults to the config blacklist
+            http_client: Shared HTTP client; a private one is created if not given
+        """
+        self.domain_policy = domain_policy or DomainPolicy.from_config()
+        self.http_client = http_client or HttpClient()
         
     def validate_image_url(self, image_url: str) -> bool:
         """Validate if an image URL is accessible and not blacklisted.
@@ -20,6 +30,24 @@ class ImageValidator:
         Returns:
             True if the URL is valid and accessible, False otherwise
         """
+        return self.inspect_image_url(image_url) is not None
+        
+    @staticmethod
+    def _response_metadata(response, verify_ssl: bool) -> Dict[str, Any]:
+        """Collect what the download needs to know from a successful HEAD response.
+        
+        Works for both requests and httpx responses.
+        """
+        content_length = response.headers.get('Content-Length', '')
+        return {
+            'resolved_url': str(response.url),
+            'content_type': response.headers.get('Content-Type', '').lower(),
+            'content_length': int(content_length) if content_length.isdigit() else None,
+            'verify_ssl': verify_ssl
+        }
+        
+    def _passes_static_checks(self, image_url: str) -> bool:
+        """Check URL shape and domain policy before any request is made."""
         print(f"Validating URL: {image_url}")
         
         # Basic validation
@@ -27,53 +55,78 @@ class ImageValidator:
             print("SKIPPING: Invalid URL.")
             return False
             
-        # Check against blacklist
-        if any(domain in image_url.lower() for domain in self.blacklisted_domains):
+        # Check the URL's host against the domain policy
+        if self.domain_policy.is_denied(image_url):
             print(f"SKIPPING: Blacklisted URL: {image_url}")
             return False
+        return True
+        
+    def _is_acceptable_response(self, image_url: str, response) -> bool:
+        """Check status code, redirect target and content type of a HEAD response (requests or httpx)."""
+        if self.domain_policy.is_denied(str(response.url)):
+            print(f"SKIPPING: {image_url} redirects to blacklisted URL: {response.url}")
+            return False
+        if response.status_code != 200:
+            print(f"SKIPPING: Status {response.status_code}: {image_url}")
+            return False
+            
+        content_type = response.headers.get('Content-Type', '').lower()
+        if not any(t in content_type for t in ['image/', 'application/octet-stream']):
+            if not any(image_url.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']):
+                print(f"SKIPPING: Invalid content type ({content_type}) and extension: {image_url}")
+                return False
+        return True
+        
+    def inspect_image_url(self, image_url: str) -> Optional[Dict[str, Any]]:
+        """Validate an image URL and return the metadata of its HEAD response.
+        
+        Args:
+            image_url: The image URL to validate
+            
+        Returns:
+            Dictionary with resolved_url (after redirects), content_type, content_length
+            and verify_ssl (False if the host only worked without certificate
+            verification), or None if the URL is invalid or inaccessible
+        """
+        if not self._passes_static_checks(image_url):
+            return None
             
         # Check if accessible
         try:
-            headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"}
-            response = requests.head(image_url, allow_redirects=True, timeout=10, headers=headers, verify=True)
+            response = self.http_client.head(image_url, allow_redirects=True, timeout=10, verify=True)
             
-            if response.status_code != 200:
-                print(f"SKIPPING: Status {response.status_code}: {image_url}")
-                return False
+            if not self._is_acceptable_response(image_url, response):
+                return None
                 
-            content_type = response.headers.get('Content-Type', '').lower()
-            if not any(t in content_type for t in ['image/', 'application/octet-stream']):
-                if not any(image_url.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']):
-                    print(f"SKIPPING: Invalid content type ({content_type}) and extension: {image_url}")
-                    return False
-                    
             print(f"SUCCESS: Validated URL: {image_url}")
-            return True
+            return self._response_metadata(response, verify_ssl=True)
             
         except requests.exceptions.SSLError:
+            if not consume_retry(image_url):
+                print(f"SKIPPING: SSL Error and no retries left for host: {image_url}")
+                return None
             print(f"WARNING: SSL Error for {image_url}. Retrying with verify=False.")
             try:
-                retry_headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"}
-                response_retry = requests.head(image_url, allow_redirects=True, timeout=10, headers=retry_headers, verify=False)
+                response_retry = self.http_client.head(image_url, allow_redirects=True, timeout=10, verify=False)
                 
                 if response_retry.status_code == 200: 
                     print(f"SUCCESS (verify=False): {image_url}")
-                    return True
+                    return self._response_metadata(response_retry, verify_ssl=False)
                     
                 print(f"SKIPPING (verify=False): Status {response_retry.status_code}: {image_url}")
-                return False
+                return None
                 
             except Exception as e_inner: 
                 print(f"ERROR (verify=False) validating {image_url}: {e_inner}")
-                return False
+                return None
                 
         except requests.exceptions.RequestException as e: 
             print(f"ERROR validating {image_url}: {e}")
-            return False
+            return None
             
         except Exception as e_gen: 
             print(f"UNEXPECTED VALIDATION ERROR for {image_url}: {e_gen}")
-            return False
+            return None
             
     def filter_valid_images(self, candidates: List[Dict[str, Any]], 
                            max_valid: int = 12) -> List[Dict[str, Any]]:
@@ -84,16 +137,106 @@ class ImageValidator:
             max_valid: Maximum number of valid candidates to return
             
         Returns:
-            List of image candidates with valid URLs, limited to max_valid
+            List of image candidates with valid URLs, limited to max_valid. Each valid
+            candidate is updated with the HEAD metadata from inspect_image_url.
         """
         valid_candidates = []
         
         for candidate in candidates:
             url = candidate.get('url')
-            if self.validate_image_url(url):
+            metadata = self.inspect_image_url(url)
+            if metadata is not None:
+                candidate.update(metadata)
                 valid_candidates.append(candidate)
                 
             if len(valid_candidates) >= max_valid:
                 break
                 
-        return valid_candidates
\ No newline at end of file
+        return valid_candidates
+        
+    async def inspect_image_url_async(self, image_url: str, http_client: AsyncHttpClient) -> Optional[Dict[str, Any]]:
+        """Async variant of inspect_image_url.
+        
+        Args:
+            image_url: The image URL to validate
+            http_client: Open AsyncHttpClient to send the HEAD request with
+            
+        Returns:
+            Same metadata dictionary as inspect_image_url, or None if the URL is invalid or inaccessible
+        """
+        if not self._passes_static_checks(image_url):
+            return None
+            
+        verify_ssl = True
+        try:
+            try:
+                response = await http_client.head(image_url, verify=True)
+            except httpx.HTTPError as e:
+                if not is_ssl_error(e):
+                    raise
+                if not consume_retry(image_url):
+                    print(f"SKIPPING: SSL Error and no retries left for host: {image_url}")
+                    return None
+                print(f"WARNING: SSL Error for {image_url}. Retrying with verify=False.")
+                verify_ssl = False
+                response = await http_client.head(image_url, verify=False)
+                
+            if verify_ssl and not self._is_acceptable_response(image_url, response):
+                return None
+            if not verify_ssl and response.status_code != 200:
+                print(f"SKIPPING (verify=False): Status {response.status_code}: {image_url}")
+                return None
+                
+            print(f"SUCCESS: Validated URL: {image_url}" + (" (verify=False)" if not verify_ssl else ""))
+            return self._response_metadata(response, verify_ssl=verify_ssl)
+            
+        except httpx.HTTPError as e:
+            print(f"ERROR validating {image_url}: {e}")
+            return None
+            
+        except Exception as e_gen: 
+            print(f"UNEXPECTED VALIDATION ERROR for {image_url}: {e_gen}")
+            return None
+            
+    async def filter_valid_images_async(self, candidates: Iterable[Dict[str, Any]], http_client: AsyncHttpClient,
+                                        max_valid: int = 12) -> List[Dict[str, Any]]:
+        """Async variant of filter_valid_images that validates candidates concurrently.
+        
+        Candidates are taken from the iterable in waves sized to the number of
+        valid candidates still needed and each wave is validated concurrently, so
+        no more HEAD requests are sent than necessary while the original order is
+        preserved. The iterable may be a lazy generator such as
+        ImageSearch.iter_images or ImageRanker.iter_ranked: it is advanced in a worker thread, and closed as
+        soon as max_valid candidates have passed, so no further results are
+        consumed.
+        
+        Args:
+            candidates: Image candidate objects, as a list or a lazy iterator
+            http_client: Open AsyncHttpClient to send the HEAD requests with
+            max_valid: Maximum number of valid candidates to return
+            
+        Returns:
+            List of image candidates with valid URLs, limited to max_valid
+        """
+        valid_candidates = []
+        candidate_iter = iter(candidates)
+        
+        try:
+            while len(valid_candidates) < max_valid:
+                wave_size = max_valid - len(valid_candidates)
+                wave = await asyncio.to_thread(lambda: list(islice(candidate_iter, wave_size)))
+                if not wave:
+                    break
+                results = await asyncio.gather(*(
+                    self.inspect_image_url_async(candidate.get('url'), http_client) for candidate in wave
+                ))
+                for candidate, metadata in zip(wave, results):
+                    if metadata is not None:
+                        candidate.update(metadata)
+                        valid_candidates.append(candidate)
+        finally:
+            close = getattr(candidate_iter, 'close', None)
+            if close is not None:
+                await asyncio.to_thread(close)
+                    
+        return valid_candidates[:max_valid]
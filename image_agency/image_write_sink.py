@@ -0,0 +1,85 @@
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import WRITE_SINK_FLUSH_SIZE, CLUSTER_IMAGES_UPSERT_KEY
+
+class ImageWriteSink:
+    """Write-behind buffer for the database writes that follow an image upload.
+    
+    Instead of one cluster_images insert and one hasImage update per article,
+    records are collected and flushed as one bulk upsert into cluster_images plus
+    one in_-filtered update per article table. Buffered records are only dropped
+    after their writes succeed, and both writes are idempotent, so a failed flush
+    is simply repeated (at-least-once delivery). cluster_images rows are buffered
+    by their upsert key, so byte-identical images stored for two articles of the
+    same cluster and view become one row instead of failing the bulk upsert.
+    """
+    
+    def __init__(self, image_storage, article_service, flush_size: int = WRITE_SINK_FLUSH_SIZE):
+        """Initialize the sink.
+        
+        Args:
+            image_storage: ImageStorage used for the cluster_images upsert
+            article_service: ArticleService used for the hasImage updates
+            flush_size: Number of buffered images that triggers an automatic flush
+        """
+        self.image_storage = image_storage
+        self.article_service = article_service
+        self.flush_size = flush_size
+        # Upsert key (CLUSTER_IMAGES_UPSERT_KEY columns) -> row
+        self.image_rows: Dict[Tuple, Dict[str, Any]] = {}
+        self.has_image_updates: Dict[str, List[str]] = {}
+        
+    def add(self, table_name: str, article_id: str, image_url: str, cluster_id: Optional[str] = None,
+            view: Optional[str] = None, original_url: Optional[str] = None, phash: Optional[str] = None) -> None:
+        """Buffer the writes for one uploaded image.
+        
+        Args:
+            table_name: The table containing the article
+            article_id: The ID of the article to mark as having an image
+            image_url: The URL of the stored image in Supabase
+            cluster_id: The cluster of the article; no cluster_images row is written without it
+            view: The view/perspective of the article
+            original_url: The original URL the image was downloaded from
+            phash: Hex-encoded perceptual hash of the image, if known
+        """
+        if cluster_id and view:
+            row = {
+                "cluster_id": cluster_id,
+                "image_url": image_url,
+                "original_url": original_url or "unknown",
+                "view": view
+            }
+            if phash:
+                row["phash"] = phash
+            key = tuple(row[column] for column in CLUSTER_IMAGES_UPSERT_KEY.split(","))
+            self.image_rows[key] = row
+            
+        self.has_image_updates.setdefault(table_name, []).append(article_id)
+        
+        pending = sum(len(ids) for ids in self.has_image_updates.values())
+        if pending >= self.flush_size:
+            self.flush()
+            
+    def flush(self) -> bool:
+        """Write all buffered records.
+        
+        cluster_images rows are written before the hasImage flags, so an article is
+        never marked as having an image whose record is missing.
+        
+        Returns:
+            True if everything was written, False if some records remain buffered
+        """
+        if self.image_rows:
+            if not self.image_storage.save_image_infos(list(self.image_rows.values())):
+                print(f"Warning: Keeping {len(self.image_rows)} cluster_images rows buffered for the next flush.")
+                return False
+            self.image_rows = {}
+            
+        success = True
+        for table_name in list(self.has_image_updates):
+            if self.article_service.mark_articles_have_images(table_name, self.has_image_updates[table_name]):
+                del self.has_image_updates[table_name]
+            else:
+                print(f"Warning: Keeping hasImage updates for {table_name} buffered for the next flush.")
+                success = False
+        return success
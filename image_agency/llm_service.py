@@ -5,10 +5,14 @@ import json
 from typing import Optional, Any, Dict, List
 from dotenv import load_dotenv
 
+from shared.model_router import router
 from config import (
-    LLM_MODEL_NAME,
+    LLM_ROUTING_STAGES,
     MAX_ARTICLE_CHARS_FOR_LLM_QUERY_GEN,
     MAX_ARTICLE_CHARS_FOR_LLM_SELECTION,
+    QUERY_GEN_BATCH_CHAR_BUDGET,
+    QUERY_GEN_BATCH_ITEM_CHARS,
+    QUERY_GEN_MAX_BATCH_SIZE,
     DESIRED_MIN_WIDTH,
     DESIRED_MIN_HEIGHT
 )
@@ -18,15 +22,19 @@ class LLMService:
         """Initialize the LLM service with Google Generative AI"""
         load_dotenv()
         self.llm_model = None
+        self._models: Dict[str, Any] = {}  # GenerativeModel per model name picked by the router
         google_api_key = os.environ.get("GEMINI_API_KEY")
         
         if google_api_key:
+            # Primary model of the query generation tier; fallbacks are created on first use
+            model_name = router.tiers[router.tier_for(LLM_ROUTING_STAGES["query"])]["models"][0]
             try:
                 genai.configure(api_key=google_api_key)
-                self.llm_model = genai.GenerativeModel(LLM_MODEL_NAME)
-                print(f"Successfully initialized LLM: {LLM_MODEL_NAME}")
+                self.llm_model = genai.GenerativeModel(model_name)
+                self._models[model_name] = self.llm_model
+                print(f"Successfully initialized LLM: {model_name}")
             except Exception as e:
-                print(f"ERROR: Failed to initialize LLM ({LLM_MODEL_NAME}): {e}. LLM features unavailable.")
+                print(f"ERROR: Failed to initialize LLM ({model_name}): {e}. LLM features unavailable.")
         else:
             print("WARNING: GEMINI_API_KEY not set. LLM features will be disabled.")
     
@@ -34,6 +42,26 @@ class LLMService:
         """Check if the LLM service is available."""
         return self.llm_model is not None
         
+    def _generate(self, stage: str, prompt: str, **kwargs: Any) -> Any:
+        """Call Gemini with the models the model router picks for a stage.
+        
+        Quota errors and timeouts fall back to the next model of the stage's tier,
+        and models that are slower than the tier's latency SLO are routed around.
+        
+        Args:
+            stage: Routing stage (see model_router.STAGE_TIERS)
+            prompt: The prompt text
+            **kwargs: Passed to generate_content (safety settings, generation config)
+            
+        Returns:
+            The response of the first model that answered
+        """
+        def generate(model_name: str, timeout: float) -> Any:
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name].generate_content(prompt, request_options={"timeout": timeout}, **kwargs)
+        return router.call(stage, generate, prompt_chars=len(prompt))
+        
     def generate_search_query(self, article_content: str) -> Optional[str]:
         """Generate an image search query from article content.
         
@@ -66,12 +94,9 @@ class LLMService:
             safety_settings = [{"category": c, "threshold": "BLOCK_NONE"} for c in [
                 "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", 
                 "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]]
-            response = self.llm_model.generate_content(prompt, safety_settings=safety_settings)
+            response = self._generate(LLM_ROUTING_STAGES["query"], prompt, safety_settings=safety_settings)
             if response.parts:
-                generated_query = response.text.strip()
-                if generated_query.lower().startswith("search query:"):
-                    generated_query = generated_query.split(":", 1)[1].strip()
-                generated_query = generated_query.replace('"', '').replace("'", "").strip()
+                generated_query = self._clean_query(response.text)
                 if not generated_query:
                     print("LLM generated an empty query.")
                     return None
@@ -86,6 +111,115 @@ class LLMService:
             print(f"Error during LLM query generation: {e}\n{traceback.format_exc()}")
             return None
     
+    @staticmethod
+    def _clean_query(raw_query: str) -> str:
+        """Strip labels and quotes the LLM sometimes adds around a search query."""
+        query = raw_query.strip()
+        if query.lower().startswith("search query:"):
+            query = query.split(":", 1)[1].strip()
+        return query.replace('"', '').replace("'", "").strip()
+        
+    def _pack_query_batches(self, articles: List[Dict[str, Any]]) -> List[List[Dict[str, str]]]:
+        """Pack article excerpts into request-sized batches.
+        
+        Excerpts are capped at QUERY_GEN_BATCH_ITEM_CHARS, so short articles take up
+        less of the QUERY_GEN_BATCH_CHAR_BUDGET and more of them fit into one request.
+        
+        Args:
+            articles: List of article dictionaries with 'id' and 'content'
+            
+        Returns:
+            List of batches, each a list of {"id", "excerpt"} dictionaries
+        """
+        batches = []
+        current = []
+        used_chars = 0
+        for article in articles:
+            excerpt = (article.get("content") or "")[:QUERY_GEN_BATCH_ITEM_CHARS]
+            if current and (used_chars + len(excerpt) > QUERY_GEN_BATCH_CHAR_BUDGET
+                            or len(current) >= QUERY_GEN_MAX_BATCH_SIZE):
+                batches.append(current)
+                current = []
+                used_chars = 0
+            current.append({"id": str(article["id"]), "excerpt": excerpt})
+            used_chars += len(excerpt)
+        if current:
+            batches.append(current)
+        return batches
+        
+    def generate_search_queries(self, articles: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Generate image search queries for several articles with as few LLM calls as possible.
+        
+        Article excerpts are packed into batched requests returning structured JSON.
+        Articles whose query is missing or unparseable fall back to
+        generate_search_query on their full content.
+        
+        Args:
+            articles: List of article dictionaries with 'id' and 'content'
+            
+        Returns:
+            Dictionary mapping article ID (as string) to its search query, or None if generation failed
+        """
+        if not self.is_available():
+            return {str(article["id"]): None for article in articles}
+            
+        queries: Dict[str, Optional[str]] = {}
+        batches = self._pack_query_batches(articles)
+        print(f"Generating search queries for {len(articles)} articles in {len(batches)} LLM request(s)...")
+        
+        safety_settings = [{"category": c, "threshold": "BLOCK_NONE"} for c in [
+            "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", 
+            "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]]
+        generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+        
+        for batch in batches:
+            articles_prompt_str = "\n\n".join(
+                f"Article ID: {item['id']}\n---\n{item['excerpt']}\n---" for item in batch
+            )
+            prompt = f"""
+        For each of the following articles, generate a concise, effective image search query (3-7 words)
+        suitable for finding a single, compelling, representative main image for that article.
+        Focus on visually descriptive terms.
+
+        Articles:
+        {articles_prompt_str}
+
+        Output your response in JSON format with a single key "queries" holding a list with one entry per article:
+        {{
+          "queries": [
+            {{"id": "<article id>", "query": "red cat jumping"}}
+          ]
+        }}
+        """
+            try:
+                response = self._generate(LLM_ROUTING_STAGES["query"], prompt, safety_settings=safety_settings, generation_config=generation_config)
+                if response.parts:
+                    parsed_json = json.loads(response.text.strip())
+                    for entry in parsed_json.get("queries", []):
+                        if not isinstance(entry, dict):
+                            continue
+                        query = self._clean_query(str(entry.get("query") or ""))
+                        if query:
+                            queries[str(entry.get("id"))] = query
+                else:
+                    print("LLM response for batched query generation was empty or blocked.")
+            except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+                print(f"Batched query generation: Failed to parse JSON or invalid content: {e}")
+            except Exception as e:
+                print(f"Error during batched LLM query generation: {e}\n{traceback.format_exc()}")
+                
+        # Per-article fallback for anything the batched requests did not cover
+        results: Dict[str, Optional[str]] = {}
+        for article in articles:
+            article_id = str(article["id"])
+            if queries.get(article_id):
+                print(f"LLM generated search query for article {article_id}: '{queries[article_id]}'")
+                results[article_id] = queries[article_id]
+            else:
+                print(f"No batched query for article {article_id}. Falling back to single request.")
+                results[article_id] = self.generate_search_query(article.get("content") or "")
+        return results
+    
     def select_best_image(self, image_candidates: List[Dict[str, Any]], article_snippet: str, 
                          search_query: str) -> Optional[Dict[str, Any]]:
         """Select the best image from candidates using LLM.
@@ -163,7 +297,7 @@ class LLMService:
                 "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH", 
                 "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]]
             generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-            response = self.llm_model.generate_content(prompt, safety_settings=safety_settings, generation_config=generation_config)
+            response = self._generate(LLM_ROUTING_STAGES["selection"], prompt, safety_settings=safety_settings, generation_config=generation_config)
 
             if response.parts:
                 llm_output_text = response.text.strip()
@@ -2,163 +2,176 @@
 Main Image Service - Orchestrates the image search, selection and upload process
 """
 import argparse
+import asyncio
+import importlib
+import os
 import sys
-import time
-from typing import Optional, List, Dict, Any
-from article_service import ArticleService
-from llm_service import LLMService
-from image_search import ImageSearch
-from image_validation import ImageValidator
-from image_storage import ImageStorage
-from config import CANDIDATES_TO_LLM_FOR_SELECTION, TABLES_FOR_IMAGES
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from shared.startup import StartupProfiler
+from config import TABLES_FOR_IMAGES, PHASH_INDEX_SIZE, MAX_ARTICLES_IN_FLIGHT
+
+if TYPE_CHECKING:
+    from image_write_sink import ImageWriteSink
+
+# Service components, imported when the service is created rather than at module import:
+# they pull in Supabase, Gemini, DDGS, httpx, PIL and numpy, which the "tables" command
+# and importers of this module (e.g. the cluster pipeline) do not need up front
+COMPONENT_MODULES = [
+    "http_client", "domain_policy", "article_service", "image_storage",
+    "llm_service", "image_search", "image_validation", "image_dedup", "image_ranking",
+    "async_image_service",
+]
+
+def import_components(profiler: Optional[StartupProfiler] = None) -> None:
+    """Import the service component modules, timing each one when profiling.
+    
+    Args:
+        profiler: Optional startup profiler recording one phase per module
+    """
+    profiler = profiler or StartupProfiler(enabled=False)
+    for module_name in COMPONENT_MODULES:
+        with profiler.phase(f"import {module_name}"):
+            importlib.import_module(module_name)
 
 class MainImageService:
     """Main orchestration service that coordinates the image search workflow"""
     
-    def __init__(self):
-        """Initialize the main image service with all required components"""
+    def __init__(self, max_in_flight: int = MAX_ARTICLES_IN_FLIGHT):
+        """Initialize the main image service with all required components
+        
+        Args:
+            max_in_flight: Maximum number of articles processed concurrently in batch runs
+        """
+        from article_service import ArticleService
+        from llm_service import LLMService
+        from image_search import ImageSearch
+        from image_validation import ImageValidator
+        from image_storage import ImageStorage
+        from image_dedup import ImageDeduplicator
+        from image_ranking import ImageRanker
+        from domain_policy import load_domain_policy
+        from http_client import HttpClient
+        
+        self.max_in_flight = max_in_flight
         self.article_service = ArticleService()
         self.llm_service = LLMService()
         self.image_search = ImageSearch()
-        self.image_validator = ImageValidator()
-        self.image_storage = ImageStorage()
+        self.http_client = HttpClient()  # Shared by validation and download to reuse connections
+        self.image_storage = ImageStorage(self.http_client)
+        self.domain_policy = load_domain_policy(self.image_storage.supabase)
+        self.image_storage.domain_policy = self.domain_policy
+        self.image_validator = ImageValidator(self.domain_policy, self.http_client)
+        self.image_ranker = ImageRanker(self.domain_policy)
+        self.image_deduplicator = ImageDeduplicator(
+            self.image_storage.fetch_recent_image_hashes(PHASH_INDEX_SIZE),
+            http_client=self.http_client
+        )
         print("Main Image Service initialized with all components.")
         
-    def process_article_and_upload_image(self, article_id: str, table_name: str = None) -> Optional[str]:
+    def process_article_and_upload_image(self, article_id: str, table_name: str = None,
+                                         article: Optional[Dict[str, Any]] = None,
+                                         search_query: Optional[str] = None,
+                                         write_sink: Optional["ImageWriteSink"] = None) -> Optional[str]:
         """Process an article and find, select, and upload a relevant image.
         
+        Synchronous wrapper around AsyncMainImageService.process_article_and_upload_image.
+        
         Args:
             article_id: The ID of the article to process
             table_name: The name of the table containing the article
+            article: Optional already-fetched article record (id, content, cluster_id).
+                     When given, the article is not fetched from the database again.
+            search_query: Optional pre-generated image search query (e.g. from a batched request)
+            write_sink: Optional sink that buffers the database writes after upload;
+                        without it they are written immediately
             
         Returns:
             URL of uploaded image or None if any step fails
         """
-        print(f"\n--- Processing image for article ID: {article_id} in table: {table_name or 'default'} ---")
+        from async_image_service import AsyncMainImageService
+        return asyncio.run(AsyncMainImageService(self).process_article_and_upload_image(
+            article_id, table_name, article=article, search_query=search_query, write_sink=write_sink
+        ))
+
+    def _load_article(self, article_id: str, table_name: Optional[str],
+                      article: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Fetch the content and cluster ID of an article.
         
-        # Step 1: Fetch article content
-        if table_name:
-            # Fetch from specific table
-            articles = self.article_service.fetch_articles_without_images(table_name, limit=10)
-            
-            # Search for the requested article in the fetched list
-            article_data = None
-            for article in articles:
-                if str(article['id']) == str(article_id):
-                    article_data = article
-                    break
-                    
-            if not article_data:
-                print(f"Failed to fetch article {article_id} from table {table_name}. Aborting.")
-                return None
-                
-            article_content = article_data['content']
+        Args:
+            article_id: The ID of the article
+            table_name: The table containing the article; the legacy default table is used if omitted
+            article: Optional already-fetched article record, used instead of a database lookup
             
-            # Extract cluster_id from article
-            cluster_id = None
-            if 'cluster_id' in article_data:
-                cluster_id = article_data['cluster_id']
-            else:
-                print(f"Warning: No cluster_id found in article. Database tracking will be skipped.")
-        else:
+        Returns:
+            Tuple of (article content, cluster ID); either may be None
+        """
+        if not table_name:
             # Legacy approach using default table
-            article_content = self.article_service.fetch_article_content(article_id)
-        
-        if not article_content:
-            print("Failed to fetch article content. Aborting.")
-            return None
-
-        # Step 2: Generate search query with LLM
-        if not self.llm_service.is_available():
-            print("LLM service not available. Aborting.")
-            return None
+            return self.article_service.fetch_article_content(article_id), None
             
-        search_query = self.llm_service.generate_search_query(article_content)
-        if not search_query:
-            print("Failed to generate search query. Aborting.")
-            return None
-
-        # Step 3: Search for image candidates with enhanced retry logic
-        image_candidates = self.image_search.search_images(
-            search_query, 
-            num_to_fetch=20,
-            max_retries=3  # Explicitly set max retries for rate limit handling
-        )
-        
-        if not image_candidates:
-            # Try again with a more generic query if specific one failed
-            alt_query = " ".join(search_query.split()[:2] + ["photos"])
-            print(f"No results with specific query. Trying alternative query: '{alt_query}'")
-            image_candidates = self.image_search.search_images(alt_query, num_to_fetch=15, max_retries=2)
+        # Reuse the record from the batch fetch, or look the article up by ID
+        article_data = article
+        if article_data is None:
+            article_data = self.article_service.fetch_article_by_id(table_name, article_id)
+                
+        if not article_data:
+            print(f"Failed to fetch article {article_id} from table {table_name}. Aborting.")
+            return None, None
             
-        if not image_candidates:
-            print(f"No suitable image candidates found for '{search_query}'. Aborting.")
-            return None
+        cluster_id = article_data.get('cluster_id')
+        if 'cluster_id' not in article_data:
+            print(f"Warning: No cluster_id found in article. Database tracking will be skipped.")
+        return article_data['content'], cluster_id
 
-        # Step 4: Validate image URLs
-        valid_image_candidates = self.image_validator.filter_valid_images(
-            image_candidates, 
-            max_valid=CANDIDATES_TO_LLM_FOR_SELECTION + 5  # Get a few more than needed for LLM
-        )
+    def _record_image(self, article_id: str, table_name: Optional[str], cluster_id: Optional[str],
+                      image_url: str, selected_image: Dict[str, Any]) -> None:
+        """Save the image to cluster_images and mark the article as having an image.
         
-        if not valid_image_candidates:
-            print("No valid image URLs after validation. Aborting.")
-            return None
+        Args:
+            article_id: The ID of the article
+            table_name: The table containing the article; nothing is written without it
+            cluster_id: The cluster of the article; no cluster_images row is written without it
+            image_url: The URL of the stored image in Supabase
+            selected_image: The selected candidate (original URL and phash)
+        """
+        if not table_name:
+            return
             
-        print(f"Found {len(valid_image_candidates)} valid image candidates.")
-
-        # Step 5: Select the best image with LLM
-        article_snippet = article_content[:4000]  # Limit for LLM context
-        selected_image = self.llm_service.select_best_image(
-            valid_image_candidates[:CANDIDATES_TO_LLM_FOR_SELECTION],
-            article_snippet,
-            search_query
-        )
+        # Save image information to cluster_images table (if we have a cluster_id)
+        if cluster_id:
+            view = self._view_from_table(table_name)
+            if view:
+                success = self.image_storage.save_image_info(
+                    cluster_id=cluster_id,
+                    image_url=image_url,
+                    original_url=selected_image.get("url", "unknown"),
+                    view=view,
+                    phash=selected_image.get("phash")
+                )
+                if not success:
+                    print(f"Warning: Image uploaded but failed to save metadata to cluster_images table.")
+            else:
+                print(f"Warning: Could not extract view from table name '{table_name}'. Skipping metadata save.")
         
-        if not selected_image:
-            print("LLM did not select an image or selection failed. Aborting.")
-            return None
+        # Update the article in database to mark it as having an image
+        success = self.article_service.update_article_has_image(table_name, article_id, image_url)
+        if not success:
+            print(f"Warning: Image uploaded but failed to update article {article_id} in {table_name}.")
 
-        # Step 6: Download and upload the selected image
-        final_image_url = self.image_storage.process_and_upload_image(selected_image, search_query)
-        
-        if final_image_url:
-            print(f"SUCCESS: Image processed and uploaded for article {article_id}. URL: {final_image_url}")
-            
-            # Save image information to cluster_images table (if we have a table_name and cluster_id)
-            if table_name and cluster_id:
-                # Extract view from table name (e.g., "coach" from "cluster_coach_view")
-                view = None
-                if table_name.startswith("cluster_"):
-                    table_parts = table_name.split('_')
-                    if len(table_parts) >= 3:
-                        view = table_parts[1]  # Extract middle part (e.g., "coach" from "cluster_coach_view")
-                    elif len(table_parts) == 2:
-                        view = table_parts[1]  # For tables like "cluster_summary", use "summary"
-                
-                if view:
-                    original_url = selected_image.get("url", "unknown")
-                    success = self.image_storage.save_image_info(
-                        cluster_id=cluster_id,
-                        image_url=final_image_url,
-                        original_url=original_url,
-                        view=view
-                    )
-                    if not success:
-                        print(f"Warning: Image uploaded but failed to save metadata to cluster_images table.")
-                else:
-                    print(f"Warning: Could not extract view from table name '{table_name}'. Skipping metadata save.")
-            
-            # Update the article in database to mark it as having an image
-            if table_name:
-                success = self.article_service.update_article_has_image(table_name, article_id, final_image_url)
-                if not success:
-                    print(f"Warning: Image uploaded but failed to update article {article_id} in {table_name}.")
-            
-            return final_image_url
-        else:
-            print(f"FAILED to download/upload the selected image for article {article_id}.")
-            return None
+    @staticmethod
+    def _view_from_table(table_name: str) -> Optional[str]:
+        """Extract the view from a table name (e.g., "coach" from "cluster_coach_view")."""
+        if table_name.startswith("cluster_"):
+            table_parts = table_name.split('_')
+            if len(table_parts) >= 2:
+                return table_parts[1]  # "coach" from "cluster_coach_view", "summary" from "cluster_summary"
+        return None
 
     def process_table_articles(self, table_name: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Process multiple articles from a specific table that don't have images.
@@ -185,42 +198,10 @@ class MainImageService:
             
         print(f"Found {len(articles)} articles without images in '{table_name}'. Starting processing...")
         
-        results = []
         for article in articles:
-            article_id = article["id"]
-            print(f"\nProcessing article {article_id} from {table_name}...")
-            
-            try:
-                # Process and upload image
-                start_time = time.time()
-                image_url = self.process_article_and_upload_image(article_id, table_name)
-                process_time = time.time() - start_time
-                
-                if image_url:
-                    results.append({
-                        "article_id": article_id,
-                        "status": "success",
-                        "image_url": image_url,
-                        "process_time_sec": round(process_time, 2)
-                    })
-                else:
-                    results.append({
-                        "article_id": article_id,
-                        "status": "failed",
-                        "process_time_sec": round(process_time, 2)
-                    })
-                    
-            except Exception as e:
-                print(f"Error processing article {article_id}: {e}")
-                results.append({
-                    "article_id": article_id,
-                    "status": "error",
-                    "error_message": str(e)
-                })
-            
-            # Add a small delay between articles to avoid rate limits
-            time.sleep(1)
-                
+            article["table"] = table_name
+        results = self._process_articles(articles)
+        
         # Summary report
         success_count = sum(1 for r in results if r.get("status") == "success")
         print(f"\n=== Finished processing {len(results)} articles from '{table_name}' ===")
@@ -228,9 +209,51 @@ class MainImageService:
         
         return results
 
+    def process_backlog(self, limit: int = 10, table_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Process the most important articles without images across all tables.
+        
+        Args:
+            limit: Maximum number of articles to process
+            table_names: Tables to include; defaults to all tables in TABLES_FOR_IMAGES
+            
+        Returns:
+            List of results with article IDs, tables and status
+        """
+        print(f"\n=== Processing up to {limit} articles from the image backlog ===\n")
+        
+        articles = self.article_service.fetch_image_backlog(table_names, limit_per_table=limit, total_limit=limit)
+        if not articles:
+            print("No articles without images found in any table.")
+            return []
+            
+        results = self._process_articles(articles)
+        
+        success_count = sum(1 for r in results if r.get("status") == "success")
+        print(f"\n=== Finished processing {len(results)} articles from the image backlog ===")
+        print(f"Success: {success_count}, Failed: {len(results) - success_count}")
+        
+        return results
+
+    def _process_articles(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Find and upload images for already-fetched articles.
+        
+        Articles are processed concurrently by AsyncMainImageService, up to
+        max_in_flight at a time.
+        
+        Args:
+            articles: Article dictionaries with id, content, cluster_id and table
+            
+        Returns:
+            List of results with article IDs, tables and status
+        """
+        from async_image_service import AsyncMainImageService
+        return asyncio.run(AsyncMainImageService(self, self.max_in_flight).process_articles(articles))
+
 def main():
     """Main entry point with CLI argument parsing for different processes"""
     parser = argparse.ArgumentParser(description='Image Service for Articles')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report the import and initialization cost of the service, then exit')
     
     # Add subparsers for different commands
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
@@ -247,14 +270,43 @@ def main():
     batch_parser.add_argument('--limit', type=int, default=5, 
                              help='Maximum number of articles to process (default: 5)')
     
+    # Add "backlog" command for prioritized processing across all tables
+    backlog_parser = subparsers.add_parser('backlog', help='Process the newest articles without images across all tables')
+    backlog_parser.add_argument('--limit', type=int, default=10,
+                               help='Maximum number of articles to process (default: 10)')
+    backlog_parser.add_argument('--tables', nargs='+', choices=TABLES_FOR_IMAGES.keys(),
+                               help='Restrict the backlog to these tables (default: all)')
+    
     # Add "tables" command to list available tables
     subparsers.add_parser('tables', help='List all available tables')
     
+    for concurrent_parser in (batch_parser, backlog_parser):
+        concurrent_parser.add_argument('--concurrency', type=int, default=MAX_ARTICLES_IN_FLIGHT,
+                                       help=f'Maximum number of articles processed at once (default: {MAX_ARTICLES_IN_FLIGHT})')
+    
     # Parse arguments
     args = parser.parse_args()
     
+    if args.command == 'tables':
+        # List available tables (needs no service components)
+        print("Available tables for image processing:")
+        for table in TABLES_FOR_IMAGES:
+            print(f"- {table}")
+        return 0
+        
+    if not args.command and not args.profile_startup:
+        # No command specified
+        parser.print_help()
+        return 0
+        
     # Initialize service
-    service = MainImageService()
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    import_components(profiler)
+    with profiler.phase("initialize MainImageService"):
+        service = MainImageService(getattr(args, 'concurrency', MAX_ARTICLES_IN_FLIGHT))
+    if args.profile_startup:
+        profiler.report()
+        return 0
     
     # Execute appropriate command
     if args.command == 'process':
@@ -278,17 +330,17 @@ def main():
             print("Batch processing completed with no successful articles.")
             return 1
             
-    elif args.command == 'tables':
-        # List available tables
-        print("Available tables for image processing:")
-        for table in TABLES_FOR_IMAGES:
-            print(f"- {table}")
-        return 0
-        
-    else:
-        # No command specified
-        parser.print_help()
-        return 0
+    elif args.command == 'backlog':
+        # Process the prioritized backlog across tables
+        results = service.process_backlog(args.limit, args.tables)
+        success_count = sum(1 for r in results if r.get("status") == "success")
+        if results and success_count > 0:
+            print(f"Processed {len(results)} articles with {success_count} successes.")
+            return 0
+        else:
+            print("Backlog processing completed with no successful articles.")
+            return 1
+    return 0
         
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+
+class AsyncRateLimiter:
+    """Token-bucket rate limiter for coroutines.
+    
+    Up to `burst` calls pass immediately; after that callers wait until the
+    bucket refills at `rate` tokens per second. Waiting is an awaitable sleep,
+    so other coroutines keep running.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize a full bucket.
+        
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class AdaptiveRateLimiter:
+    """Thread-safe token-bucket rate limiter that adapts to observed rate limits.
+    
+    Calls only wait when the bucket is empty. Each reported rate limit halves
+    the refill rate and empties the bucket (multiplicative decrease); each
+    success raises the rate again by a fixed step up to the configured maximum
+    (additive increase), so sustained throughput settles just below what the
+    remote service tolerates.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.05, recovery_step: float = 0.05):
+        """Initialize a full bucket.
+        
+        Args:
+            rate: Maximum tokens added per second
+            burst: Bucket capacity
+            min_rate: Lowest rate the limiter backs off to
+            recovery_step: Rate increase per successful call after a backoff
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        
+    def acquire(self) -> float:
+        """Block until a token is available and take it.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so a backoff reported meanwhile is picked up
+            time.sleep(delay)
+            waited += delay
+            
+    def on_success(self) -> None:
+        """Report a call that was not rate limited."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+            
+    def on_rate_limited(self) -> None:
+        """Report a rate-limit response; halves the rate and empties the bucket."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            print(f"Rate limited; slowing down to {self.rate:.2f} requests/s.")
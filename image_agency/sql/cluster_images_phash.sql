@@ -0,0 +1,16 @@
+-- --------------------------------------------------------------------------
+-- cluster_images.phash: perceptual hash of each stored image (image_dedup.py)
+-- --------------------------------------------------------------------------
+--
+-- image_storage.py writes the 64-bit dHash of every stored image as 16 hex
+-- characters and loads the most recent hashes at startup to down-rank
+-- near-duplicate candidates. Rows written before this migration keep a null hash
+-- and are ignored by the lookup. Safe to run more than once.
+
+alter table public.cluster_images
+    add column if not exists phash text;
+
+-- fetch_recent_image_hashes: newest rows that have a hash
+create index if not exists cluster_images_phash_recent_idx
+    on public.cluster_images (created_at desc)
+    where phash is not null;
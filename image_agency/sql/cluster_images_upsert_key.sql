@@ -0,0 +1,18 @@
+-- --------------------------------------------------------------------------
+-- cluster_images upsert key: unique (cluster_id, view, image_url)
+-- --------------------------------------------------------------------------
+--
+-- ImageStorage.save_image_infos upserts on config.CLUSTER_IMAGES_UPSERT_KEY,
+-- which Postgres only accepts with a unique index on exactly these columns.
+-- Duplicates written before the index existed are removed first (the most
+-- recently inserted row is kept). Safe to run more than once.
+
+delete from public.cluster_images older
+using public.cluster_images newer
+where older.cluster_id = newer.cluster_id
+  and older.view = newer.view
+  and older.image_url = newer.image_url
+  and older.ctid < newer.ctid;
+
+create unique index if not exists cluster_images_upsert_key_idx
+    on public.cluster_images (cluster_id, view, image_url);
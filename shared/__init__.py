@@ -0,0 +1,8 @@
+"""
+Modules shared by cluster_agency, translation_agency and image_agency:
+resilience (retries, circuit breakers, deadlines), model_router and routed_llm
+(per-stage model routing), tracing and startup (profiling).
+
+Every entry point puts the project root on sys.path once, so these import as
+`from shared.resilience import ...` from any agency.
+"""
@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from shared.resilience import CircuitOpenError, DeadlineExceeded, call as resilient_call, is_transient_error, time_left
+
+# --------------------------------------------------------------------------
+# Model routing
+# --------------------------------------------------------------------------
+
+"""
+Central routing config for every LLM call of the cluster, translation and image
+agencies; part of the shared package (see shared/__init__.py).
+
+- Every stage (agent name, or a named call site such as "ArticleTranslation") is
+  mapped to a tier. A tier is an ordered list of models: the primary first, then
+  its fallbacks.
+- Stages on a cheap tier move up to a stronger one when the prompt is longer than
+  LONG_PROMPT_CHARS (see LONG_PROMPT_TIERS).
+- A quota error (HTTP 429, RESOURCE_EXHAUSTED, rate limit) puts the model in a
+  cooldown and the call falls back to the next model of the tier.
+- Latency is tracked per model as a moving average. A model that is slower than
+  its tier's latency SLO, or that hits the tier's timeout, is routed around until
+  its cooldown expires; then it gets traffic again and is re-measured.
+- Every attempt goes through the provider's circuit breaker in resilience.py. A
+  provider whose breaker is open is skipped like a model in cooldown; transient
+  errors are retried (with backoff) only on the last model of the tier, and no
+  attempt runs past the current deadline.
+
+MODEL_ROUTING_CONFIG can point to a JSON file with "tiers" and/or "stages" entries
+that replace the defaults below, so models can be swapped without a code change.
+"""
+
+# Tier name -> models in fallback order, latency SLO and hard timeout in seconds
+MODEL_TIERS: Dict[str, Dict[str, Any]] = {
+    "tools": {"models": ["openai/gpt-4.1-mini", "gemini-2.0-flash"], "latency_slo": 20, "timeout": 90},
+    "fast": {"models": ["gemini-2.0-flash-lite", "gemini-2.0-flash"], "latency_slo": 15, "timeout": 60},
+    "balanced": {"models": ["gemini-2.0-flash", "gemini-2.0-flash-lite"], "latency_slo": 30, "timeout": 120},
+    "standard": {"models": ["gemini-2.5-flash-preview-04-17", "gemini-2.0-flash"], "latency_slo": 60, "timeout": 180},
+}
+
+# Stage -> tier. Stages built from a factory (ContentAnalyst_summary, DataCleaner_summary)
+# are looked up by the part before the first underscore.
+STAGE_TIERS: Dict[str, str] = {
+    # cluster_agency: fetchers call Supabase tools
+    "FetchClusterId": "tools",
+    "FetchClusterArticlesId": "tools",
+    "ExtractArticleContent": "tools",
+    # cluster_agency: writing and perspective stages (google_search needs Gemini 2 models)
+    "SummaryCreator": "standard",
+    "TimelineCreator": "standard",
+    "PlayerDetection": "standard",
+    "PlayerPerspective": "standard",
+    "CoachDetection": "standard",
+    "CoachPerspective": "standard",
+    "TeamDetection": "standard",
+    "TeamPerspective": "standard",
+    "FranchisePerspective": "standard",
+    "firstDynamicPerspectiveDetection": "standard",
+    "firstDynamicPerspective": "standard",
+    "secondDynamicPerspectiveDetection": "standard",
+    "secondDynamicPerspective": "standard",
+    "DataCleaner": "standard",
+    # cluster_agency: review and upload stages
+    "ContentAnalyst": "fast",
+    "SummaryUploader": "fast",
+    "TimelineUploader": "fast",
+    "PlayerViewUploader": "fast",
+    "CoachViewUploader": "fast",
+    "TeamViewUploader": "fast",
+    "FranchiseViewUploader": "fast",
+    "DynamicViewUploader": "fast",
+    "CloseClusterId": "fast",
+    # translation_agency
+    "ArticleController": "fast",
+    "ContentFetcher": "balanced",
+    "ContentCleaner": "standard",
+    "GermanTranslator": "balanced",
+    "DatabaseWriter": "fast",
+    "DatabaseCleanUp": "fast",
+    "ArticleTranslation": "balanced",  # translate-articles.py
+    # image_agency
+    "ImageQueryGeneration": "balanced",
+    "ImageSelection": "balanced",
+}
+DEFAULT_TIER = "balanced"
+
+# Tier to use instead when the prompt is longer than LONG_PROMPT_CHARS
+LONG_PROMPT_TIERS: Dict[str, str] = {"fast": "balanced"}
+LONG_PROMPT_CHARS = int(os.getenv("LONG_PROMPT_CHARS", "20000"))
+
+QUOTA_COOLDOWN = float(os.getenv("MODEL_QUOTA_COOLDOWN", "60"))  # Seconds a model is skipped after a quota error
+SLOW_COOLDOWN = float(os.getenv("MODEL_SLOW_COOLDOWN", "300"))  # Seconds a model is skipped after an SLO breach
+LATENCY_EWMA_ALPHA = 0.3  # Weight of the newest call in the moving latency average
+MIN_LATENCY_SAMPLES = 3  # Calls before a model can be judged slow by its average
+
+
+def _load_config_overrides():
+    path = os.getenv("MODEL_ROUTING_CONFIG")
+    if not path:
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        MODEL_TIERS.update(overrides.get("tiers", {}))
+        STAGE_TIERS.update(overrides.get("stages", {}))
+        print(f"Loaded model routing overrides from {path}")
+    except Exception as e:
+        print(f"ERROR loading model routing config {path}: {e}. Using defaults.")
+
+
+_load_config_overrides()
+
+
+def is_quota_error(error: Exception) -> bool:
+    """True for rate limit and quota errors (HTTP 429 / RESOURCE_EXHAUSTED) of any client library."""
+    for attr in ("status_code", "code"):
+        if getattr(error, attr, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    name = type(error).__name__
+    if "RateLimit" in name or "ResourceExhausted" in name:
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource_exhausted" in text or "quota" in text or "rate limit" in text
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """True for client and asyncio timeouts."""
+    name = type(error).__name__
+    return isinstance(error, TimeoutError) or "Timeout" in name or "DeadlineExceeded" in name
+
+
+def is_retryable_model_error(error: Exception) -> bool:
+    """Transient errors other than quota errors; on quota errors the router falls back instead."""
+    return is_transient_error(error) and not is_quota_error(error)
+
+
+def provider_of(model: str) -> str:
+    """The resilience dependency of a model: "openai" for openai/ models, else "gemini"."""
+    return "openai" if model.startswith("openai/") else "gemini"
+
+
+# --------------------------------------------------------------------------
+# Router
+# --------------------------------------------------------------------------
+
+class ModelRouter:
+    """Picks the models for a call and tracks per-model latency, quota errors and cooldowns."""
+
+    def __init__(self, tiers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 stage_tiers: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tiers (dict): Tier definitions (default: MODEL_TIERS)
+            stage_tiers (dict): Stage to tier mapping (default: STAGE_TIERS)
+        """
+        self.tiers = tiers if tiers is not None else MODEL_TIERS
+        self.stage_tiers = stage_tiers if stage_tiers is not None else STAGE_TIERS
+        self._lock = threading.Lock()
+        self._health: Dict[str, Dict[str, Any]] = {}
+
+    def _model_health(self, model: str) -> Dict[str, Any]:
+        return self._health.setdefault(model, {
+            "calls": 0, "failures": 0, "quota_errors": 0, "slo_breaches": 0,
+            "latency_avg": None, "samples": 0, "cooldown_until": 0.0,
+        })
+
+    def tier_for(self, stage: str, prompt_chars: int = 0) -> str:
+        """
+        Returns the tier for a stage, moved up for long prompts.
+
+        Args:
+            stage (str): Agent name or call site
+            prompt_chars (int): Size of the prompt in characters
+        """
+        tier = self.stage_tiers.get(stage) or self.stage_tiers.get(stage.split("_")[0]) or DEFAULT_TIER
+        if prompt_chars > LONG_PROMPT_CHARS and tier in LONG_PROMPT_TIERS:
+            tier = LONG_PROMPT_TIERS[tier]
+        return tier
+
+    def route(self, stage: str, prompt_chars: int = 0,
+              model_filter: Optional[Callable[[str], bool]] = None) -> Tuple[str, List[str]]:
+        """
+        Returns the tier and the models to try, in order, for one call.
+
+        Models in a cooldown go to the end of the list (soonest available first),
+        so a call is still attempted when every model of the tier is cooling down.
+
+        Args:
+            stage (str): Agent name or call site
+            prompt_chars (int): Size of the prompt in characters
+            model_filter (callable): Only consider models it accepts (e.g. Gemini 2 for google_search)
+
+        Returns:
+            tuple: (tier name, model names)
+        """
+        tier = self.tier_for(stage, prompt_chars)
+        models = [m for m in self.tiers[tier]["models"] if model_filter is None or model_filter(m)]
+        now = time.time()
+        with self._lock:
+            ready = [m for m in models if self._model_health(m)["cooldown_until"] <= now]
+            cooling = sorted((m for m in models if m not in ready),
+                             key=lambda m: self._model_health(m)["cooldown_until"])
+        if cooling and ready and models[0] in cooling:
+            print(f"Routing {stage} to {ready[0]}: {models[0]} is cooling down.")
+        return tier, ready + cooling
+
+    def timeout_for(self, tier: str) -> float:
+        return float(self.tiers[tier]["timeout"])
+
+    def record_success(self, model: str, seconds: float, tier: str):
+        """Records a call's latency; a model slower than the tier's SLO starts a cooldown."""
+        slo = float(self.tiers[tier]["latency_slo"])
+        with self._lock:
+            health = self._model_health(model)
+            health["calls"] += 1
+            health["samples"] += 1
+            average = health["latency_avg"]
+            health["latency_avg"] = seconds if average is None else \
+                LATENCY_EWMA_ALPHA * seconds + (1 - LATENCY_EWMA_ALPHA) * average
+            if health["samples"] >= MIN_LATENCY_SAMPLES and health["latency_avg"] > slo:
+                self._start_cooldown(health, SLOW_COOLDOWN)
+                health["slo_breaches"] += 1
+                print(f"Model {model} averages {health['latency_avg']:.1f}s (SLO {slo:.0f}s for tier {tier}); "
+                      f"routing around it for {SLOW_COOLDOWN:.0f}s.")
+
+    def record_failure(self, model: str, error: Exception, tier: str):
+        """Records a failed call; quota errors and timeouts start a cooldown."""
+        with self._lock:
+            health = self._model_health(model)
+            health["calls"] += 1
+            health["failures"] += 1
+            if is_quota_error(error):
+                health["quota_errors"] += 1
+                self._start_cooldown(health, QUOTA_COOLDOWN)
+            elif is_timeout_error(error):
+                health["slo_breaches"] += 1
+                self._start_cooldown(health, SLOW_COOLDOWN)
+        print(f"Model {model} failed for tier {tier}: {type(error).__name__}: {error}")
+
+    @staticmethod
+    def _start_cooldown(health: Dict[str, Any], seconds: float):
+        health["cooldown_until"] = time.time() + seconds
+        # The model is measured afresh when it gets traffic again
+        health["samples"] = 0
+
+    def call(self, stage: str, fn: Callable[[str, float], Any], prompt_chars: int = 0) -> Any:
+        """
+        Runs fn(model, timeout) with the stage's models until one succeeds.
+
+        Args:
+            stage (str): Agent name or call site
+            fn (callable): Makes the call with the given model name and timeout in seconds
+            prompt_chars (int): Size of the prompt in characters
+
+        Returns:
+            The result of the first successful call; the last error is raised if all fail
+        """
+        tier, models = self.route(stage, prompt_chars)
+        timeout = self.timeout_for(tier)
+        last_error: Optional[Exception] = None
+        started = time.monotonic()
+
+        for index, model in enumerate(models):
+            def attempt(model=model):
+                nonlocal started
+                started = time.monotonic()
+                return fn(model, time_left(timeout))
+
+            try:
+                result = resilient_call(provider_of(model), attempt, retry_if=is_retryable_model_error,
+                                        max_attempts=None if index == len(models) - 1 else 1)
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                self.record_failure(model, e, tier)
+                last_error = e
+                continue
+            self.record_success(model, time.monotonic() - started, tier)
+            return result
+        raise last_error
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model call counts, failures, average latency and remaining cooldown."""
+        now = time.time()
+        with self._lock:
+            return {
+                model: {
+                    "calls": h["calls"],
+                    "failures": h["failures"],
+                    "quota_errors": h["quota_errors"],
+                    "slo_breaches": h["slo_breaches"],
+                    "latency_avg_sec": round(h["latency_avg"], 3) if h["latency_avg"] is not None else None,
+                    "cooldown_sec": round(max(0.0, h["cooldown_until"] - now), 1),
+                }
+                for model, h in self._health.items()
+            }
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        print("\nModel routing:")
+        print(f"  {'model':<32} {'calls':>6} {'failed':>6} {'quota':>6} {'slo':>4} {'avg s':>7}")
+        for model, s in sorted(stats.items()):
+            avg = f"{s['latency_avg_sec']:.2f}" if s["latency_avg_sec"] is not None else "-"
+            print(f"  {model:<32} {s['calls']:>6} {s['failures']:>6} {s['quota_errors']:>6} "
+                  f"{s['slo_breaches']:>4} {avg:>7}")
+
+
+# Shared by every call in the process, so one stage's quota errors and slow calls
+# also steer the other stages away from that model
+router = ModelRouter()
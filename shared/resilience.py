@@ -0,0 +1,391 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator
+
+# --------------------------------------------------------------------------
+# Retries, retry budgets, deadlines and circuit breakers
+# --------------------------------------------------------------------------
+
+"""
+One retry policy for every external dependency of the agencies: Gemini, OpenAI,
+Supabase, DuckDuckGo search (ddgs) and the image hosts. Breakers and budgets are
+per process, so every agency in one process (e.g. the worker) shares them.
+
+- Transient errors (timeouts, connection errors, HTTP 408/429/5xx) are retried
+  with full-jitter exponential backoff, up to the dependency's max_attempts.
+- Retries are paid from a per-dependency retry budget that grows with the number
+  of calls (RETRY_BUDGET_RATIO), so a failing dependency cannot multiply the load
+  on itself or stall a run in retry loops.
+- A circuit breaker per dependency (per host for image hosts) opens after
+  failure_threshold consecutive transient failures. While it is open, calls fail
+  fast with CircuitOpenError. After recovery_timeout one probe call is let through;
+  it closes the breaker again if it succeeds.
+- Deadlines propagate: deadline() bounds the calls in the current thread/task,
+  run_deadline() bounds a whole run (ADK runs agents in its own thread). Backoff
+  never sleeps past the deadline, time_left() caps per-call timeouts, and calls
+  after the deadline raise DeadlineExceeded without being attempted.
+
+    rows = call("supabase", query.execute)
+    data = await acall("image_host", fetch, url, key=host_of(url))
+"""
+
+# Dependency -> retry and circuit breaker settings. Image hosts get one breaker per host.
+DEPENDENCIES: Dict[str, Dict[str, Any]] = {
+    "gemini": {"max_attempts": 3, "base_delay": 2.0, "max_delay": 30.0, "failure_threshold": 5, "recovery_timeout": 60.0},
+    "openai": {"max_attempts": 3, "base_delay": 2.0, "max_delay": 30.0, "failure_threshold": 5, "recovery_timeout": 60.0},
+    "supabase": {"max_attempts": 4, "base_delay": 0.5, "max_delay": 8.0, "failure_threshold": 8, "recovery_timeout": 30.0},
+    "ddgs": {"max_attempts": 4, "base_delay": 2.0, "max_delay": 30.0, "failure_threshold": 4, "recovery_timeout": 120.0},
+    "image_host": {"max_attempts": 2, "base_delay": 1.0, "max_delay": 4.0, "failure_threshold": 3, "recovery_timeout": 300.0},
+}
+
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))  # Retries allowed per call made
+RETRY_BUDGET_MIN = float(os.getenv("RETRY_BUDGET_MIN", "10"))  # Retries available before any call was made
+
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = ("Timeout", "Connect", "Connection", "RemoteProtocol", "ReadError", "Unavailable",
+                         "DeadlineExceeded", "ResourceExhausted", "RateLimit", "Ratelimit", "InternalServerError",
+                         "ServiceUnavailable", "TooManyRequests")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of calling a dependency after the current deadline."""
+
+
+class RetryableError(Exception):
+    """Raise from a call to have an unusable result (e.g. an empty LLM answer) retried."""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+            if isinstance(value, str) and value.isdigit():
+                return int(value)
+    return None
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for errors worth retrying: timeouts, connection errors, HTTP 408/429/5xx."""
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return False
+    if isinstance(error, (RetryableError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    name = type(error).__name__
+    if any(part in name for part in TRANSIENT_ERROR_NAMES):
+        return True
+    text = str(error).lower()
+    return any(part in text for part in ("timed out", "timeout", "connection reset", "temporarily unavailable",
+                                         "resource_exhausted", "rate limit", "too many requests"))
+
+
+# --------------------------------------------------------------------------
+# Deadlines
+# --------------------------------------------------------------------------
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("resilience_deadline", default=None)
+_run_deadline: Optional[float] = None  # Also seen by threads that do not inherit the context
+
+
+def current_deadline() -> Optional[float]:
+    """The earliest active deadline as a time.monotonic() value, or None."""
+    deadlines = [d for d in (_deadline.get(), _run_deadline) if d is not None]
+    return min(deadlines) if deadlines else None
+
+
+def time_left(default: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds until the current deadline, capped at default.
+
+    Args:
+        default (float): Timeout to use when it is shorter than the time left (or there is no deadline)
+
+    Returns:
+        float: The timeout for the next call, or default if there is no deadline
+    """
+    end = current_deadline()
+    if end is None:
+        return default
+    left = max(0.0, end - time.monotonic())
+    return left if default is None else min(default, left)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bounds the calls in the enclosed block; nested deadlines can only get tighter."""
+    if seconds is None:
+        yield
+        return
+    end = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(end if outer is None else min(outer, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def run_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bounds every call of the process, in all threads, until the block exits."""
+    global _run_deadline
+    if seconds is None:
+        yield
+        return
+    outer = _run_deadline
+    end = time.monotonic() + seconds
+    _run_deadline = end if outer is None else min(outer, end)
+    try:
+        yield
+    finally:
+        _run_deadline = outer
+
+
+def _check_deadline(name: str):
+    end = current_deadline()
+    if end is not None and time.monotonic() >= end:
+        raise DeadlineExceeded(f"Deadline exceeded before calling {name}")
+
+
+# --------------------------------------------------------------------------
+# Retry budget and circuit breaker
+# --------------------------------------------------------------------------
+
+class RetryBudget:
+    """Allows retries as a fraction of the calls made, so retries cannot snowball."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, minimum: float = RETRY_BUDGET_MIN):
+        """
+        Args:
+            ratio (float): Retry tokens earned per call
+            minimum (float): Tokens available at the start; also the cap on saved-up tokens above ratio * 100
+        """
+        self.ratio = ratio
+        self.cap = minimum + ratio * 100
+        self.tokens = minimum
+        self._lock = threading.Lock()
+
+    def on_call(self):
+        with self._lock:
+            self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Takes one retry token; False if the budget is exhausted."""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        """
+        Args:
+            name (str): Dependency name, used in errors and logs
+            failure_threshold (int): Consecutive transient failures that open the breaker
+            recovery_timeout (float): Seconds the breaker stays open before a probe call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not be made."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    raise CircuitOpenError(f"Circuit for {self.name} is open; failing fast")
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(f"Circuit for {self.name} is half-open; probe in progress")
+                self._probing = True
+
+    def on_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"Circuit for {self.name} closed again.")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit for {self.name} opened after {self.failures} failure(s); "
+                          f"failing fast for {self.recovery_timeout:.0f}s.")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# --------------------------------------------------------------------------
+# Dependencies
+# --------------------------------------------------------------------------
+
+class Dependency:
+    """Retry policy, retry budget and circuit breaker of one external dependency."""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.max_attempts = int(config["max_attempts"])
+        self.base_delay = float(config["base_delay"])
+        self.max_delay = float(config["max_delay"])
+        self.budget = RetryBudget()
+        self.breaker = CircuitBreaker(name, int(config["failure_threshold"]), float(config["recovery_timeout"]))
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number attempt (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def before_attempt(self, attempt: int):
+        """Checks deadline and breaker before an attempt (0-based); counts first attempts for the budget."""
+        _check_deadline(self.name)
+        self.breaker.before_call()
+        if attempt == 0:
+            self.budget.on_call()
+
+    def record(self, error: Optional[Exception], retry_if: Callable[[Exception], bool]) -> bool:
+        """
+        Records the outcome of an attempt.
+
+        Returns:
+            bool: True if the error is to be retried; except for RetryableError it counts against the breaker
+        """
+        if error is None:
+            self.breaker.on_success()
+            return False
+        transient = retry_if(error)
+        if transient and not isinstance(error, RetryableError):
+            self.breaker.on_failure()
+        else:
+            # The dependency answered; the request or its result was bad
+            self.breaker.on_success()
+        return transient
+
+    def retry_delay(self, attempt: int, max_attempts: int) -> Optional[float]:
+        """
+        Returns the backoff before retry number attempt, or None if no retry is allowed
+        (attempts or budget used up, or the backoff would end past the deadline).
+        """
+        if attempt >= max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        left = time_left()
+        if left is not None and left <= delay:
+            return None
+        if not self.budget.try_spend():
+            print(f"Retry budget for {self.name} exhausted; not retrying.")
+            return None
+        return delay
+
+
+_dependencies: Dict[str, Dependency] = {}
+_registry_lock = threading.Lock()
+
+
+def dependency(name: str, key: Optional[str] = None) -> Dependency:
+    """
+    Returns the shared Dependency for a name (and key, e.g. the host of an image URL).
+
+    Args:
+        name (str): A key of DEPENDENCIES
+        key (str): Optional sub-key; every key gets its own breaker and budget
+    """
+    full_name = f"{name}:{key}" if key else name
+    with _registry_lock:
+        if full_name not in _dependencies:
+            _dependencies[full_name] = Dependency(full_name, DEPENDENCIES[name])
+        return _dependencies[full_name]
+
+
+def call(name: str, fn: Callable[..., Any], *args: Any, key: Optional[str] = None,
+         max_attempts: Optional[int] = None, retry_if: Callable[[Exception], bool] = is_transient_error,
+         **kwargs: Any) -> Any:
+    """
+    Calls fn(*args, **kwargs) with the dependency's retries, budget, breaker and deadline.
+
+    Args:
+        name (str): Dependency (a key of DEPENDENCIES)
+        fn (callable): The call to make
+        key (str): Optional sub-key, e.g. a host name
+        max_attempts (int): Overrides the dependency's attempts; 1 for writes that must not be repeated
+        retry_if (callable): Decides which errors are retried and count against the breaker
+
+    Returns:
+        The result of fn; the last error is raised if every attempt failed
+    """
+    dep = dependency(name, key)
+    attempts = max_attempts or dep.max_attempts
+    attempt = 0
+    while True:
+        dep.before_attempt(attempt)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            transient = dep.record(e, retry_if)
+            delay = dep.retry_delay(attempt + 1, attempts) if transient else None
+            if delay is None:
+                raise
+            print(f"{dep.name} call failed ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.1f}s.")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        dep.record(None, retry_if)
+        return result
+
+
+async def acall(name: str, fn: Callable[..., Any], *args: Any, key: Optional[str] = None,
+                max_attempts: Optional[int] = None, retry_if: Callable[[Exception], bool] = is_transient_error,
+                **kwargs: Any) -> Any:
+    """Async variant of call(); fn is a coroutine function and backoff does not block the loop."""
+    dep = dependency(name, key)
+    attempts = max_attempts or dep.max_attempts
+    attempt = 0
+    while True:
+        dep.before_attempt(attempt)
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            transient = dep.record(e, retry_if)
+            delay = dep.retry_delay(attempt + 1, attempts) if transient else None
+            if delay is None:
+                raise
+            print(f"{dep.name} call failed ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        dep.record(None, retry_if)
+        return result
+
+
+def breaker_states() -> Dict[str, str]:
+    """Current circuit breaker state per dependency, for logs and reports."""
+    with _registry_lock:
+        return {name: dep.breaker.state for name, dep in _dependencies.items()}
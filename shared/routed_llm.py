@@ -0,0 +1,167 @@
+import time
+import asyncio
+import contextvars
+from typing import AsyncGenerator, Dict, List, Optional
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.google_llm import Gemini
+
+from shared.model_router import router, provider_of, is_retryable_model_error
+from shared.resilience import CircuitOpenError, DeadlineExceeded, acall as resilient_acall, time_left
+from shared.tracing import record_llm_usage
+
+# --------------------------------------------------------------------------
+# ADK model backed by the model router
+# --------------------------------------------------------------------------
+
+"""
+RoutedLlm is used as the model of every LlmAgent. Each request goes to the models
+model_router picks for the agent's stage: the tier is chosen by prompt length, and
+quota errors, timeouts, slow models and open provider circuit breakers fall back
+to the next model of the tier (see model_router.ModelRouter.call).
+Responses are collected before they are passed on, so a failed model can still be
+replaced; the runner does not stream.
+
+LlmResponse in google-adk 0.1.0 has no usage_metadata, so the backends below take
+the token counts from the raw Gemini and LiteLLM responses. RoutedLlm reports them,
+with the model that actually answered, to the run tracer (tracing.record_llm_usage).
+"""
+
+_backends: Dict[str, BaseLlm] = {}
+
+# Token counts of the current attempt; set per attempt, so concurrent agents do not mix
+_usage: contextvars.ContextVar = contextvars.ContextVar("routed_llm_usage", default=None)
+
+
+def _add_usage(input_tokens: Optional[int], output_tokens: Optional[int]):
+    usage = _usage.get()
+    if usage is not None:
+        usage["input"] += input_tokens or 0
+        usage["output"] += output_tokens or 0
+
+
+class UsageGemini(Gemini):
+    """Gemini that keeps the usage_metadata of its (non-streaming) responses."""
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if stream:
+            async for response in super().generate_content_async(llm_request, stream=True):
+                yield response
+            return
+        self._maybe_append_user_content(llm_request)
+        response = await self.api_client.aio.models.generate_content(
+            model=llm_request.model, contents=llm_request.contents, config=llm_request.config
+        )
+        usage = response.usage_metadata
+        if usage is not None:
+            _add_usage(usage.prompt_token_count, usage.candidates_token_count)
+        yield LlmResponse.create(response)
+
+
+def backend_for(model: str) -> BaseLlm:
+    """Returns the ADK model for a model name: Gemini natively, anything else via LiteLLM."""
+    if model not in _backends:
+        if model.startswith("gemini"):
+            _backends[model] = UsageGemini(model=model)
+        else:
+            from google.adk.models.lite_llm import LiteLlm, LiteLLMClient
+
+            class UsageLiteLLMClient(LiteLLMClient):
+                """LiteLLM client that keeps the usage of its (non-streaming) responses."""
+
+                async def acompletion(self, model, messages, tools, **kwargs):
+                    response = await super().acompletion(model, messages, tools, **kwargs)
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        _add_usage(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+                    return response
+
+            _backends[model] = LiteLlm(model=model, llm_client=UsageLiteLLMClient())
+    return _backends[model]
+
+
+def prompt_chars(llm_request: LlmRequest) -> int:
+    """Size of a request's contents and system instruction in characters."""
+    size = sum(len(p.text or "") for c in llm_request.contents for p in (c.parts or []))
+    size += sum(len(str(p.function_response.response)) for c in llm_request.contents
+                for p in (c.parts or []) if p.function_response)
+    if llm_request.config and isinstance(llm_request.config.system_instruction, str):
+        size += len(llm_request.config.system_instruction)
+    return size
+
+
+def uses_google_search(llm_request: LlmRequest) -> bool:
+    """True if the request carries the built-in google_search tool (Gemini 2 models only)."""
+    tools = (llm_request.config.tools if llm_request.config else None) or []
+    return any(getattr(tool, "google_search", None) is not None for tool in tools)
+
+
+async def _collect(llm: BaseLlm, llm_request: LlmRequest, stream: bool) -> List[LlmResponse]:
+    return [response async for response in llm.generate_content_async(llm_request, stream=stream)]
+
+
+class RoutedLlm(BaseLlm):
+    """ADK model that sends each request to the models the router picks for its stage."""
+
+    stage: str
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        model_filter = (lambda m: m.startswith("gemini-2")) if uses_google_search(llm_request) else None
+        tier, models = router.route(self.stage, prompt_chars(llm_request), model_filter)
+
+        timeout = router.timeout_for(tier)
+        last_error: Optional[Exception] = None
+        started = time.monotonic()
+
+        usage = {"input": 0, "output": 0}
+
+        for index, model in enumerate(models):
+            async def attempt(model=model):
+                nonlocal started
+                # Backends may append to the contents, so every attempt gets its own list
+                request = llm_request.model_copy(update={"model": model, "contents": list(llm_request.contents)})
+                started = time.monotonic()
+                usage["input"] = usage["output"] = 0
+                token = _usage.set(usage)
+                try:
+                    return await asyncio.wait_for(_collect(backend_for(model), request, stream), time_left(timeout))
+                finally:
+                    _usage.reset(token)
+
+            try:
+                responses = await resilient_acall(provider_of(model), attempt, retry_if=is_retryable_model_error,
+                                                  max_attempts=None if index == len(models) - 1 else 1)
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                router.record_failure(model, e, tier)
+                last_error = e
+                continue
+            router.record_success(model, time.monotonic() - started, tier)
+            record_llm_usage(self.stage, model, usage["input"], usage["output"])
+            for response in responses:
+                yield response
+            return
+        raise last_error
+
+
+def routed_model(stage: str) -> RoutedLlm:
+    """
+    Returns the model for an agent.
+
+    Args:
+        stage (str): The agent name, looked up in model_router.STAGE_TIERS
+
+    Returns:
+        RoutedLlm: Named after the primary model of the stage's tier (ADK checks
+            that name, e.g. google_search requires a Gemini 2 model)
+    """
+    tier = router.tier_for(stage)
+    return RoutedLlm(model=router.tiers[tier]["models"][0], stage=stage)
@@ -0,0 +1,58 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# --------------------------------------------------------------------------
+# Startup profiling
+# --------------------------------------------------------------------------
+
+"""
+The entry points import their heavy dependencies (ADK, LiteLLM, Supabase, Gemini)
+and build their agent graphs and clients lazily, in named phases. With --profile-startup they
+time those phases and print where the cold start goes:
+
+    python cluster_agency/agent.py --profile-startup
+    python translation_agency/translate-articles.py --profile-startup
+    python image_agency/main_image_service.py --profile-startup tables
+
+For a per-module breakdown, run the same command with `python -X importtime`.
+"""
+
+STARTED = time.perf_counter()  # Imported first by the entry points, before any heavy import
+
+
+class StartupProfiler:
+    """Times named startup phases and counts the modules each one imports."""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled (bool): If False, phases run untimed and report() prints nothing
+        """
+        self.enabled = enabled
+        self.phases: List[Tuple[str, float, int]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        modules = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started, len(sys.modules) - modules))
+
+    def report(self):
+        """Prints the duration and the number of newly imported modules per phase."""
+        if not self.enabled:
+            return
+        total = time.perf_counter() - STARTED
+        width = max([len(name) for name, _, _ in self.phases] + [len("Phase")])
+        print("\n=== Startup profile ===")
+        print(f"{'Phase':<{width}}  {'Seconds':>8}  {'Modules':>7}")
+        for name, seconds, modules in self.phases:
+            print(f"{name:<{width}}  {seconds:>8.3f}  {modules:>7}")
+        print(f"{'Total':<{width}}  {total:>8.3f}  {len(sys.modules):>7}")
@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import math
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+# --------------------------------------------------------------------------
+# Run tracing for ADK runners
+# --------------------------------------------------------------------------
+
+"""
+Wraps the event stream of runner.run() and records, per agent span:
+start/end time, model, input/output tokens, tool calls with their durations,
+repeated tool calls (retries) and errors. Every record is appended to a JSONL
+trace file and an end-of-run summary table with p50/p95 per agent is printed.
+
+Token counts and the model that actually answered are reported by RoutedLlm
+(record_llm_usage) after every model call, including fallbacks: the events of
+google-adk 0.1.0 carry neither. A span's "model" lists the models that answered,
+or the agent's configured model if nothing was reported (e.g. fake models).
+
+Traces from several runs can be summarized together:
+    python shared/tracing.py traces/*.jsonl
+"""
+
+TRACE_DIR = os.getenv("AGENT_TRACE_DIR", "traces")
+
+_active_tracers: List["RunTracer"] = []
+_tracers_lock = threading.Lock()
+
+
+def record_llm_usage(agent: str, model: str, input_tokens: int, output_tokens: int):
+    """
+    Reports one model call to the active tracers.
+
+    Args:
+        agent (str): Name of the agent that made the call
+        model (str): The model that answered
+        input_tokens (int): Prompt tokens
+        output_tokens (int): Response tokens
+    """
+    with _tracers_lock:
+        tracers = list(_active_tracers)
+    for tracer in tracers:
+        tracer.add_usage(agent, model, input_tokens, output_tokens)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_spans(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregates agent spans into one row per agent.
+
+    Args:
+        spans (list): agent_span records
+
+    Returns:
+        list: One summary row per agent, slowest total time first
+    """
+    by_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        by_agent.setdefault(span["agent"], []).append(span)
+
+    rows = []
+    for agent, agent_spans in by_agent.items():
+        durations = [s["duration_sec"] for s in agent_spans]
+        rows.append({
+            "agent": agent,
+            "model": agent_spans[0].get("model"),
+            "runs": len(agent_spans),
+            "total_sec": round(sum(durations), 3),
+            "p50_sec": round(percentile(durations, 50), 3),
+            "p95_sec": round(percentile(durations, 95), 3),
+            "input_tokens": sum(s.get("input_tokens") or 0 for s in agent_spans),
+            "output_tokens": sum(s.get("output_tokens") or 0 for s in agent_spans),
+            "tool_calls": sum(s.get("tool_calls", 0) for s in agent_spans),
+            "tool_sec": round(sum(s.get("tool_sec", 0.0) for s in agent_spans), 3),
+            "retries": sum(s.get("retries", 0) for s in agent_spans),
+            "errors": sum(s.get("errors", 0) for s in agent_spans),
+        })
+    rows.sort(key=lambda row: row["total_sec"], reverse=True)
+    return rows
+
+
+def print_summary(rows: List[Dict[str, Any]]):
+    """Prints summary rows as a fixed-width table."""
+    header = f"{'agent':<40} {'runs':>4} {'total s':>9} {'p50 s':>8} {'p95 s':>8} {'in tok':>8} {'out tok':>8} {'tools':>5} {'tool s':>8} {'retry':>5} {'err':>4}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['agent'][:40]:<40} {row['runs']:>4} {row['total_sec']:>9.2f} {row['p50_sec']:>8.2f} "
+              f"{row['p95_sec']:>8.2f} {row['input_tokens']:>8} {row['output_tokens']:>8} {row['tool_calls']:>5} "
+              f"{row['tool_sec']:>8.2f} {row['retries']:>5} {row['errors']:>4}")
+
+
+class RunTracer:
+    """Records per-agent latency, token and tool-call metrics of one runner.run() call."""
+
+    def __init__(self, run_name: str, root_agent=None, trace_dir: str = TRACE_DIR):
+        """
+        Args:
+            run_name (str): Name used for the trace file (e.g. the app name)
+            root_agent: Root agent of the runner, used to look up each agent's model
+            trace_dir (str): Directory the JSONL trace is written to
+        """
+        self.run_name = run_name
+        self.root_agent = root_agent
+        os.makedirs(trace_dir, exist_ok=True)
+        self.trace_path = os.path.join(trace_dir, f"{run_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+        self.spans: List[Dict[str, Any]] = []
+        self.current: Optional[Dict[str, Any]] = None
+        self.pending_calls: Dict[str, Dict[str, Any]] = {}
+        # Usage reported per agent by RoutedLlm (from the runner's thread) until the agent's next event
+        self.pending_usage: Dict[str, Dict[str, Any]] = {}
+        self._usage_lock = threading.Lock()
+        self.started_at = time.time()
+        self.last_event_at = self.started_at
+        with _tracers_lock:
+            _active_tracers.append(self)
+
+    def add_usage(self, agent: str, model: str, input_tokens: int, output_tokens: int):
+        """Records one model call of an agent; it is added to the agent's span with its next event."""
+        with self._usage_lock:
+            usage = self.pending_usage.setdefault(agent, {"input": 0, "output": 0, "models": []})
+            usage["input"] += input_tokens or 0
+            usage["output"] += output_tokens or 0
+            if model not in usage["models"]:
+                usage["models"].append(model)
+
+    # -- event handling --------------------------------------------------
+
+    def observe(self, events: Iterable) -> Iterator:
+        """Yields the runner's events unchanged while recording them."""
+        for event in events:
+            try:
+                self._record_event(event)
+            except Exception as e:
+                print(f"Tracing error (ignored): {e}")
+            yield event
+
+    def _record_event(self, event):
+        now = getattr(event, "timestamp", None) or time.time()
+        author = getattr(event, "author", None) or "unknown"
+
+        if author != "user" and (self.current is None or self.current["agent"] != author):
+            self._close_span(self.last_event_at)
+            # The agent started working when the previous event arrived
+            self.current = {
+                "type": "agent_span",
+                "agent": author,
+                "model": None,
+                "start": self.last_event_at,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "tool_calls": 0,
+                "tool_sec": 0.0,
+                "retries": 0,
+                "errors": 0,
+                "_tools_seen": [],
+                "_models": [],
+            }
+
+        if self.current is not None and author == self.current["agent"]:
+            self._add_tokens(event)
+            if getattr(event, "error_code", None):
+                self.current["errors"] += 1
+            for call in event.get_function_calls() if hasattr(event, "get_function_calls") else []:
+                self._start_tool_call(call, now)
+            for response in event.get_function_responses() if hasattr(event, "get_function_responses") else []:
+                self._end_tool_call(response, now)
+
+        self.last_event_at = now
+
+    def _add_tokens(self, event):
+        span = self.current
+        with self._usage_lock:
+            usage = self.pending_usage.pop(span["agent"], None)
+        if usage is None:
+            return
+        span["input_tokens"] += usage["input"]
+        span["output_tokens"] += usage["output"]
+        span["_models"].extend(m for m in usage["models"] if m not in span["_models"])
+
+    def _start_tool_call(self, call, now: float):
+        span = self.current
+        span["tool_calls"] += 1
+        if call.name in span["_tools_seen"]:
+            span["retries"] += 1
+        span["_tools_seen"].append(call.name)
+        self.pending_calls[call.id or call.name] = {"tool": call.name, "agent": span["agent"], "start": now}
+
+    def _end_tool_call(self, response, now: float):
+        call = self.pending_calls.pop(response.id or response.name, None)
+        if call is None:
+            return
+        duration = now - call["start"]
+        self.current["tool_sec"] += duration
+        self._write({
+            "type": "tool_call",
+            "agent": call["agent"],
+            "tool": call["tool"],
+            "start": call["start"],
+            "end": now,
+            "duration_sec": round(duration, 3),
+        })
+
+    def _close_span(self, end: float):
+        if self.current is None:
+            return
+        span = self.current
+        span.pop("_tools_seen", None)
+        models = span.pop("_models", None)
+        span["model"] = ", ".join(models) if models else self._model_of(span["agent"])
+        span["end"] = end
+        span["duration_sec"] = round(end - span["start"], 3)
+        span["tool_sec"] = round(span["tool_sec"], 3)
+        self.spans.append(span)
+        self._write(span)
+        self.current = None
+
+    def _model_of(self, agent_name: str) -> Optional[str]:
+        if self.root_agent is None:
+            return None
+        agent = self.root_agent.find_agent(agent_name)
+        model = getattr(agent, "model", None)
+        if not model:
+            return None
+        return model if isinstance(model, str) else getattr(model, "model", str(model))
+
+    # -- output -----------------------------------------------------------
+
+    def _write(self, record: Dict[str, Any]):
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Closes the last span, writes the run summary to the trace and prints it.
+
+        Returns:
+            list: The per-agent summary rows
+        """
+        self._close_span(self.last_event_at)
+        with _tracers_lock:
+            if self in _active_tracers:
+                _active_tracers.remove(self)
+
+        rows = summarize_spans(self.spans)
+        self._write({
+            "type": "run_summary",
+            "run": self.run_name,
+            "duration_sec": round(time.time() - self.started_at, 3),
+            "agents": rows,
+        })
+        print(f"\nRun trace written to {self.trace_path}")
+        print_summary(rows)
+        return rows
+
+
+def load_spans(paths: List[str]) -> List[Dict[str, Any]]:
+    """Reads the agent_span records of one or more JSONL trace files."""
+    spans = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("type") == "agent_span":
+                    spans.append(record)
+    return spans
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python shared/tracing.py TRACE.jsonl [TRACE.jsonl ...]")
+        sys.exit(1)
+    print_summary(summarize_spans(load_spans(sys.argv[1:])))
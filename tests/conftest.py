@@ -0,0 +1,14 @@
+import os
+import sys
+
+# The agencies import their modules by bare name and the shared package from the
+# project root, the way their entry points set up sys.path
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (PROJECT_DIR, os.path.join(PROJECT_DIR, "cluster_agency"), os.path.join(PROJECT_DIR, "image_agency")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
@@ -0,0 +1,169 @@
+import pytest
+from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+from checkpoints import (
+    CHECKPOINT_PREFIX, COMPLETE, SqliteSessionService, add_checkpoints, completed_stages, is_run_complete
+)
+
+INVOCATION = "invocation-1"
+
+
+def _agent_tree():
+    return SequentialAgent(name="Root", sub_agents=[
+        LlmAgent(name="Summary", model="gemini-2.0-flash", output_key="summary"),
+        SequentialAgent(name="PlayerAgent", sub_agents=[
+            LlmAgent(name="Detection", model="gemini-2.0-flash", output_key="player_name"),
+            LlmAgent(name="Perspective", model="gemini-2.0-flash", output_key="player_perspective"),
+        ]),
+        SequentialAgent(name="TeamAgent", sub_agents=[
+            LlmAgent(name="Detection", model="gemini-2.0-flash", output_key="team_name"),
+        ]),
+    ])
+
+
+def _output_event(agent, value="done"):
+    return Event(invocation_id=INVOCATION, author=agent.name,
+                 actions=EventActions(state_delta={agent.output_key: value}))
+
+
+def _run_stage(agent, session, *events):
+    """Runs an agent's callbacks around the given events the way ADK does; returns True if it was skipped."""
+    session.events.extend(events)
+    for event in events:
+        session.state.update(event.actions.state_delta)
+    context = CallbackContext(InvocationContext(session_service=InMemorySessionService(), invocation_id=INVOCATION,
+                                                agent=agent, session=session))
+    if agent.before_agent_callback(callback_context=context) is not None:
+        return True
+    agent.after_agent_callback(callback_context=context)
+    session.state.update(context._event_actions.state_delta)
+    return False
+
+
+@pytest.fixture
+def session():
+    return Session(app_name="app", user_id="user", id="run-1")
+
+
+def test_add_checkpoints_keys_stages_by_their_path(session):
+    root = _agent_tree()
+    add_checkpoints(root)
+    assert root.before_agent_callback is None
+
+    for agent in (root.sub_agents[1].sub_agents[0], root.sub_agents[2].sub_agents[0]):
+        assert not _run_stage(agent, session, _output_event(agent))
+    assert set(completed_stages(session.state)) == {"PlayerAgent/Detection", "TeamAgent/Detection"}
+
+
+def test_completed_stage_is_skipped_on_resume(session):
+    root = _agent_tree()
+    add_checkpoints(root)
+    summary = root.sub_agents[0]
+
+    assert not _run_stage(summary, session, _output_event(summary))
+    assert session.state[CHECKPOINT_PREFIX + "Summary"] is True
+    assert _run_stage(summary, session)
+
+
+def test_stage_without_output_is_not_checkpointed(session):
+    root = _agent_tree()
+    add_checkpoints(root)
+    summary = root.sub_agents[0]
+
+    # An output from an earlier invocation does not count
+    earlier = _output_event(summary)
+    earlier.invocation_id = "invocation-0"
+    assert not _run_stage(summary, session, earlier)
+    assert completed_stages(session.state) == []
+
+
+def test_stage_with_an_error_event_is_not_checkpointed(session):
+    root = _agent_tree()
+    add_checkpoints(root)
+    summary, detection = root.sub_agents[0], root.sub_agents[1].sub_agents[0]
+
+    blocked = Event(invocation_id=INVOCATION, author=summary.name, error_code="SAFETY", error_message="Blocked")
+    assert not _run_stage(summary, session, blocked, _output_event(summary, ""))
+
+    tool_error = Event(invocation_id=INVOCATION, author=detection.name, content=types.Content(role="user", parts=[
+        types.Part(function_response=types.FunctionResponse(name="write_player_view_to_db",
+                                                            response={"error": "timeout"}))
+    ]))
+    assert not _run_stage(detection, session, tool_error, _output_event(detection))
+    assert completed_stages(session.state) == []
+
+
+def test_sequential_stage_is_checkpointed_once_all_sub_agents_are(session):
+    root = _agent_tree()
+    add_checkpoints(root)
+    player = root.sub_agents[1]
+    detection, perspective = player.sub_agents
+
+    assert not _run_stage(detection, session, _output_event(detection))
+    assert not _run_stage(player, session)
+    assert CHECKPOINT_PREFIX + "PlayerAgent" not in session.state
+
+    assert not _run_stage(perspective, session, _output_event(perspective))
+    assert not _run_stage(player, session)
+    assert session.state[CHECKPOINT_PREFIX + "PlayerAgent"] is True
+
+
+def test_existing_callbacks_are_chained(session):
+    calls = []
+    summary = LlmAgent(name="Summary", model="gemini-2.0-flash", output_key="summary",
+                       before_agent_callback=lambda callback_context: calls.append("before"),
+                       after_agent_callback=lambda callback_context: calls.append("after"))
+    add_checkpoints(SequentialAgent(name="Root", sub_agents=[summary]))
+
+    assert not _run_stage(summary, session, _output_event(summary))
+    assert calls == ["before", "after"]
+    assert _run_stage(summary, session)
+    assert calls == ["before", "after"]
+
+
+def test_is_run_complete_checks_every_top_level_stage():
+    root = _agent_tree()
+    state = {CHECKPOINT_PREFIX + "Summary": True, CHECKPOINT_PREFIX + "PlayerAgent": True}
+    assert not is_run_complete(state, root)
+    state[CHECKPOINT_PREFIX + "TeamAgent"] = False
+    assert not is_run_complete(state, root)
+    state[CHECKPOINT_PREFIX + "TeamAgent"] = True
+    assert is_run_complete(state, root)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+def test_open_session_is_resumed_by_a_new_process(db_path):
+    service = SqliteSessionService(db_path)
+    session = service.resume_or_create("app", "user")
+    service.append_event(session, Event(author="Summary", actions=EventActions(
+        state_delta={CHECKPOINT_PREFIX + "Summary": True}
+    )))
+
+    resumed = SqliteSessionService(db_path).resume_or_create("app", "user")
+    assert resumed.id == session.id
+    assert completed_stages(resumed.state) == ["Summary"]
+    assert [e.author for e in resumed.events] == ["Summary"]
+
+
+def test_session_is_abandoned_after_max_resumes(db_path):
+    first = SqliteSessionService(db_path).resume_or_create("app", "user", session_id="run-1")
+    for _ in range(2):
+        assert SqliteSessionService(db_path).resume_or_create("app", "user", max_resumes=2).id == first.id
+    fresh = SqliteSessionService(db_path).resume_or_create("app", "user", max_resumes=2)
+    assert fresh.id != first.id
+
+
+def test_closed_sessions_are_not_resumed(db_path):
+    service = SqliteSessionService(db_path)
+    session = service.resume_or_create("app", "user", session_id="run-1")
+    service.set_status("app", "user", session.id, COMPLETE)
+    assert SqliteSessionService(db_path).resume_or_create("app", "user").id != session.id
@@ -0,0 +1,77 @@
+import pytest
+
+import tools
+from benchmark_fakes import FakeQuery, FakeSupabase
+from tools import content_hash
+
+
+def test_content_hash_ignores_surrounding_whitespace():
+    assert content_hash(" Headline ", "Body\n") == content_hash("Headline", "Body")
+    assert content_hash(None, None) == content_hash("", "")
+    assert content_hash("Headline", "Body") != content_hash("Headline", "Body!")
+    # The separator keeps headline and content apart
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeSupabase({
+        "cluster_player_view": [
+            {"id": 1, "cluster_id": "c1", "language": "en", "player": "A", "headline": "H", "content": "C"},
+        ],
+        "cluster_player_view_int": [
+            {"id": 10, "cluster_player_view_id": 1, "language": "de"},
+            {"id": 11, "cluster_player_view_id": 2, "language": "de"},
+        ],
+    })
+    monkeypatch.setattr(tools, "create_client", db.create_client)
+    return db
+
+
+@pytest.fixture
+def image_jobs(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(tools, "enqueue_image_job", lambda table, rows: jobs.append((table, rows)))
+    return jobs
+
+
+def test_unchanged_rewrite_is_a_no_op(db, image_jobs):
+    rows = tools.write_player_view_to_db("c1", " H", "C\n", "A")
+    assert [r["id"] for r in rows] == [1]
+    assert db.calls == {"cluster_player_view.select": 1}
+    assert len(db.tables["cluster_player_view_int"]) == 2
+    assert image_jobs == []
+
+
+def test_changed_row_is_updated_in_place_and_its_translations_dropped(db, image_jobs):
+    rows = tools.write_player_view_to_db("c1", "H", "New content", "A")
+    assert [r["id"] for r in rows] == [1]
+    assert db.tables["cluster_player_view"][0]["content"] == "New content"
+    assert [r["id"] for r in db.tables["cluster_player_view_int"]] == [11]
+    assert "cluster_player_view.insert" not in db.calls
+    assert image_jobs == []
+
+
+def test_new_row_is_inserted_and_queued_for_an_image(db, image_jobs):
+    rows = tools.write_player_view_to_db("c1", "H", "C", "B")
+    assert len(db.tables["cluster_player_view"]) == 2
+    assert image_jobs == [("cluster_player_view", rows)]
+
+
+def test_row_inserted_by_a_concurrent_run_is_not_duplicated(db, image_jobs, monkeypatch):
+    competing = {"id": 2, "cluster_id": "c1", "language": "en", "player": "B", "headline": "H", "content": "Old"}
+    execute = FakeQuery.execute
+
+    def execute_then_race(query):
+        # Another run inserts the row right after this run found none
+        result = execute(query)
+        if query.operation == "select" and competing not in db.tables["cluster_player_view"]:
+            db.tables["cluster_player_view"].append(competing)
+        return result
+
+    monkeypatch.setattr(FakeQuery, "execute", execute_then_race)
+    rows = tools.write_player_view_to_db("c1", "H", "New", "B")
+
+    assert [r["id"] for r in rows] == [2]
+    assert [r["content"] for r in db.tables["cluster_player_view"] if r["player"] == "B"] == ["New"]
+    assert image_jobs == []
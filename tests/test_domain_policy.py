@@ -0,0 +1,64 @@
+import pytest
+
+from config import DEFAULT_DOMAIN_SCORE
+from domain_policy import ALLOW, DENY, DomainPolicy
+
+
+@pytest.fixture
+def policy():
+    policy = DomainPolicy()
+    policy.add("example.com", action=DENY, score=0.1)
+    policy.add("images.example.com", action=ALLOW)
+    policy.add("cdn.images.example.com", score=0.9)
+    return policy
+
+
+def test_rule_covers_subdomains_but_not_lookalike_hosts(policy):
+    assert policy.is_denied("https://example.com/a.jpg")
+    assert policy.is_denied("https://static.example.com/a.jpg")
+    assert not policy.is_denied("https://badexample.com/a.jpg")
+    assert not policy.is_denied("https://example.com.evil.org/a.jpg")
+    assert policy.lookup("https://example.org/a.jpg") == (None, None)
+
+
+def test_most_specific_rule_wins(policy):
+    assert policy.lookup("https://images.example.com/a.jpg") == (ALLOW, 0.1)
+    assert policy.lookup("https://cdn.images.example.com/a.jpg") == (ALLOW, 0.9)
+    assert policy.lookup("https://other.example.com/a.jpg") == (DENY, 0.1)
+
+
+def test_hosts_are_normalized(policy):
+    assert policy.is_denied("https://WWW.Example.COM./a.jpg")
+    assert policy.is_denied("www.example.com")
+    assert policy.is_denied("http://user@example.com:8080/a.jpg")
+
+
+def test_score_defaults_for_unknown_hosts(policy):
+    assert policy.score("https://unknown.net/a.jpg") == DEFAULT_DOMAIN_SCORE
+    assert policy.score("https://example.com/a.jpg") == 0.1
+
+
+def test_add_updates_an_existing_rule_without_counting_it_twice(policy):
+    size = policy.size
+    policy.add("www.example.com", score=0.3)
+    assert policy.size == size
+    assert policy.lookup("https://example.com/") == (DENY, 0.3)
+    with pytest.raises(ValueError):
+        policy.add("example.net", action="block")
+
+
+def test_load_file(policy, tmp_path):
+    path = tmp_path / "policy.txt"
+    path.write_text(
+        "# comment\n"
+        "allow static.example.com\n"
+        "score example.org 0.7  # trusted\n"
+        "deny\n"
+        "\n"
+        "frobnicate example.net\n",
+        encoding="utf-8",
+    )
+    assert policy.load_file(str(path)) == 2
+    assert not policy.is_denied("https://static.example.com/a.jpg")
+    assert policy.score("https://example.org/a.jpg") == 0.7
+    assert policy.lookup("https://example.net/a.jpg") == (None, None)
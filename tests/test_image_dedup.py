@@ -0,0 +1,71 @@
+import io
+import random
+
+from PIL import Image
+
+from image_dedup import BKTree, ImageDeduplicator, dhash, hamming_distance
+
+
+def _gradient_png(width: int, height: int, flip: bool = False) -> bytes:
+    image = Image.new("L", (width, height))
+    image.putdata([((width - x) if flip else x) * 255 // width for y in range(height) for x in range(width)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b1011) == 0
+    assert hamming_distance(0b1011, 0b0010) == 2
+    assert hamming_distance(0, 2 ** 64 - 1) == 64
+
+
+def test_bk_tree_search_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    # Near-duplicates of the first values, a few bits apart
+    values += [v ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for v in values[:50]]
+    tree = BKTree()
+    for value in values:
+        tree.add(value)
+    assert tree.size == len(set(values))
+
+    for query in values[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        for radius in (0, 3, 10):
+            expected = sorted({(hamming_distance(query, v), v) for v in values if hamming_distance(query, v) <= radius})
+            assert tree.search(query, radius) == expected
+
+
+def test_bk_tree_ignores_duplicates_and_handles_empty_tree():
+    tree = BKTree()
+    assert tree.search(123, 64) == []
+    tree.add(123)
+    tree.add(123)
+    assert tree.size == 1
+    assert tree.search(123, 0) == [(0, 123)]
+
+
+def test_dhash_is_stable_under_rescaling():
+    small, large = dhash(_gradient_png(64, 48)), dhash(_gradient_png(640, 480))
+    mirrored = dhash(_gradient_png(640, 480, flip=True))
+    assert hamming_distance(small, large) <= 2
+    assert hamming_distance(large, mirrored) > 32
+    assert dhash(b"not an image") is None
+
+
+def test_partition_duplicates_moves_near_duplicates_last():
+    known = 0x0F0F0F0F0F0F0F0F
+    deduplicator = ImageDeduplicator([f"{known:016x}", "not hex"], max_distance=4, http_client=object())
+    assert deduplicator.tree.size == 1
+
+    candidates = [
+        {"url": "a", "phash": f"{known ^ 0b111:016x}"},  # 3 bits off: near-duplicate
+        {"url": "b", "phash": f"{~known & (2 ** 64 - 1):016x}"},
+        {"url": "c", "phash": None},
+        {"url": "d", "phash": f"{known:016x}"},
+    ]
+    ranked = deduplicator.partition_duplicates(candidates)
+    assert [c["url"] for c in ranked] == ["b", "c", "a", "d"]
+
+    deduplicator.add(f"{~known & (2 ** 64 - 1):016x}")
+    assert [c["url"] for c in deduplicator.partition_duplicates(candidates)] == ["c", "a", "b", "d"]
@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+
+from async_image_service import AsyncMainImageService
+from image_ranking import ImageRanker
+from image_validation import ImageValidator
+
+
+class FakeSearch:
+    """Yields num_to_fetch candidates lazily and records how many were read."""
+
+    def __init__(self):
+        self.read = 0
+        self.closed = False
+
+    def iter_images(self, query, num_to_fetch=10, max_retries=3):
+        try:
+            for i in range(num_to_fetch):
+                self.read += 1
+                # Later results in each block of four match the query better
+                title = "vikings quarterback" if i % 4 == 3 else f"result {i}"
+                yield {"url": f"https://img.example.org/{i}.jpg", "title": title, "width": 1200, "height": 800}
+        finally:
+            self.closed = True
+
+
+def _service(search):
+    """An AsyncMainImageService whose HEAD check accepts every candidate and records the order."""
+    validator = ImageValidator(http_client=object())
+    validator.validated = []
+
+    async def inspect_image_url_async(image_url, http_client):
+        validator.validated.append(image_url)
+        return {"content_type": "image/jpeg"}
+
+    validator.inspect_image_url_async = inspect_image_url_async
+    service = SimpleNamespace(image_search=search, image_ranker=ImageRanker(), image_validator=validator)
+    return AsyncMainImageService(service, max_in_flight=1), validator
+
+
+def test_search_stream_is_not_read_past_the_first_window():
+    search = FakeSearch()
+    async_service, validator = _service(search)
+
+    valid = asyncio.run(async_service._search_valid("vikings quarterback", 20, 3, 4, None,
+                                                    "The vikings quarterback", "vikings quarterback"))
+
+    assert len(valid) == 4
+    assert search.read == 4 and search.closed
+    # The window was ranked before validation: the matching result was checked first
+    assert validator.validated[0] == "https://img.example.org/3.jpg"
+    assert valid[0]["url"] == "https://img.example.org/3.jpg"
+    assert [c["rank_score"] for c in valid] == sorted((c["rank_score"] for c in valid), reverse=True)
+
+
+def test_iter_ranked_ranks_each_window_and_closes_the_stream():
+    search = FakeSearch()
+    ranked = ImageRanker().iter_ranked(search.iter_images("q", 8), "vikings quarterback", "vikings quarterback", 4)
+    first_window = [next(ranked)["url"] for _ in range(4)]
+    assert search.read == 4
+    assert first_window[0] == "https://img.example.org/3.jpg"
+    ranked.close()
+    assert search.closed and search.read == 4
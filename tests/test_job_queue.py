@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QUEUED, RUNNING, DONE, DEAD
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), visibility_timeout=60, max_attempts=2,
+                     retry_base_delay=0, retry_max_delay=0)
+    yield queue
+    queue.close()
+
+
+def _status(queue, job_id):
+    return queue._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+
+
+def test_claims_by_priority_then_age(queue):
+    low = queue.enqueue("image_sweep", priority=0)
+    high = queue.enqueue("cluster", {"n": 1}, priority=10)
+    later = queue.enqueue("image_sweep", priority=0)
+
+    job = queue.claim()
+    assert job["id"] == high and job["payload"] == {"n": 1} and job["attempts"] == 1
+    assert [queue.claim()["id"], queue.claim()["id"]] == [low, later]
+    assert queue.claim() is None
+
+
+def test_claim_filters_kinds_and_respects_delay(queue):
+    queue.enqueue("cluster", delay=60)
+    sweep = queue.enqueue("translate_sweep")
+    assert queue.claim(kinds=["cluster"]) is None
+    assert queue.claim(kinds=["translate_sweep", "cluster"])["id"] == sweep
+    assert 0 < queue.next_available_in() <= 60
+
+
+def test_dedup_key_only_blocks_pending_jobs(queue):
+    first = queue.enqueue("cluster", dedup_key="cluster")
+    assert queue.enqueue("cluster", dedup_key="cluster") is None
+    queue.claim()
+    assert queue.enqueue("cluster", dedup_key="cluster") is None
+    queue.complete(first)
+    assert queue.enqueue("cluster", dedup_key="cluster") is not None
+
+
+def test_leased_job_is_invisible_until_the_lease_expires(queue):
+    job_id = queue.enqueue("cluster")
+    queue.claim(visibility_timeout=0.05)
+    assert queue.claim() is None
+
+    time.sleep(0.1)
+    job = queue.claim()
+    assert job["id"] == job_id and job["attempts"] == 2
+
+
+def test_extend_keeps_a_long_job_leased(queue):
+    job_id = queue.enqueue("cluster")
+    queue.claim(visibility_timeout=0.05)
+    queue.extend(job_id, 60)
+    time.sleep(0.1)
+    assert queue.claim() is None
+    assert _status(queue, job_id) == RUNNING
+
+
+def test_failed_job_is_retried_then_dead_lettered(queue):
+    job_id = queue.enqueue("cluster")
+    queue.claim()
+    assert queue.fail(job_id, "boom 1") == QUEUED
+    assert queue.claim()["id"] == job_id
+    assert queue.fail(job_id, "boom 2") == DEAD
+    assert queue.claim() is None
+
+    dead = queue.dead_letters()
+    assert [j["id"] for j in dead] == [job_id] and dead[0]["last_error"] == "boom 2"
+    assert queue.stats() == {"cluster": {DEAD: 1}}
+
+
+def test_retry_delay_backs_off(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=5, retry_base_delay=30, retry_max_delay=3600)
+    job_id = queue.enqueue("cluster")
+    queue.claim()
+    queue.fail(job_id, "boom")
+    assert queue.claim() is None
+    assert 25 < queue.next_available_in() <= 30
+    queue.close()
+
+
+def test_expired_lease_after_last_attempt_is_dead_lettered(queue):
+    job_id = queue.enqueue("cluster", max_attempts=1)
+    queue.claim(visibility_timeout=0.05)
+    time.sleep(0.1)
+    assert queue.claim() is None
+    assert _status(queue, job_id) == DEAD
+    assert queue.dead_letters()[0]["last_error"] == "Lease expired"
+
+
+def test_requeue_gives_a_dead_job_fresh_attempts(queue):
+    job_id = queue.enqueue("cluster", max_attempts=1)
+    queue.claim()
+    queue.fail(job_id, "boom")
+    assert queue.requeue(job_id)
+    assert not queue.requeue(job_id)
+    job = queue.claim()
+    assert job["id"] == job_id and job["attempts"] == 1
+
+
+def test_requeue_skips_a_job_whose_dedup_key_is_pending(queue):
+    job_id = queue.enqueue("cluster", dedup_key="run", max_attempts=1)
+    queue.claim()
+    queue.fail(job_id, "boom")
+    newer_id = queue.enqueue("cluster", dedup_key="run")
+    assert newer_id is not None
+    assert not queue.requeue(job_id)
+    assert _status(queue, job_id) == DEAD
+    queue.claim()
+    queue.complete(newer_id)
+    assert queue.requeue(job_id)
+
+
+@pytest.mark.parametrize("read", ["stats", "next_available_in", "dead_letters"])
+def test_reads_wait_for_the_connection_lock(queue, read):
+    queue.enqueue("cluster")
+    done = threading.Event()
+    with queue._lock:
+        thread = threading.Thread(target=lambda: (getattr(queue, read)(), done.set()))
+        thread.start()
+        assert not done.wait(0.1)
+    thread.join(5)
+    assert done.is_set()
+
+
+def test_purge_done(queue):
+    job_id = queue.enqueue("cluster")
+    queue.claim()
+    queue.complete(job_id)
+    assert _status(queue, job_id) == DONE
+    assert queue.purge_done(older_than=60) == 0
+    assert queue.purge_done(older_than=-1) == 1
+    assert queue.stats() == {}
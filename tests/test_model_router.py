@@ -0,0 +1,82 @@
+import pytest
+
+from shared import model_router
+from shared.model_router import ModelRouter, LONG_PROMPT_CHARS, MIN_LATENCY_SAMPLES, is_quota_error, provider_of
+
+TIERS = {
+    "fast": {"models": ["gemini-a", "gemini-b"], "latency_slo": 1, "timeout": 5},
+    "balanced": {"models": ["gemini-b", "gemini-a"], "latency_slo": 2, "timeout": 10},
+    "tools": {"models": ["openai/gpt-x", "gemini-a"], "latency_slo": 2, "timeout": 10},
+}
+STAGES = {"Uploader": "fast", "Fetcher": "tools", "ContentAnalyst": "fast"}
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(TIERS, STAGES)
+
+
+def test_tier_for_stage(router):
+    assert router.tier_for("Uploader") == "fast"
+    assert router.tier_for("ContentAnalyst_summary") == "fast"
+    assert router.tier_for("Unknown") == model_router.DEFAULT_TIER
+    assert router.tier_for("Uploader", prompt_chars=LONG_PROMPT_CHARS + 1) == "balanced"
+
+
+def test_route_applies_the_model_filter(router):
+    assert router.route("Fetcher") == ("tools", ["openai/gpt-x", "gemini-a"])
+    assert router.route("Fetcher", model_filter=lambda m: m.startswith("gemini")) == ("tools", ["gemini-a"])
+    assert provider_of("openai/gpt-x") == "openai" and provider_of("gemini-a") == "gemini"
+
+
+def test_quota_error_moves_a_model_to_the_end_until_its_cooldown_ends(router, monkeypatch):
+    assert is_quota_error(QuotaError("slow down"))
+    router.record_failure("gemini-a", QuotaError("slow down"), "fast")
+    assert router.route("Uploader") == ("fast", ["gemini-b", "gemini-a"])
+    assert router.stats()["gemini-a"]["quota_errors"] == 1
+
+    now = model_router.time.time()
+    monkeypatch.setattr(model_router.time, "time", lambda: now + model_router.QUOTA_COOLDOWN + 1)
+    assert router.route("Uploader") == ("fast", ["gemini-a", "gemini-b"])
+
+
+def test_every_model_cooling_down_is_still_routed_soonest_first(router):
+    router.record_failure("gemini-b", TimeoutError("timed out"), "fast")  # SLOW_COOLDOWN
+    router.record_failure("gemini-a", QuotaError("quota"), "fast")  # QUOTA_COOLDOWN, shorter
+    assert router.route("Uploader") == ("fast", ["gemini-a", "gemini-b"])
+
+
+def test_slow_model_is_routed_around_after_enough_samples(router):
+    for _ in range(MIN_LATENCY_SAMPLES - 1):
+        router.record_success("gemini-a", 3.0, "fast")
+    assert router.route("Uploader")[1][0] == "gemini-a"
+    router.record_success("gemini-a", 3.0, "fast")
+    assert router.route("Uploader")[1] == ["gemini-b", "gemini-a"]
+    assert router.stats()["gemini-a"]["slo_breaches"] == 1
+
+
+def test_call_falls_back_on_a_quota_error(router):
+    attempts = []
+
+    def fn(model, timeout):
+        attempts.append((model, timeout))
+        if model == "gemini-a":
+            raise QuotaError("quota")
+        return f"answer from {model}"
+
+    assert router.call("Uploader", fn) == "answer from gemini-b"
+    assert attempts == [("gemini-a", 5.0), ("gemini-b", 5.0)]
+    assert router.route("Uploader")[1] == ["gemini-b", "gemini-a"]
+
+
+def test_call_raises_the_last_error_when_every_model_fails(router):
+    def fn(model, timeout):
+        raise ValueError(f"bad request for {model}")
+
+    with pytest.raises(ValueError, match="gemini-b"):
+        router.call("Uploader", fn)
+    assert router.stats()["gemini-a"]["failures"] == 1
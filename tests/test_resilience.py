@@ -0,0 +1,196 @@
+import asyncio
+import threading
+
+import pytest
+
+from shared import resilience
+from shared.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, Dependency, RetryableError, RetryBudget,
+    acall, call, deadline, is_transient_error, run_deadline, time_left
+)
+
+CONFIG = {"max_attempts": 3, "base_delay": 0.0, "max_delay": 0.0, "failure_threshold": 2, "recovery_timeout": 60.0}
+
+
+class Flaky:
+    """Fails with the given errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def key(request):
+    """A dependency key of its own per test, so breakers and budgets start fresh."""
+    return request.node.name
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+
+
+def _open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.on_failure()
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("db", failure_threshold=3, recovery_timeout=60)
+    breaker.on_failure()
+    breaker.on_failure()
+    breaker.on_success()
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.on_failure()
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_lets_one_probe_through_after_the_recovery_timeout():
+    breaker = CircuitBreaker("db", failure_threshold=1, recovery_timeout=60)
+    _open_breaker(breaker)
+    breaker.opened_at -= 61
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.on_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("db", failure_threshold=3, recovery_timeout=60)
+    _open_breaker(breaker)
+    breaker.opened_at -= 61
+    breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_retry_budget_is_earned_by_calls_and_capped():
+    budget = RetryBudget(ratio=0.5, minimum=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.on_call()
+    assert not budget.try_spend()
+    budget.on_call()
+    assert budget.try_spend()
+
+    for _ in range(1000):
+        budget.on_call()
+    assert budget.tokens == budget.cap == 51
+
+
+def test_retryable_error_is_retried_without_tripping_the_breaker():
+    dep = Dependency("llm", CONFIG)
+    assert dep.record(RetryableError("empty answer"), is_transient_error)
+    assert dep.record(RetryableError("empty answer"), is_transient_error)
+    assert dep.breaker.state == CircuitBreaker.CLOSED
+    assert dep.record(TimeoutError(), is_transient_error)
+    assert dep.record(TimeoutError(), is_transient_error)
+    assert dep.breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_delay_stops_at_max_attempts_and_an_empty_budget():
+    dep = Dependency("db", CONFIG)
+    assert dep.retry_delay(1, 3) == 0.0
+    assert dep.retry_delay(3, 3) is None
+    dep.budget.tokens = 0
+    assert dep.retry_delay(1, 3) is None
+
+
+def test_transient_errors():
+    class HttpError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    assert is_transient_error(HttpError(503)) and is_transient_error(HttpError(429))
+    assert not is_transient_error(HttpError(404))
+    assert is_transient_error(ConnectionError()) and is_transient_error(Exception("read timed out"))
+    assert not is_transient_error(ValueError("bad input"))
+    assert not is_transient_error(CircuitOpenError()) and not is_transient_error(DeadlineExceeded())
+
+
+def test_call_retries_transient_errors(key):
+    fn = Flaky(TimeoutError(), ConnectionError())
+    assert call("supabase", fn, key=key) == "ok"
+    assert fn.calls == 3
+
+
+def test_call_does_not_retry_permanent_errors_or_single_attempt_writes(key):
+    fn = Flaky(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        call("supabase", fn, key=key)
+    assert fn.calls == 1
+
+    fn = Flaky(TimeoutError())
+    with pytest.raises(TimeoutError):
+        call("supabase", fn, key=key, max_attempts=1)
+    assert fn.calls == 1
+
+
+def test_call_fails_fast_once_the_breaker_is_open(key):
+    threshold = resilience.DEPENDENCIES["image_host"]["failure_threshold"]
+    fn = Flaky(*[TimeoutError()] * threshold)
+    for _ in range(threshold):
+        with pytest.raises(TimeoutError):
+            call("image_host", fn, key=key, max_attempts=1)
+    with pytest.raises(CircuitOpenError):
+        call("image_host", fn, key=key)
+    assert fn.calls == threshold
+    assert resilience.breaker_states()[f"image_host:{key}"] == CircuitBreaker.OPEN
+
+
+def test_acall_retries_transient_errors(key, monkeypatch):
+    errors = [TimeoutError()]
+
+    async def fetch():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    async def no_sleep(seconds):
+        return None
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", no_sleep)
+    assert asyncio.run(acall("supabase", fetch, key=key)) == "ok"
+    assert not errors
+
+
+def test_deadlines_nest_and_block_calls_after_they_pass(key):
+    assert time_left(5) == 5
+    with deadline(10):
+        with deadline(60):
+            assert time_left() <= 10
+        with deadline(0):
+            fn = Flaky()
+            with pytest.raises(DeadlineExceeded):
+                call("supabase", fn, key=key)
+            assert fn.calls == 0
+    assert time_left() is None
+
+
+def test_run_deadline_is_seen_by_other_threads():
+    seen = []
+    with run_deadline(30):
+        thread = threading.Thread(target=lambda: seen.append(time_left()))
+        thread.start()
+        thread.join()
+    assert seen and 0 < seen[0] <= 30
+    assert time_left() is None
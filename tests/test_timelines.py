@@ -0,0 +1,64 @@
+import pytest
+
+import tools
+from benchmark_fakes import FakeQuery, FakeSupabase
+
+
+class FunctionMissing(Exception):
+    code = "PGRST202"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(tools, "create_client", db.create_client)
+    return db
+
+
+def _timeline(name, *article_ids):
+    return {"timeline_name": name, "timeline_data": {"ClusterId": [{"article_id": list(article_ids)}, "invalid"]}}
+
+
+def test_rpc_writes_timelines_and_deduplicated_links(db):
+    results = tools.write_timelines_to_db([_timeline("A", 1, "1", 2), _timeline("B", 3)])
+    assert [(r["timeline_name"], r["links"]) for r in results] == [("A", 2), ("B", 1)]
+    assert len(db.tables["timeline_article_links"]) == 3
+    assert db.calls == {"rpc.write_timelines": 1}
+
+
+def test_missing_function_falls_back_to_separate_requests(db, monkeypatch):
+    def rpc(name, params=None):
+        raise FunctionMissing("Could not find the function public.write_timelines")
+
+    monkeypatch.setattr(db, "rpc", rpc)
+    results = tools.write_timelines_to_db([_timeline("A", 1, "1", 2), _timeline("B")])
+
+    assert [(r["timeline_name"], r["links"]) for r in results] == [("A", 2), ("B", 0)]
+    timeline_id = results[0]["timeline_id"]
+    assert sorted(l["article_id"] for l in db.tables["timeline_article_links"]) == ["1", "2"]
+    assert all(l["timeline_id"] == timeline_id for l in db.tables["timeline_article_links"])
+    assert len(db.tables["timelines"]) == 2
+
+
+def test_fallback_deletes_the_timeline_when_its_links_fail(db, monkeypatch):
+    monkeypatch.setattr(db, "rpc", lambda name, params=None: (_ for _ in ()).throw(FunctionMissing()))
+    execute = FakeQuery.execute
+
+    def execute_failing_links(query):
+        if query.table_name == "timeline_article_links":
+            raise RuntimeError("insert failed")
+        return execute(query)
+
+    monkeypatch.setattr(FakeQuery, "execute", execute_failing_links)
+    assert tools.write_timeline_to_db("A", _timeline("A", 1)["timeline_data"]) is None
+    assert db.tables["timelines"] == []
+
+
+def test_other_rpc_errors_are_raised(db, monkeypatch):
+    def rpc(name, params=None):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(db, "rpc", rpc)
+    with pytest.raises(RuntimeError):
+        tools.write_timelines_to_db([_timeline("A", 1)])
+    assert "timelines" not in db.tables
@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.adk.events import Event
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from shared import routed_llm
+from shared.model_router import ModelRouter
+from shared.routed_llm import RoutedLlm, UsageGemini
+from shared.tracing import RunTracer
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+class FakeBackend(BaseLlm):
+    """Answers with fixed token counts, or fails with a quota error."""
+
+    fail: bool = False
+
+    async def generate_content_async(self, llm_request, stream=False):
+        if self.fail:
+            raise QuotaError("quota")
+        routed_llm._add_usage(120, 30)
+        yield LlmResponse(content=types.ModelContent(parts=[types.Part.from_text(text=f"from {self.model}")]))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ModelRouter({"fast": {"models": ["gemini-a", "gemini-b"], "latency_slo": 10, "timeout": 10}},
+                         {"Uploader": "fast"})
+    monkeypatch.setattr(routed_llm, "router", router)
+    monkeypatch.setattr(routed_llm, "_backends", {
+        "gemini-a": FakeBackend(model="gemini-a", fail=True),
+        "gemini-b": FakeBackend(model="gemini-b"),
+    })
+    return router
+
+
+def _generate(llm):
+    async def run():
+        return [r async for r in llm.generate_content_async(LlmRequest(contents=[types.UserContent("hi")]))]
+    return asyncio.run(run())
+
+
+def test_span_reports_tokens_and_the_model_that_answered(router, tmp_path):
+    tracer = RunTracer("test", trace_dir=str(tmp_path))
+    responses = _generate(RoutedLlm(model="gemini-a", stage="Uploader"))
+    assert responses[0].content.parts[0].text == "from gemini-b"
+
+    list(tracer.observe([Event(author="Uploader", content=responses[0].content)]))
+    rows = tracer.close()
+    assert rows[0]["agent"] == "Uploader" and rows[0]["model"] == "gemini-b"
+    assert (rows[0]["input_tokens"], rows[0]["output_tokens"]) == (120, 30)
+
+
+def test_usage_is_only_recorded_while_a_tracer_is_open(router, tmp_path):
+    tracer = RunTracer("test", trace_dir=str(tmp_path))
+    tracer.close()
+    _generate(RoutedLlm(model="gemini-a", stage="Uploader"))
+    assert tracer.pending_usage == {}
+
+
+def test_usage_gemini_keeps_the_usage_metadata(monkeypatch):
+
+    async def generate_content(model, contents, config):
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.ModelContent(parts=[types.Part.from_text(text="ok")]))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(prompt_token_count=7, candidates_token_count=3),
+        )
+
+    llm = UsageGemini(model="gemini-2.0-flash")
+    llm.__dict__["api_client"] = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(
+        generate_content=generate_content
+    )))
+    usage = {"input": 0, "output": 0}
+    token = routed_llm._usage.set(usage)
+    try:
+        responses = _generate(llm)
+    finally:
+        routed_llm._usage.reset(token)
+    assert responses[0].content.parts[0].text == "ok"
+    assert usage == {"input": 7, "output": 3}
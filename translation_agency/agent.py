@@ -1,120 +1,135 @@
-from google.adk.agents import LlmAgent, LoopAgent
-from google.adk.tools import google_search
-from litellm import completion
-from google.genai import types
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
+import os
+import sys
+import argparse
 
-from utils import load_instruction_from_file
-from tools import fetch_untranslated_articles_with_cluster, fetch_untranslated_articles_by_id, write_to_database, mark_article_as_translated
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
 
-import os
-from dotenv import load_dotenv
+from shared.startup import StartupProfiler
+from shared.tracing import RunTracer
+from shared.model_router import router
 
 #--------------------------------------------------------------------------
 # Load environment variables
 # -------------------------------------------------------------------------
 
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-os.environ["GOOGLE_API_KEY"] = api_key  
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "")
+def load_environment():
+    """Loads .env and exposes the API keys under the names the model clients expect."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key:
+        os.environ["GOOGLE_API_KEY"] = api_key
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "")
 
 #--------------------------------------------------------------------------
 # Agent definitions 
 # -------------------------------------------------------------------------
 
-# --- Sub Agent 1: Article Controller ---
-article_controller_agent = LlmAgent(
-    name="ArticleController",
-    model="gemini-2.0-flash-lite",  # This can now be easily changed to other models via LiteLLM
-    instruction=load_instruction_from_file("article_controller_instructions.txt"),
-    tools=[fetch_untranslated_articles_with_cluster],
-    output_key="untranslated_articles",  # Save result to state
-)
-
-# --- Sub Agent 2: Content Fetcher ---
-content_fetcher_agent = LlmAgent(
-    name="ContentFetcher",
-    model="gemini-2.0-flash",
-    instruction=load_instruction_from_file("content_fetcher_instruction.txt"),
-    tools=[fetch_untranslated_articles_by_id],
-    output_key="generated_content",  # Save result to state
-)
-
-# --- Sub Agent 2b: Content cleaner ---
-content_cleaner_agent = LlmAgent(
-    name="ContentCleaner",
-    model="gemini-2.5-flash-preview-04-17",
-    instruction=load_instruction_from_file("content_cleaner_instruction.txt"),
-    description="cleans content for further processing.",
-    output_key="cleaned_content",  # Save result to state
-)
-
-# --- Sub Agent 3: German Translator ---
-german_agent = LlmAgent(
-    name="GermanTranslator",
-    model="gemini-2.0-flash",
-    instruction=load_instruction_from_file("german_translator_instruction.txt"),
-    description="Generates translations from English to German.",
-    output_key="german_content",  # Save result to state
-)
-
-# # --- Sub Agent 4: France Translator ---
-# france_agent = LlmAgent(
-#     name="FranceTranslator",
-#     model="gemini-2.0-flash-001",
-#     instruction=load_instruction_from_file("france_translator_instruction.txt"),
-#     description="Generates translations from English to French.",
-#     output_key="france_content",
-# )
-
-# # --- Sub Agent 5: Spanish Translator ---
-# spanish_agent = LlmAgent(
-#     name="SpanishTranslator",
-#     model="gemini-2.0-flash-001",
-#     instruction=load_instruction_from_file("spanish_translator_instruction.txt"),
-#     description="Generates translations from English to Spanish.",
-#     output_key="spanish_content",
-# )
-
-# # --- Sub Agent 6: Portuguese Translator ---
-# portuguese_agent = LlmAgent(
-#     name="PortugueseTranslator",
-#     model="gemini-2.0-flash-001",
-#     instruction=load_instruction_from_file("portuguese_translator_instruction.txt"),
-#     description="Generates translations from English to Portuguese.",
-#     output_key="portuguese_content",
-# )
-
-# --- Sub Agent 7: Database Writer ---
-database_writer_agent = LlmAgent(
-    name="DatabaseWriter",
-    model="gemini-2.0-flash-lite",
-    instruction=load_instruction_from_file("database_writer_instruction.txt"),
-    tools=[write_to_database],
-    output_key="article_id",  # Save result to state
-)
-
-# --- Sub Agent 8: Database Clean Up ---
-database_clean_up_agent = LlmAgent(
-    name="DatabaseCleanUp",
-    model="gemini-2.0-flash-lite",
-    instruction=load_instruction_from_file("database_clean_up_instruction.txt"),
-    tools=[mark_article_as_translated],
-    output_key="response",  # Save result to state
-)
-
-# --- Loop Agent Workflow ---
-translation_agent = LoopAgent(
-    name="translation_agent",
-    max_iterations=10,
-    sub_agents=[article_controller_agent, content_fetcher_agent, content_cleaner_agent, german_agent, database_writer_agent, database_clean_up_agent]
-)
-
-# --- Root Agent for the Runner ---
-# The runner will now execute the workflow
-root_agent = translation_agent
+def build_root_agent():
+    """
+    Builds the translation agent tree; deferred until a run needs it.
+
+    Returns:
+        LoopAgent: The root agent for the runner
+    """
+    from google.adk.agents import LlmAgent, LoopAgent
+
+    from utils import load_instruction_from_file
+    from shared.routed_llm import routed_model  # Models per stage are configured in shared/model_router.py
+    from tools import fetch_untranslated_articles_with_cluster, fetch_untranslated_articles_by_id, write_to_database, mark_article_as_translated
+
+    # --- Sub Agent 1: Article Controller ---
+    article_controller_agent = LlmAgent(
+        name="ArticleController",
+        model=routed_model("ArticleController"),
+        instruction=load_instruction_from_file("article_controller_instructions.txt"),
+        tools=[fetch_untranslated_articles_with_cluster],
+        output_key="untranslated_articles",  # Save result to state
+    )
+
+    # --- Sub Agent 2: Content Fetcher ---
+    content_fetcher_agent = LlmAgent(
+        name="ContentFetcher",
+        model=routed_model("ContentFetcher"),
+        instruction=load_instruction_from_file("content_fetcher_instruction.txt"),
+        tools=[fetch_untranslated_articles_by_id],
+        output_key="generated_content",  # Save result to state
+    )
+
+    # --- Sub Agent 2b: Content cleaner ---
+    content_cleaner_agent = LlmAgent(
+        name="ContentCleaner",
+        model=routed_model("ContentCleaner"),
+        instruction=load_instruction_from_file("content_cleaner_instruction.txt"),
+        description="cleans content for further processing.",
+        output_key="cleaned_content",  # Save result to state
+    )
+
+    # --- Sub Agent 3: German Translator ---
+    german_agent = LlmAgent(
+        name="GermanTranslator",
+        model=routed_model("GermanTranslator"),
+        instruction=load_instruction_from_file("german_translator_instruction.txt"),
+        description="Generates translations from English to German.",
+        output_key="german_content",  # Save result to state
+    )
+
+    # # --- Sub Agent 4: France Translator ---
+    # france_agent = LlmAgent(
+    #     name="FranceTranslator",
+    #     model="gemini-2.0-flash-001",
+    #     instruction=load_instruction_from_file("france_translator_instruction.txt"),
+    #     description="Generates translations from English to French.",
+    #     output_key="france_content",
+    # )
+
+    # # --- Sub Agent 5: Spanish Translator ---
+    # spanish_agent = LlmAgent(
+    #     name="SpanishTranslator",
+    #     model="gemini-2.0-flash-001",
+    #     instruction=load_instruction_from_file("spanish_translator_instruction.txt"),
+    #     description="Generates translations from English to Spanish.",
+    #     output_key="spanish_content",
+    # )
+
+    # # --- Sub Agent 6: Portuguese Translator ---
+    # portuguese_agent = LlmAgent(
+    #     name="PortugueseTranslator",
+    #     model="gemini-2.0-flash-001",
+    #     instruction=load_instruction_from_file("portuguese_translator_instruction.txt"),
+    #     description="Generates translations from English to Portuguese.",
+    #     output_key="portuguese_content",
+    # )
+
+    # --- Sub Agent 7: Database Writer ---
+    database_writer_agent = LlmAgent(
+        name="DatabaseWriter",
+        model=routed_model("DatabaseWriter"),
+        instruction=load_instruction_from_file("database_writer_instruction.txt"),
+        tools=[write_to_database],
+        output_key="article_id",  # Save result to state
+    )
+
+    # --- Sub Agent 8: Database Clean Up ---
+    database_clean_up_agent = LlmAgent(
+        name="DatabaseCleanUp",
+        model=routed_model("DatabaseCleanUp"),
+        instruction=load_instruction_from_file("database_clean_up_instruction.txt"),
+        tools=[mark_article_as_translated],
+        output_key="response",  # Save result to state
+    )
+
+    # --- Loop Agent Workflow ---
+    translation_agent = LoopAgent(
+        name="translation_agent",
+        max_iterations=10,
+        sub_agents=[article_controller_agent, content_fetcher_agent, content_cleaner_agent, german_agent, database_writer_agent, database_clean_up_agent]
+    )
+
+    return translation_agent
 
 #--------------------------------------------------------------------------
 # Make the agency programmatically runnable.
@@ -125,24 +140,84 @@ APP_NAME = "translation_agency_app"
 USER_ID = "BigSlikTobi"
 SESSION_ID = "001"
 
-# Session and Runner
-session_service = InMemorySessionService()
-session = session_service.create_session(
-    app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID
-)
-runner = Runner(
-    agent=root_agent, app_name=APP_NAME, session_service=session_service
-)
+_pipeline = {}
 
-# Agent Interaction
-def call_agent(query):
-    content = types.Content(role="user", parts=[types.Part(text=query)])
-    events = runner.run(user_id=USER_ID, session_id=SESSION_ID, new_message=content)
 
-    for event in events:
-        if event.content and event.content.parts:
-            final_response = event.content.parts[0].text
-            print("Agent Response:", final_response)
+def build_pipeline(profiler=None):
+    """
+    Imports the heavy dependencies and builds the agent graph, session and runner once.
+
+    Args:
+        profiler (StartupProfiler, optional): Times the startup phases
+
+    Returns:
+        dict: root_agent, session_service and runner
+    """
+    if _pipeline:
+        return _pipeline
+    profiler = profiler or StartupProfiler(enabled=False)
+
+    with profiler.phase("Environment (.env)"):
+        load_environment()
+    with profiler.phase("Import ADK"):
+        from google.adk.sessions import InMemorySessionService
+        from google.adk.runners import Runner
+    with profiler.phase("Import tools (Supabase)"):
+        import tools  # Also imported by build_root_agent; timed on its own here
+    with profiler.phase("Build agent graph (instructions, LlmAgents)"):
+        root_agent = build_root_agent()
+    with profiler.phase("Create session and runner"):
+        session_service = InMemorySessionService()
+        session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=SESSION_ID)
+        runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
 
+    _pipeline.update(root_agent=root_agent, session_service=session_service, runner=runner)
+    return _pipeline
 
-call_agent("Start the process of translating the articles.")
\ No newline at end of file
+
+def __getattr__(name):
+    # agent.root_agent, agent.runner and agent.session_service are built on first access
+    if name in ("root_agent", "session_service", "runner"):
+        return build_pipeline()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Agent Interaction
+def call_agent(query):
+    from google.genai import types
+
+    pipeline = build_pipeline()
+    root_agent, runner = pipeline["root_agent"], pipeline["runner"]
+    content = types.Content(role="user", parts=[types.Part(text=query)])
+    tracer = RunTracer(APP_NAME, root_agent)
+    events = tracer.observe(runner.run(user_id=USER_ID, session_id=SESSION_ID, new_message=content))
+
+    try:
+        for event in events:
+            if event.content and event.content.parts:
+                final_response = event.content.parts[0].text
+                print("Agent Response:", final_response)
+    finally:
+        tracer.close()
+
+
+def main(argv=None):
+    """Command line entry point; translates the next batch of untranslated articles."""
+    parser = argparse.ArgumentParser(description="Runs the translation agent over untranslated articles.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report the import and setup cost of the agent, then exit without running it")
+    args = parser.parse_args(argv)
+
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    build_pipeline(profiler)
+    if args.profile_startup:
+        profiler.report()
+        return 0
+
+    call_agent("Start the process of translating the articles.")
+    router.print_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
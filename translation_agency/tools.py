@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+from shared.resilience import call
+
 load_dotenv()
 
 def fetch_untranslated_articles_with_cluster():
@@ -23,11 +25,11 @@ def fetch_untranslated_articles_with_cluster():
     supabase: Client = create_client(url, key)
 
     # Query: cluster_id is not null/empty and isTranslated is False, ordered by id desc
-    response = supabase.table("SourceArticles") \
+    query = supabase.table("SourceArticles") \
         .select("id,cluster_id,isTranslated") \
         .filter("isTranslated", "eq", False) \
-        .order("id", desc=True) \
-        .execute()
+        .order("id", desc=True)
+    response = call("supabase", query.execute)
     
     # Get data from response using .data property
     articles = response.data
@@ -58,10 +60,10 @@ def fetch_untranslated_articles_by_id(article_id: int):
     supabase: Client = create_client(url, key)
 
     # Query the article by ID
-    response = supabase.table("SourceArticles") \
+    query = supabase.table("SourceArticles") \
         .select("id,Content,headline") \
-        .eq("id", article_id) \
-        .execute()
+        .eq("id", article_id)
+    response = call("supabase", query.execute)
     
     # Get data from response
     article = response.data[0] if response.data else None
@@ -86,7 +88,7 @@ def write_to_database(article_id: int, Content: str, german_content: str, Headli
     key = os.environ.get("SUPABASE_KEY")
     supabase: Client = create_client(url, key)
 
-    # Insert the translation into the Translation table
+    # Insert the translation into the Translation table (a single attempt: inserts are not idempotent)
     data = {
         "englishContent": Content,
         "germanContent": german_content,
@@ -94,7 +96,7 @@ def write_to_database(article_id: int, Content: str, german_content: str, Headli
         "germanHeadline": germanHeadline,
         "source": article_id
     }
-    response = supabase.table("Translation").insert(data).execute()
+    response = call("supabase", supabase.table("Translation").insert(data).execute, max_attempts=1)
     return response.data
 
 def mark_article_as_translated(article_id: int):
@@ -112,7 +114,7 @@ def mark_article_as_translated(article_id: int):
     supabase: Client = create_client(url, key)
 
     # Update the article to mark it as translated
-    response = supabase.table("SourceArticles").update({"isTranslated": True}).eq("id", article_id).execute()
+    response = call("supabase", supabase.table("SourceArticles").update({"isTranslated": True}).eq("id", article_id).execute)
     return response.data
 
 
@@ -2,11 +2,19 @@ import os
 import argparse
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-import google.generativeai as genai
-from supabase import create_client, Client
 from datetime import datetime, timedelta
 import time
 import json
+import sys
+
+# The shared package (resilience, model routing, tracing, startup profiling) lives in the project root
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+from shared.startup import StartupProfiler
+from shared.model_router import router
+from shared.resilience import RetryableError, call
 
 # --- Load environment variables ---
 load_dotenv()
@@ -14,21 +22,29 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-# --- Check for required environment variables ---
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Error: Supabase URL and Key must be set as environment variables.")
-    print("Please set SUPABASE_URL and SUPABASE_KEY.")
-    exit(1)
-
-if not GEMINI_API_KEY:
-    print("Error: GEMINI_API_KEY must be set as an environment variable.")
-    exit(1)
+# --- Lazily initialized clients ---
+# google.generativeai and supabase are imported on first use, so importing this
+# module (e.g. from the pipeline worker) stays cheap and does not need credentials.
+_clients: Dict[str, Any] = {}
 
-# --- Initialize Gemini ---
-genai.configure(api_key=GEMINI_API_KEY)
+def get_supabase():
+    """Returns the Supabase client, creating it on first use."""
+    if "supabase" not in _clients:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise RuntimeError("Supabase URL and Key must be set as environment variables (SUPABASE_URL, SUPABASE_KEY).")
+        from supabase import create_client
+        _clients["supabase"] = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _clients["supabase"]
 
-# --- Initialize Supabase client ---
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def get_genai():
+    """Returns the google.generativeai module, configured with the API key on first use."""
+    if "genai" not in _clients:
+        if not GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY must be set as an environment variable.")
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _clients["genai"] = genai
+    return _clients["genai"]
 
 # --- Default configuration ---
 DEFAULT_SOURCE_TABLE = 'cluster_coach_view'
@@ -39,9 +55,10 @@ DEFAULT_TIME_LIMIT_HOURS = 72
 DEFAULT_BATCH_SIZE = 5
 
 # --- Gemini model configuration ---
-MODEL_NAME = "gemini-2.0-flash"
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
+# The model is picked per call by shared/model_router.py (stage "ArticleTranslation").
+# Empty or incomplete translations fall back to the next model and are retried with
+# the backoff, retry budget and circuit breaker of shared/resilience.py ("gemini").
+ROUTING_STAGE = "ArticleTranslation"
 
 def find_untranslated_articles(source_table: str, translations_table: str,
                               foreign_key_column: str, target_lang: str,
@@ -66,10 +83,11 @@ def find_untranslated_articles(source_table: str, translations_table: str,
         time_limit_iso = time_limit.isoformat(timespec='seconds') + 'Z'
         
         # Get IDs of articles that already have translations for the target language
-        response_translated_ids = supabase.from_(translations_table)\
+        supabase = get_supabase()
+        translated_query = supabase.from_(translations_table)\
             .select(foreign_key_column)\
-            .eq('language_code', target_lang)\
-            .execute()
+            .eq('language_code', target_lang)
+        response_translated_ids = call("supabase", translated_query.execute)
             
         translated_ids = []
         if response_translated_ids.data:
@@ -85,7 +103,7 @@ def find_untranslated_articles(source_table: str, translations_table: str,
         if batch_size > 0:
             query = query.limit(batch_size)
             
-        response_untranslated = query.execute()
+        response_untranslated = call("supabase", query.execute)
         
         if not response_untranslated.data:
             print(f"No untranslated articles found for language '{target_lang}' within the last {time_limit_hours} hours.")
@@ -100,7 +118,7 @@ def find_untranslated_articles(source_table: str, translations_table: str,
 
 def translate_article(article: Dict[str, Any], target_lang: str) -> Optional[Dict[str, Any]]:
     """
-    Translate an article using Gemini 2.0 Flash.
+    Translate an article using the Gemini model picked by the model router.
     
     Args:
         article: Dictionary containing article data
@@ -149,6 +167,7 @@ def translate_article(article: Dict[str, Any], target_lang: str) -> Optional[Dic
         """
         
         # Configure Gemini model
+        genai = get_genai()
         generation_config = genai.types.GenerationConfig(
             response_mime_type="application/json",
             temperature=0.1
@@ -161,55 +180,44 @@ def translate_article(article: Dict[str, Any], target_lang: str) -> Optional[Dic
                       "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"]
         ]
         
-        # Initialize model
-        model = genai.GenerativeModel(MODEL_NAME)
-        
-        # Call Gemini API with retry logic
-        attempts = 0
-        while attempts < MAX_RETRIES:
+        def generate(model_name: str, timeout: float) -> Dict[str, Any]:
+            response = genai.GenerativeModel(model_name).generate_content(
+                prompt,
+                generation_config=generation_config,
+                safety_settings=safety_settings,
+                request_options={"timeout": timeout}
+            )
+            if not response.text:
+                raise RetryableError(f"Empty response from {model_name} for article ID {article_id}")
             try:
-                response = model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    safety_settings=safety_settings
-                )
-                
-                if not response.text:
-                    print(f"Empty response from Gemini API for article ID {article_id}. Retrying...")
-                    attempts += 1
-                    time.sleep(RETRY_DELAY)
-                    continue
-                    
-                # Parse the JSON response
                 translation_data = json.loads(response.text)
-                
-                # Construct result
-                result = {
-                    'article_id': article_id,
-                    'original_headline': translation_data.get('original_headline', headline),
-                    'translated_headline': translation_data.get('translated_headline', ''),
-                    'original_content': translation_data.get('original_content', content),
-                    'translated_content': translation_data.get('translated_content', ''),
-                    'language_code': target_lang
-                }
-                
-                # Verify we have translations
-                if not result['translated_headline'] or not result['translated_content']:
-                    print(f"Missing translations for article ID {article_id}. Retrying...")
-                    attempts += 1
-                    time.sleep(RETRY_DELAY)
-                    continue
-                    
-                print(f"Successfully translated article ID {article_id} to {language_name}")
-                return result
-                
-            except Exception as e:
-                print(f"Error translating article ID {article_id}: {e}")
-                attempts += 1
-                time.sleep(RETRY_DELAY)
+            except json.JSONDecodeError as e:
+                raise RetryableError(f"Invalid JSON from {model_name} for article ID {article_id}: {e}")
+            # Verify we have translations
+            if not translation_data.get('translated_headline') or not translation_data.get('translated_content'):
+                raise RetryableError(f"Missing translations from {model_name} for article ID {article_id}")
+            return translation_data
         
-        print(f"Failed to translate article ID {article_id} after {MAX_RETRIES} attempts")
-        return None
+        # Call Gemini API; falls back to the next model of the tier on quota errors, timeouts
+        # and unusable answers, and retries transient errors with backoff on the last one
+        try:
+            translation_data = router.call(ROUTING_STAGE, generate, prompt_chars=len(prompt))
+        except Exception as e:
+            print(f"Failed to translate article ID {article_id}: {e}")
+            return None
+        
+        # Construct result
+        result = {
+            'article_id': article_id,
+            'original_headline': translation_data.get('original_headline', headline),
+            'translated_headline': translation_data.get('translated_headline', ''),
+            'original_content': translation_data.get('original_content', content),
+            'translated_content': translation_data.get('translated_content', ''),
+            'language_code': target_lang
+        }
+        
+        print(f"Successfully translated article ID {article_id} to {language_name}")
+        return result
         
     except Exception as e:
         print(f"Unexpected error during translation: {e}")
@@ -240,7 +248,7 @@ def save_translation(translation: Dict[str, Any], translations_table: str, forei
         }
         
         # Insert into database
-        response = supabase.from_(translations_table).insert(data).execute()
+        response = call("supabase", get_supabase().from_(translations_table).insert(data).execute, max_attempts=1)
         
         if response.data:
             print(f"Successfully saved translation for article ID {article_id} in {language_code}")
@@ -323,6 +331,7 @@ def batch_translate_articles(source_table: str, translations_table: str,
     print(f"Articles saved to database: {stats['articles_saved']}")
     print(f"Errors: {stats['errors']}")
     print(f"Time taken: {stats['time_taken_seconds']} seconds")
+    router.print_stats()
     
     return stats
 
@@ -344,9 +353,30 @@ def main():
                        help=f'Maximum number of articles to process (default: {DEFAULT_BATCH_SIZE})')
     parser.add_argument('--dry-run', action='store_true',
                        help='Only find untranslated articles without translating')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report the import and client setup cost, then exit without translating')
     
     args = parser.parse_args()
     
+    # --- Check for required environment variables ---
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("Error: Supabase URL and Key must be set as environment variables.")
+        print("Please set SUPABASE_URL and SUPABASE_KEY.")
+        exit(1)
+    
+    if not GEMINI_API_KEY and not args.dry_run:
+        print("Error: GEMINI_API_KEY must be set as an environment variable.")
+        exit(1)
+    
+    if args.profile_startup:
+        profiler = StartupProfiler()
+        with profiler.phase("Supabase client"):
+            get_supabase()
+        with profiler.phase("Gemini SDK (google.generativeai)"):
+            get_genai()
+        profiler.report()
+        return
+    
     print(f"Starting batch translation to {args.language}")
     print(f"Source table: {args.source_table}")
     print(f"Translations table: {args.translations_table}")